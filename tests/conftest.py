@@ -6,6 +6,7 @@ from typing import Dict, List
 import pdbp
 import subprocess
 
+from hashlib import sha256
 from datetime import timedelta
 
 import pytest
@@ -48,7 +49,8 @@ def prepare_db_for_test(
     txs=[],
     action_index_spec='action-v1.5',
     delta_index_spec='delta-v1.5',
-    docs_per_index=10_000_000
+    docs_per_index=10_000_000,
+    broken_links=[]
 ):
     rpc_conf = tevmc.config['telos-evm-rpc']
     es_config = tevmc.config['elasticsearch']
@@ -79,6 +81,9 @@ def prepare_db_for_test(
                 "@global": {
                     "block_num": i
                 },
+                "@evmBlockHash": sha256(str(i).encode()).hexdigest(),
+                "@evmPrevBlockHash": sha256(
+                    str(-i if i in broken_links else i - 1).encode()).hexdigest(),
                 "block_num": i - 10
             })
 
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+
+import rlp
+import pytest
+
+from leap.sugar import Asset
+
+from tevmc.cleos_evm import CLEOSEVM, EVMTransaction
+
+
+class FakeCLEOSEVM(CLEOSEVM):
+    '''Table reads & pushes recorded instead of hitting nodeos.
+    '''
+
+    def __init__(self, nonce: int = 5, fail_at: int = -1):
+        self.logger = logging.getLogger('test')
+        self.reads = []
+        self.pushes = []
+        self.nonce = nonce
+        self.fail_at = fail_at
+        self._init_tx_state()
+
+    def eth_get_transaction_count(self, addr):
+        self.reads.append('nonce')
+        return self.nonce
+
+    def eth_gas_price(self):
+        self.reads.append('gas_price')
+        return 7
+
+    def push_transaction(self, actions):
+        self.pushes.append(actions)
+        if len(self.pushes) - 1 == self.fail_at:
+            return 1, 'failed'
+
+        return 0, json.dumps({'processed': {}})
+
+
+def transfers(amount: int):
+    return [
+        (f'0x{i:040x}', Asset(10 + i, None))
+        for i in range(amount)
+    ]
+
+
+def test_batch_transfer_packs_actions():
+    cleos = FakeCLEOSEVM()
+    results = cleos.eth_batch_transfer(
+        'evmuser1', '0x' + 'ab' * 20, transfers(11), actions_per_tx=4)
+
+    assert [ec for ec, _ in results] == [0, 0, 0]
+    assert [len(actions) for actions in cleos.pushes] == [4, 4, 3]
+
+    # one nonce & gas price read for the whole batch
+    assert cleos.reads == ['nonce', 'gas_price']
+
+    actions = [action for push in cleos.pushes for action in push]
+    nonces = []
+    for i, action in enumerate(actions):
+        assert action['name'] == 'raw'
+        account, raw_tx, estimate_gas, sender = action['data']
+        assert (account, estimate_gas, sender) == ('evmuser1', False, 'ab' * 20)
+
+        tx = rlp.decode(bytes.fromhex(raw_tx), EVMTransaction)
+        assert tx.gas_price == 7
+        assert tx.to == bytes.fromhex(f'{i:040x}')
+        nonces.append(tx.nonce)
+
+    assert nonces == list(range(5, 16))
+
+
+def test_batch_transfer_stops_on_failure():
+    cleos = FakeCLEOSEVM(fail_at=1)
+    results = cleos.eth_batch_transfer(
+        'evmuser1', '0x' + 'ab' * 20, transfers(10), actions_per_tx=3)
+
+    assert [ec for ec, _ in results] == [0, 1]
+    assert len(cleos.pushes) == 2
+
+
+def test_batch_transfer_resyncs_when_push_raises():
+    class RaisingCLEOSEVM(FakeCLEOSEVM):
+
+        def push_transaction(self, actions):
+            self.pushes.append(actions)
+            raise ConnectionError('nodeos went away')
+
+    cleos = RaisingCLEOSEVM()
+    with pytest.raises(ConnectionError):
+        cleos.eth_batch_transfer(
+            'evmuser1', '0x' + 'ab' * 20, transfers(4), actions_per_tx=2)
+
+    # reserved nonces got dropped, the next tx reads the chain again
+    cleos.eth_build_transfers('0x' + 'ab' * 20, transfers(1))
+    assert cleos.reads == ['nonce', 'gas_price', 'nonce']
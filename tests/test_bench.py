@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import json
+import random
+
+import pytest
+
+from tevmc.bench import (
+    LatencyTracker,
+    bench_target,
+    build_report,
+    latency_stats,
+    new_record,
+    parse_mix,
+    pick_kind,
+    run_bench
+)
+
+
+def test_parse_mix_and_pick():
+    mix = parse_mix('raw=3, web3=1')
+    assert mix == {'raw': 0.75, 'web3': 0.25}
+
+    rng = random.Random(1)
+    picks = [pick_kind(rng, mix) for _ in range(1000)]
+    assert 650 < picks.count('raw') < 850
+
+    with pytest.raises(ValueError):
+        parse_mix('raw=1,transfer=2')
+
+
+def test_latency_stats():
+    stats = latency_stats(
+        [0.01 * i for i in range(1, 101)],
+        percentiles=(50, 99),
+        buckets=(0.1, 0.5))
+
+    assert stats['count'] == 100
+    assert stats['p50'] == pytest.approx(0.5)
+    assert stats['p99'] == pytest.approx(0.99)
+    assert [bucket['count'] for bucket in stats['histogram']] == [10, 40, 50]
+
+    empty = latency_stats([])
+    assert empty['count'] == 0 and empty['p50'] is None
+
+
+def test_tracker_stamps_stages_and_report():
+    indexed = set()
+    visible = set()
+    tracker = LatencyTracker(
+        lambda hashes: indexed & set(hashes),
+        lambda hashes: visible & set(hashes),
+        batch_size=2)
+
+    for i, kind in enumerate(['raw', 'raw', 'web3']):
+        record = new_record(kind, 0)
+        record.update(hash=f'0x{i:02x}', submitted=100.0, included=100.5)
+        tracker.add(record)
+
+    failed = new_record('deploy', 1)
+    failed.update(submitted=100.0, error='ValueError: nope')
+    tracker.add(failed)
+    assert tracker.pending == 6
+
+    indexed.update({'0x00', '0x01'})
+    tracker.poll(now=102.0)
+    visible.update({'0x00', '0x01', '0x02'})
+    indexed.add('0x02')
+    tracker.poll(now=103.0)
+    assert tracker.pending == 0
+
+    report = build_report(tracker.records, 100.0, 110.0)
+    json.dumps(report)
+
+    assert (report['submitted'], report['failed']) == (4, 1)
+    assert report['throughput']['submitted_tps'] == pytest.approx(0.4)
+    assert report['unresolved'] == {'included': 0, 'indexed': 0, 'visible': 0}
+    assert report['stages']['indexed']['max'] == pytest.approx(3.0)
+    assert report['kinds']['raw']['stages']['indexed']['p50'] == pytest.approx(2.0)
+    assert report['kinds']['deploy']['failed'] == 1
+    assert report['errors'] == {'ValueError: nope': 1}
+
+
+def test_bench_local(tevmc_local):
+    tevmc = tevmc_local
+    target = bench_target(tevmc.config, tevmc.containers['nodeos'].name)
+    report = run_bench(
+        tevmc.cleos,
+        target,
+        tevmc.elastic_driver(),
+        workers=2,
+        rate=4,
+        duration=10,
+        logger=tevmc.logger)
+
+    tevmc.logger.info(json.dumps(report, indent=4))
+
+    assert report['submitted'] > 0
+    assert report['failed'] == 0
+    assert report['unresolved']['visible'] == 0
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import os
+import json
+
+from copy import deepcopy
+
+from tevmc.config import local
+from tevmc.cmdline.init import touch_node_dir
+from tevmc.cmdline.build import perform_config_build
+
+
+def mtimes(docker_dir):
+    return {
+        str(p.relative_to(docker_dir)): p.stat().st_mtime_ns
+        for p in docker_dir.rglob('*') if p.is_file()
+    }
+
+
+def test_incremental_config_render(tmp_path):
+    config = deepcopy(local.default_config)
+    touch_node_dir(tmp_path, config, 'tevmc.json')
+    docker_dir = tmp_path / 'docker'
+
+    report = perform_config_build(tmp_path, config)
+    assert 'redis' in report['rebuild']
+    assert 'telos-evm-rpc' in report['rebuild']
+
+    rpc_config = docker_dir / 'telos-evm-rpc/build/config.json'
+    # other tests bootstrapping may have randomized the default ports
+    api_port = config['telos-evm-rpc']['api_port']
+    assert json.loads(rpc_config.read_text())['apiPort'] == api_port
+
+    before = mtimes(docker_dir)
+
+    # nothing changed, nothing rewritten
+    report = perform_config_build(tmp_path, config)
+    assert report == {'changed': {}, 'rebuild': []}
+
+    # one key only touches the outputs that depend on it
+    config['telos-evm-rpc']['api_port'] = api_port + 1
+    report = perform_config_build(tmp_path, config)
+    assert report['rebuild'] == ['telos-evm-rpc']
+    assert sorted(report['changed']['telos-evm-rpc']) == [
+        'telos-evm-rpc/build/Dockerfile',
+        'telos-evm-rpc/build/config.json'
+    ]
+
+    after = mtimes(docker_dir)
+    unchanged = [
+        path for path in before
+        if not path.startswith('telos-evm-rpc') and path != '.tevmc-render.json'
+    ]
+    for path in unchanged:
+        assert before[path] == after[path], path
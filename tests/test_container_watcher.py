@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import threading
+
+from tevmc.watcher import ContainerWatcher
+
+
+class FakeContainer:
+
+    def __init__(self, name, id, status):
+        self.name = name
+        self.id = id
+        self.status = status
+
+
+class FakeClient:
+
+    def __init__(self, containers):
+        self.containers = self
+        self._containers = containers
+
+    def list(self, all=False, filters=None):
+        assert filters == {'label': ['created-by=tevmc']}
+        return self._containers
+
+
+def event(action, name, id='c1', **attrs):
+    return {
+        'Type': 'container',
+        'Action': action,
+        'Actor': {'ID': id, 'Attributes': {'name': name, **attrs}},
+        'time': 1
+    }
+
+
+def test_state_table_from_events():
+    watcher = ContainerWatcher(FakeClient([
+        FakeContainer('nodeos-1', 'c1', 'running')]))
+    watcher.seed()
+    assert watcher.get('nodeos-1')['starts'] == 1
+
+    # replay of events that happened before the seed listing
+    watcher.feed(event('start', 'nodeos-1'))
+    assert watcher.get('nodeos-1')['restarts'] == 0
+
+    watcher.feed(event('oom', 'nodeos-1'))
+    watcher.feed(event('die', 'nodeos-1', exitCode='137'))
+    state = watcher.get('nodeos-1')
+    assert (state['status'], state['exit_code'], state['oom_kills']) == (
+        'exited', 137, 1)
+
+    # re-created under the same name
+    watcher.feed(event('create', 'nodeos-1', id='c2'))
+    watcher.feed(event('start', 'nodeos-1', id='c2'))
+    state = watcher.get('nodeos-1')
+    assert (state['status'], state['id'], state['restarts'], state['exit_code']) == (
+        'running', 'c2', 1, None)
+
+    # events that don't change anything don't bump the version
+    version = watcher.version
+    watcher.feed(event('exec_start: ls', 'nodeos-1', id='c2'))
+    assert watcher.version == version
+
+
+def test_changes_long_poll():
+    watcher = ContainerWatcher(FakeClient([]), history=2)
+    assert watcher.changes(0, timeout=0.01) == (0, [])
+
+    timer = threading.Timer(0.05, watcher.feed, args=(event('start', 'rpc-1'),))
+    timer.start()
+    version, changes = watcher.changes(0, timeout=5)
+    assert version == 1
+    assert [state['name'] for state in changes] == ['rpc-1']
+
+    watcher.feed(event('die', 'rpc-1', exitCode='1'))
+    watcher.feed(event('start', 'rpc-1'))
+    version, changes = watcher.changes(1, timeout=0)
+    assert version == 3
+    assert len(changes) == 1 and changes[0]['status'] == 'running'
+
+    # history only keeps the last two changes
+    watcher.feed(event('die', 'rpc-1', exitCode='1'))
+    assert watcher.changes(1, timeout=0) == (4, None)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import time
+import random
+import struct
+import logging
+
+from tevmc.utils import DockerLogDecoder, _parse_docker_log
+
+
+def make_frame(msg: bytes, stream: int = 1) -> bytes:
+    return struct.pack('>BxxxL', stream, len(msg)) + msg
+
+
+def make_log_stream(size: int, seed: int = 0):
+    rng = random.Random(seed)
+    msgs = []
+    total = 0
+    while total < size:
+        msg = f'{len(msgs)} ' + ('x' * rng.randint(16, 512)) + '\n'
+        msgs.append(msg)
+        total += len(msg) + 8
+
+    return msgs, b''.join(make_frame(msg.encode()) for msg in msgs)
+
+
+def split_chunks(data: bytes, max_chunk: int, seed: int = 0):
+    rng = random.Random(seed)
+    i = 0
+    while i < len(data):
+        size = rng.randint(1, max_chunk)
+        yield data[i:i + size]
+        i += size
+
+
+def test_decoder_split_headers_and_payloads():
+    msgs, data = make_log_stream(64 * 1024)
+
+    decoder = DockerLogDecoder()
+    result = []
+    # chunks as small as one byte split both headers and payloads
+    for chunk in split_chunks(data, 13):
+        decoder.feed(chunk)
+        result += list(decoder.iter_frames())
+
+    assert result == msgs
+    assert len(decoder) == 0
+
+
+def test_decoder_keeps_incomplete_frame():
+    decoder = DockerLogDecoder()
+    frame = make_frame(b'hello\n')
+
+    decoder.feed(frame[:5])
+    assert list(decoder.iter_frames()) == []
+
+    decoder.feed(frame[5:] + frame[:9])
+    assert list(decoder.iter_frames()) == ['hello\n']
+    assert len(decoder) == 9
+
+    decoder.feed(frame[9:])
+    assert list(decoder.iter_frames()) == ['hello\n']
+
+
+def test_decoder_iter_lines_across_frames():
+    decoder = DockerLogDecoder()
+    decoder.feed(make_frame(b'Ready to '))
+    decoder.feed(make_frame(b'err\n', stream=2))
+    decoder.feed(make_frame(b'accept connections\nnext'))
+
+    assert list(decoder.iter_lines()) == [
+        'err\n', 'Ready to accept connections\n']
+
+    assert list(decoder.flush_lines()) == ['next']
+
+
+def test_parse_docker_log_compat():
+    data = make_frame(b'a\n') + make_frame(b'b\n') + make_frame(b'c')[:4]
+    assert list(_parse_docker_log(data)) == ['a\n', 'b\n']
+
+
+def test_decoder_benchmark():
+    msgs, data = make_log_stream(16 * 1024 * 1024)
+    chunks = list(split_chunks(data, 64 * 1024))
+
+    start = time.perf_counter()
+    decoder = DockerLogDecoder()
+    frames = 0
+    for chunk in chunks:
+        decoder.feed(chunk)
+        for _ in decoder.iter_frames():
+            frames += 1
+    frame_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoder = DockerLogDecoder()
+    lines = 0
+    for chunk in chunks:
+        decoder.feed(chunk)
+        for _ in decoder.iter_lines():
+            lines += 1
+    line_time = time.perf_counter() - start
+
+    assert frames == len(msgs)
+    assert lines == len(msgs)
+
+    mib = len(data) / (1024 * 1024)
+    logging.info(
+        f'decoded {mib:.1f} MiB, {frames} frames: '
+        f'frames {mib / frame_time:.1f} MiB/s, '
+        f'lines {mib / line_time:.1f} MiB/s')
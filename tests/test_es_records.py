@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+from tevmc.testing.database import (
+    EMPTY_HASH,
+    DeltaBatch,
+    StorageEosioAction,
+    StorageEosioDelta
+)
+
+
+def delta_source(num: int) -> dict:
+    return {
+        'block_num': num - 10,
+        '@global': {'block_num': num},
+        '@evmBlockHash': f'{num:064x}',
+        '@evmPrevBlockHash': f'0x{num - 1:064X}'
+    }
+
+
+def test_records_decode_on_access():
+    delta = StorageEosioDelta(delta_source(100))
+    assert delta.block_num == 90
+    assert delta.global_block_num == 100
+    assert delta.gas_used is None
+    assert not hasattr(delta, '__dict__')
+
+    assert StorageEosioDelta({}).global_block_num is None
+
+    action = StorageEosioAction({
+        'trx_id': 'abcd',
+        '@raw': {
+            'hash': '0x01',
+            'block': 100,
+            'itxs': [{'callType': 'call', 'gas': '0x10'}]
+        }
+    })
+    assert action.trx_id == 'abcd'
+    assert action.raw.block == 100
+    assert action.raw.itxs[0].call_type == 'call'
+
+    # missing nested objects decode to empty records like before
+    assert StorageEosioAction({}).raw.hash is None
+    assert StorageEosioAction({}).raw.itxs == []
+
+
+def test_delta_batch_columns():
+    hits = [{'_source': delta_source(num)} for num in range(100, 110)]
+    hits.append({'_source': {'@global': {'block_num': 110}, '@evmBlockHash': 'zz'}})
+
+    batch = DeltaBatch.from_hits(hits)
+    assert len(batch) == 11
+    assert list(batch.global_block_nums) == list(range(100, 111))
+    assert batch.block_nums[0] == 90
+    assert batch.hash_at(0) == f'{100:064x}'
+    assert batch.prev_hash_at(1) == batch.hash_at(0)
+    assert batch.hash_at(10) is None
+    assert batch.prev_hash_bytes(10) == EMPTY_HASH
+
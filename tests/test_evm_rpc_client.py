@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tevmc.evm_rpc import EVMRPCClient
+
+
+def rpc_server(batching: bool):
+    posts = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            ...
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            posts.append((self.client_address[1], body))
+
+            def answer(call):
+                return {
+                    'jsonrpc': '2.0',
+                    'id': call['id'],
+                    'result': hex(call['params'][0])
+                }
+
+            if isinstance(body, list):
+                result = [answer(call) for call in reversed(body)]
+                if not batching:
+                    result = {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600}}
+
+            else:
+                result = answer(body)
+
+            data = json.dumps(result).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/evm', posts
+
+
+@pytest.mark.parametrize('batching', [True, False])
+def test_batch_in_order(batching):
+    server, url, posts = rpc_server(batching)
+    try:
+        with EVMRPCClient(url, batch_size=10, workers=2) as client:
+            results = client.batch(
+                ('eth_getBlockByNumber', [num, False]) for num in range(35))
+
+            assert [msg['result'] for msg in results] == [
+                hex(num) for num in range(35)]
+
+            if batching:
+                # one post per chunk of 10
+                assert len(posts) == 4
+                assert all(isinstance(body, list) for _, body in posts)
+
+            else:
+                # rejected batch, then one post per call
+                assert not client._batch_supported
+                assert len(posts) > 35
+
+    finally:
+        server.shutdown()
+
+
+def test_calls_reuse_connection():
+    server, url, posts = rpc_server(True)
+    try:
+        with EVMRPCClient(url) as client:
+            for num in range(5):
+                assert client.call('eth_getCode', [num])['result'] == hex(num)
+
+        # keep-alive, every request came from the same client port
+        assert len({port for port, _ in posts}) == 1
+        ids = [body['id'] for _, body in posts]
+        assert len(set(ids)) == 5
+
+    finally:
+        server.shutdown()
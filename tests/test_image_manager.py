@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+from tevmc.images import CONTEXT_HASH_LABEL, ImageManager, hash_build_context
+
+
+class FakeImage:
+
+    def __init__(self, tags, labels):
+        self.tags = tags
+        self.labels = labels
+
+
+class FakeImages:
+
+    def __init__(self, images):
+        self.images = images
+        self.list_calls = 0
+
+    def list(self, all=False):
+        self.list_calls += 1
+        return self.images
+
+    def get(self, tag):
+        return next(img for img in self.images if tag in img.tags)
+
+
+class FakeClient:
+
+    def __init__(self, images):
+        self.images = FakeImages(images)
+
+
+def test_build_context_hash(tmp_path):
+    (tmp_path / 'Dockerfile').write_text('FROM redis:7\n')
+    (tmp_path / 'conf').mkdir()
+    (tmp_path / 'conf' / 'redis.conf').write_text('port 6379\n')
+
+    first = hash_build_context(tmp_path)
+    assert first == hash_build_context(tmp_path)
+
+    (tmp_path / 'conf' / 'redis.conf').write_text('port 6380\n')
+    second = hash_build_context(tmp_path)
+    assert second != first
+
+    (tmp_path / 'conf' / 'redis.conf').rename(tmp_path / 'conf' / 'other.conf')
+    assert hash_build_context(tmp_path) != second
+
+
+def test_image_manager_tag_index():
+    client = FakeClient([
+        FakeImage(['tevm:redis-telos-local'], {CONTEXT_HASH_LABEL: 'abc'}),
+        FakeImage(['tevm:kibana-telos-local', 'tevm:kibana'], {})
+    ])
+    images = ImageManager(client)
+
+    assert images.has('tevm:redis-telos-local')
+    assert images.has('tevm:kibana')
+    assert not images.has('tevm:nodeos-telos-local')
+    # index is only fetched once
+    assert client.images.list_calls == 1
+
+    assert not images.needs_build('tevm:redis-telos-local', 'abc')
+    assert images.needs_build('tevm:redis-telos-local', 'def')
+    assert images.needs_build('tevm:kibana-telos-local', 'abc')
+    assert images.needs_build('tevm:nodeos-telos-local', 'abc')
+
+
+def test_image_manager_update():
+    built = FakeImage(['tevm:redis-telos-local'], {CONTEXT_HASH_LABEL: 'abc'})
+    client = FakeClient([built])
+    images = ImageManager(client)
+
+    # updating before the index got loaded, as nocache builds do
+    images._update('tevm:redis-telos-local')
+    assert client.images.list_calls == 0
+    assert images.get('tevm:redis-telos-local') is built
+
+    rebuilt = FakeImage(['tevm:redis-telos-local'], {CONTEXT_HASH_LABEL: 'def'})
+    client.images.images = [rebuilt]
+    images._update('tevm:redis-telos-local')
+    assert not images.needs_build('tevm:redis-telos-local', 'def')
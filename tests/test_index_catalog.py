@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+from tevmc.testing.database import (
+    TERMS_CHUNK, ElasticQueries, IntegrityCheckpoint)
+
+
+CONFIG = {
+    'telos-evm-rpc': {
+        'elastic_prefix': 'telos-local',
+        'elasitc_index_version': 'v1.5'
+    },
+    'elasticsearch': {'catalog_ttl': 60.0}
+}
+
+
+def make_catalog(queries):
+    rows = [
+        {'index': 'telos-local-delta-v1.5-00000001', 'uuid': 'b', 'docs.count': '5'},
+        {'index': 'telos-local-delta-v1.5-00000000', 'uuid': 'a', 'docs.count': '10'},
+        {'index': 'telos-local-action-v1.5-00000000', 'uuid': 'c', 'docs.count': '0'},
+        {'index': 'telos-local-delta-v1.4-00000000', 'uuid': 'd', 'docs.count': '1'},
+        {'index': 'telos-local-whatever', 'uuid': 'e', 'docs.count': '1'}
+    ]
+    stats = {'aggregations': {'indices': {'buckets': [
+        {
+            'key': 'telos-local-delta-v1.5-00000000', 'doc_count': 10,
+            'delta_min': {'value': 1.0}, 'delta_max': {'value': 10.0},
+            'action_min': {'value': None}, 'action_max': {'value': None}
+        },
+        {
+            'key': 'telos-local-delta-v1.5-00000001', 'doc_count': 5,
+            'delta_min': {'value': 11.0}, 'delta_max': {'value': 15.0},
+            'action_min': {'value': None}, 'action_max': {'value': None},
+            'seq_no': {'value': 42.0}
+        }
+    ]}}}
+    return queries._catalog_from(rows, stats)
+
+
+def test_catalog_from_listing_and_stats():
+    queries = ElasticQueries(CONFIG)
+    catalog = make_catalog(queries)
+
+    assert catalog.names('delta', version='v1.5') == [
+        'telos-local-delta-v1.5-00000000',
+        'telos-local-delta-v1.5-00000001'
+    ]
+    assert len(catalog.names('delta')) == 3
+
+    info = catalog.get('telos-local-delta-v1.5-00000001')
+    assert (info.suffix, info.docs, info.min_block, info.max_block) == (1, 5, 11, 15)
+    assert info.seq_no == 42
+
+    empty = catalog.get('telos-local-action-v1.5-00000000')
+    assert (empty.docs, empty.min_block, empty.max_block) == (0, None, None)
+
+    assert catalog.get('telos-local-whatever') is None
+
+
+def test_catalog_cache_and_invalidation():
+    queries = ElasticQueries(CONFIG)
+    assert queries._cached_catalog(False) is None
+
+    queries._catalog = make_catalog(queries)
+    assert queries._cached_catalog(False) is queries._catalog
+    assert queries._cached_catalog(True) is None
+
+    queries._catalog.fetched_at -= 61
+    assert queries._cached_catalog(False) is None
+
+    queries._catalog = make_catalog(queries)
+    queries.invalidate_catalog()
+    assert queries._cached_catalog(False) is None
+
+
+def test_purge_plan_from_catalog():
+    queries = ElasticQueries(CONFIG)
+    queries.docs_per_index = 10
+    plan = queries._plan_purge_from(make_catalog(queries), 5)
+
+    # only indices of the configured version past the cut get dropped
+    assert plan['drop'] == ['telos-local-delta-v1.5-00000001']
+    assert plan['trim'] == [
+        ('telos-local-delta-v1.5-00000000', '@global.block_num'),
+        ('telos-local-action-v1.5-00000000', '@raw.block')
+    ]
+
+
+def test_first_block_of_txs_requests_chunked():
+    queries = ElasticQueries(CONFIG)
+    hashes = [f'{i:064x}' for i in range(TERMS_CHUNK * 2 + 1)]
+    requests = queries._first_block_of_txs_requests(hashes)
+
+    chunks = [request['query']['terms']['@raw.hash'] for request in requests]
+    assert [len(chunk) for chunk in chunks] == [TERMS_CHUNK, TERMS_CHUNK, 1]
+    assert sum(chunks, []) == hashes
+
+
+def test_delta_batch_request_breaks_block_num_ties():
+    queries = ElasticQueries(CONFIG)
+    request = queries._delta_batch_request('pit-id', 10, None, 100, [12, 7])
+
+    # duplicated block numbers are unique once the shard doc is added
+    assert request['sort'][-1] == {'_shard_doc': {'order': 'asc'}}
+    assert request['pit']['id'] == 'pit-id'
+    assert 'index' not in request
+    assert request['search_after'] == [12, 7]
+
+
+def test_checkpoint_skips_unwritten_indices(tmp_path):
+    queries = ElasticQueries(CONFIG)
+    queries.checkpoint = IntegrityCheckpoint(tmp_path / 'checkpoint.json')
+    catalog = make_catalog(queries)
+    index = 'telos-local-delta-v1.5-00000001'
+    info = catalog.get(index)
+
+    summary = {'uuid': 'b', 'docs': 5, 'min': 11, 'max': 15, 'fingerprint': 7}
+    queries.checkpoint.indices[index] = {
+        **summary, **queries._index_stats(info), 'hash_chain': False}
+
+    assert queries._unwritten_since_checkpoint(index, info)
+    assert queries._reusable_summary(index, info, 20) == summary
+    # capped below the docs it covered
+    assert queries._reusable_summary(index, info, 14) is None
+    assert not queries._changed_since_checkpoint(index, summary)
+
+    # any write bumps the max sequence number
+    written = info._replace(seq_no=43)
+    assert not queries._unwritten_since_checkpoint(index, written)
+    assert queries._reusable_summary(index, written, 20) is None
+
+    # catalogs without sequence numbers always get fingerprinted
+    assert not queries._unwritten_since_checkpoint(
+        index, info._replace(seq_no=None))
+
+
+def test_hashes_elsewhere_request_excludes_index():
+    queries = ElasticQueries(CONFIG)
+    index = 'telos-local-action-v1.5-00000001'
+    request = queries._hashes_elsewhere_request(['aa', 'bb'], index)
+
+    assert request['index'] == f'telos-local-action-*,-{index}'
+    assert request['query']['terms']['@raw.hash'] == ['aa', 'bb']
+    assert request['aggs']['hashes']['terms']['size'] == 2
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+
+from tevmc.jobs import JobManager
+
+
+def test_job_lifecycle():
+    jobs = JobManager(max_workers=2)
+    release = threading.Event()
+
+    job = jobs.submit('check', lambda: release.wait(5) and {'status': 'healthy'}, full=True)
+    assert jobs.get(job.id) is job
+    assert not job.wait(timeout=0.05)
+    assert job.to_dict()['status'] == 'running'
+    assert job.params == {'full': True}
+
+    release.set()
+    assert job.wait(timeout=5)
+    assert (job.status, job.result) == ('done', {'status': 'healthy'})
+
+    def _fail():
+        raise ValueError('boom')
+
+    failed = jobs.submit('patch', _fail)
+    failed.wait(timeout=5)
+    assert failed.status == 'failed'
+    assert failed.error == 'ValueError: boom'
+
+    jobs.shutdown(wait=True)
+
+
+def test_exclusive_jobs_serialize():
+    jobs = JobManager(max_workers=4)
+    running = []
+    overlap = []
+
+    def _op():
+        running.append(1)
+        overlap.append(len(running))
+        time.sleep(0.05)
+        running.pop()
+
+    submitted = [jobs.submit('restart', _op, exclusive=True) for _ in range(3)]
+    for job in submitted:
+        assert job.wait(timeout=5)
+
+    assert max(overlap) == 1
+    jobs.shutdown(wait=True)
+
+
+def test_queued_exclusive_jobs_leave_pool_free():
+    jobs = JobManager(max_workers=2)
+    release = threading.Event()
+
+    restarts = [
+        jobs.submit('restart', lambda: release.wait(5), exclusive=True)
+        for _ in range(4)
+    ]
+
+    # a check still gets a worker while restarts queue up
+    check = jobs.submit('check', lambda: 'healthy')
+    assert check.wait(timeout=5)
+    assert check.result == 'healthy'
+
+    release.set()
+    for job in restarts:
+        assert job.wait(timeout=5)
+
+    jobs.shutdown(wait=True)
+
+
+def test_finished_jobs_pruned():
+    jobs = JobManager(keep=2)
+    for i in range(5):
+        jobs.submit('check', lambda: i).wait(timeout=5)
+
+    # pruning happens on submit, the newest one is still tracked
+    jobs.submit('check', lambda: None).wait(timeout=5)
+    assert len(jobs.list()) == 3
+    jobs.shutdown(wait=True)
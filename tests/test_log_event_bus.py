@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+
+from tevmc.logs import LogEventBus
+
+
+TRANSLATOR_LINES = [
+    'info: starting...\n',
+    'debug: [12,345|12,300] pushed, at 33 blocks/sec avg\n',
+    'error: connection reset\n',
+    'info: [NaN|NaN] drained\n',
+]
+
+
+def test_bus_dispatch_typed_events():
+    bus = LogEventBus('telosevm-translator')
+
+    events = []
+    for line in TRANSLATOR_LINES:
+        events += bus.dispatch(line)
+
+    kinds = [event.kind for event in events]
+    assert kinds == ['block_pushed', 'error', 'drained']
+
+    pushed = events[0]
+    assert pushed.groups == {'block_num': '12,345', 'evm_block_num': '12,300'}
+
+    assert bus.counts == {'drained': 1, 'block_pushed': 1, 'error': 1}
+    assert bus.last['drained'].line == TRANSLATOR_LINES[-1]
+
+
+def test_bus_custom_patterns_and_subscriptions():
+    bus = LogEventBus('custom', patterns={})
+    assert bus.dispatch('anything\n') == []
+
+    bus.register('a', r'foo (?P<n>\d+)')
+    bus.register('b', r'(?P<n>\d+) bar')
+
+    with bus.subscribe('b') as sub:
+        events = bus.dispatch('foo 1 bar\n')
+        assert [e.kind for e in events] == ['a', 'b']
+        assert sub.get(timeout=0).groups == {'n': '1'}
+        assert sub.get(timeout=0) is None
+
+
+def test_bus_wait_for_latched_and_source():
+    bus = LogEventBus('redis')
+    bus.dispatch('* Ready to accept connections tcp\n')
+    assert bus.wait_for('ready', timeout=0.1) is not None
+
+    bus.forget('ready')
+    assert bus.wait_for('ready', timeout=0.1) is None
+
+    def lines():
+        time.sleep(0.2)
+        yield 'loading...\n'
+        yield 'Ready to accept connections\n'
+
+    bus = LogEventBus('redis')
+    bus.start(lines())
+    event = bus.wait_for('ready', timeout=5)
+    assert event and event.kind == 'ready'
+
+    # source ended, waiting for something else returns early
+    start = time.monotonic()
+    assert bus.wait_for('error', timeout=5) is None
+    assert time.monotonic() - start < 2
+
+
+def test_bus_close_ends_blocked_docker_stream(monkeypatch):
+    import tevmc.utils
+
+    closed = threading.Event()
+
+    class BlockingResponse:
+
+        def iter_content(self, chunk_size):
+            yield b'\x01\x00\x00\x00\x00\x00\x00\x0binfo: hi!\n\n'
+            # follow mode with no timeout, blocks until the socket closes
+            closed.wait(5)
+            raise ConnectionError('connection closed')
+
+        def close(self):
+            closed.set()
+
+    class FakeSession:
+
+        def get(self, url, **kwargs):
+            return BlockingResponse()
+
+    class FakeContainer:
+        name = 'telosevm-translator'
+        status = 'running'
+
+        def reload(self):
+            ...
+
+    monkeypatch.setattr(tevmc.utils.requests_unixsocket, 'Session', FakeSession)
+
+    bus = LogEventBus('telosevm-translator')
+    bus.start(tevmc.utils.docker_stream_logs(
+        FakeContainer(), timeout=None, lines=True))
+    time.sleep(0.1)
+    assert bus._thread.is_alive()
+
+    bus.close()
+    bus._thread.join(timeout=2)
+    assert closed.is_set()
+    assert not bus._thread.is_alive()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import os
+import time
+
+from tevmc.logs import FileTailer, read_last_lines
+
+
+def read_n(reader, n: int, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    lines = []
+    for line in reader.iter_lines(deadline=deadline):
+        lines.append(line)
+        if len(lines) == n:
+            break
+
+    return lines
+
+
+def test_read_last_lines(tmp_path):
+    log = tmp_path / 'nodeos.log'
+    log.write_bytes(b''.join(f'line {i}\n'.encode() for i in range(10_000)))
+
+    fd = os.open(log, os.O_RDONLY)
+    try:
+        assert read_last_lines(fd, 3, block_size=7) == [
+            b'line 9997\n', b'line 9998\n', b'line 9999\n']
+        assert len(read_last_lines(fd, 20_000)) == 10_000
+        assert read_last_lines(fd, 0) == []
+
+    finally:
+        os.close(fd)
+
+
+def test_tailer_backlog_and_follow(tmp_path):
+    log = tmp_path / 'telosevm-translator.log'
+    log.write_text('a\nb\nc\n')
+
+    tailer = FileTailer(log, poll_interval=0.05)
+    try:
+        first = tailer.subscribe(backlog=2)
+        second = tailer.subscribe()
+
+        with open(log, 'a') as f:
+            f.write('d\npartial')
+            f.flush()
+            time.sleep(0.2)
+            f.write(' line\n')
+
+        assert read_n(first, 4) == ['b\n', 'c\n', 'd\n', 'partial line\n']
+        assert read_n(second, 2) == ['d\n', 'partial line\n']
+
+    finally:
+        tailer.close()
+
+
+def test_tailer_truncation_and_rotation(tmp_path):
+    log = tmp_path / 'nodeos.log'
+    log.write_text('')
+
+    tailer = FileTailer(log, poll_interval=0.05)
+    try:
+        reader = tailer.subscribe()
+
+        with open(log, 'a') as f:
+            f.write('before truncate\n')
+
+        assert read_n(reader, 1) == ['before truncate\n']
+
+        # logrotate copytruncate
+        with open(log, 'r+') as f:
+            f.truncate(0)
+
+        time.sleep(0.2)
+        with open(log, 'a') as f:
+            f.write('after truncate\n')
+
+        assert read_n(reader, 1) == ['after truncate\n']
+
+        # rename + create rotation
+        with open(log, 'a') as f:
+            f.write('last old line\n')
+        log.rename(tmp_path / 'nodeos.log.1')
+        log.write_text('first new line\n')
+
+        assert read_n(reader, 2) == ['last old line\n', 'first new line\n']
+
+    finally:
+        tailer.close()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from tevmc.metrics import MetricsRegistry, MetricsSampler, container_usage
+
+
+def test_registry_render():
+    registry = MetricsRegistry()
+    registry.gauge('nodeos_head_block', 'Head.').set(100)
+    registry.gauge('container_cpu_ratio', 'Cpu.').set(0.5, container='nodeos')
+
+    text = registry.render()
+    assert '# TYPE tevmc_nodeos_head_block gauge\n' in text
+    assert 'tevmc_nodeos_head_block 100\n' in text
+    assert 'tevmc_container_cpu_ratio{container="nodeos"} 0.5\n' in text
+
+    # unchanged registry returns the cached exposition
+    assert registry.render() is text
+
+    registry.gauge('container_cpu_ratio', 'Cpu.').replace({})
+    assert 'container_cpu_ratio' not in registry.render()
+
+
+def test_timed_operations():
+    registry = MetricsRegistry()
+    with registry.timed('check'):
+        ...
+
+    with pytest.raises(ValueError):
+        with registry.timed('restart', service='rpc'):
+            raise ValueError
+
+    text = registry.render()
+    assert '# TYPE tevmc_operation_duration_seconds summary' in text
+    assert 'tevmc_operation_duration_seconds_count{operation="check"} 1\n' in text
+    assert (
+        'tevmc_operations_total{operation="restart",service="rpc",status="error"} 1\n'
+        in text)
+
+
+def test_sampler_marks_failing_collectors():
+    registry = MetricsRegistry()
+
+    def _good(registry):
+        registry.gauge('value', 'Value.').set(1)
+
+    def _bad(registry):
+        raise ConnectionError
+
+    MetricsSampler(registry, [_good, _bad]).collect()
+    text = registry.render()
+    assert 'tevmc_value 1\n' in text
+    assert 'tevmc_collector_up{collector="good"} 1\n' in text
+    assert 'tevmc_collector_up{collector="bad"} 0\n' in text
+
+
+def test_container_usage():
+    usage = container_usage({
+        'cpu_stats': {
+            'cpu_usage': {'total_usage': 300},
+            'system_cpu_usage': 1000,
+            'online_cpus': 4
+        },
+        'precpu_stats': {
+            'cpu_usage': {'total_usage': 100},
+            'system_cpu_usage': 600
+        },
+        'memory_stats': {
+            'usage': 1000, 'limit': 4000, 'stats': {'inactive_file': 200}
+        },
+        'networks': {
+            'eth0': {'rx_bytes': 10, 'tx_bytes': 20},
+            'eth1': {'rx_bytes': 1, 'tx_bytes': 2}
+        }
+    })
+    assert usage['cpu_ratio'] == pytest.approx(2.0)
+    assert usage['memory_bytes'] == 800
+    assert usage['network_rx_bytes'] == 11
+    assert usage['network_tx_bytes'] == 22
+
+    # first sample of a stream has no previous cpu figures
+    assert container_usage({})['cpu_ratio'] == 0.0
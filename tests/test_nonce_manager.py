@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+
+import rlp
+
+from leap.cleos import CLEOS
+
+from tevmc.cleos_evm import CLEOSEVM, EVMTransaction, NonceManager
+
+
+SENDER = '0x' + 'ab' * 20
+
+
+class FakeCLEOSEVM(CLEOSEVM):
+    '''Table reads & pushes recorded instead of hitting nodeos.
+    '''
+
+    def __init__(self, gas_price_ttl: float = 60.0):
+        self.logger = logging.getLogger('test')
+        self.reads = []
+        self.push_results = []
+        self.chain_nonce = 3
+        self.gas_price = 7
+        self._init_tx_state(gas_price_ttl)
+
+    def eth_get_transaction_count(self, addr):
+        self.reads.append('nonce')
+        return self.chain_nonce
+
+    def eth_gas_price(self):
+        self.reads.append('gas_price')
+        return self.gas_price
+
+
+def fake_push_action(cleos, account, action, data, auth, **kwargs):
+    if cleos.push_results:
+        return cleos.push_results.pop(0)
+
+    return 0, json.dumps({'processed': {}})
+
+
+def raw_nonce(cleos) -> int:
+    raw_tx = cleos.eth_raw_tx(SENDER, '', '0x5208', 1, '0x' + '00' * 20)
+    return rlp.decode(bytes.fromhex(raw_tx), EVMTransaction).nonce
+
+
+def test_nonce_manager_reserves_ranges():
+    fetched = []
+
+    def fetch(sender):
+        fetched.append(sender)
+        return 10
+
+    nonces = NonceManager(fetch)
+    assert nonces.reserve(SENDER) == 10
+    assert nonces.reserve(SENDER.upper().replace('0X', '0x'), 3) == 11
+    assert nonces.reserve(SENDER[2:]) == 14
+    assert len(fetched) == 1
+
+    nonces.resync(SENDER)
+    assert nonces.reserve(SENDER) == 10
+    assert len(fetched) == 2
+
+
+def test_raw_txs_reuse_nonce_and_gas_price():
+    cleos = FakeCLEOSEVM()
+    assert [raw_nonce(cleos) for _ in range(4)] == [3, 4, 5, 6]
+    assert cleos.reads == ['nonce', 'gas_price']
+
+
+def test_failed_transfer_resyncs_nonce(monkeypatch):
+    monkeypatch.setattr(CLEOS, 'push_action', fake_push_action, raising=False)
+
+    cleos = FakeCLEOSEVM()
+    cleos.push_results = [(0, 'ok'), (1, 'nonce mismatch')]
+    to = '0x' + '00' * 20
+
+    class Quantity:
+        amount = 1
+
+    assert cleos.eth_transfer('evmuser1', SENDER, to, Quantity())[0] == 0
+    assert cleos.eth_transfer('evmuser1', SENDER, to, Quantity())[0] == 1
+
+    # chain only saw the first one, next transfer re reads the nonce
+    cleos.chain_nonce = 4
+    assert raw_nonce(cleos) == 4
+    assert cleos.reads.count('nonce') == 2
+
+
+def test_gas_price_cache_ttl_and_config_actions(monkeypatch):
+    monkeypatch.setattr(CLEOS, 'push_action', fake_push_action, raising=False)
+
+    cleos = FakeCLEOSEVM()
+    assert cleos.cached_gas_price() == 7
+    cleos.gas_price = 9
+    assert cleos.cached_gas_price() == 7
+
+    # unrelated actions keep the cache
+    cleos.push_action('eosio.token', 'transfer', [], 'eosio@active')
+    assert cleos.cached_gas_price() == 7
+
+    cleos.push_action('eosio.evm', 'setrevision', [2], 'eosio.evm@active')
+    assert cleos.cached_gas_price() == 9
+
+    cleos.gas_price = 11
+    cleos.gas_price_ttl = 0
+    assert cleos.cached_gas_price() == 11
@@ -6,7 +6,17 @@ from datetime import datetime
 
 import pytest
 
-from tevmc.testing.database import ElasticDriver, ElasticDataIntegrityError
+from tevmc.testing.database import (
+    INTEGRITY_CHECKPOINT,
+    ElasticDriver,
+    ElasticDataIntegrityError,
+    ESDuplicatesFound,
+    ESGapFound,
+    ESHashChainBroken,
+    IntegrityCheckpoint
+)
+
+from tevmc.testing.async_database import SyncElasticDriver
 
 from conftest import prepare_db_for_test
 
@@ -32,6 +42,15 @@ def test_python_elastic_integrity_tool(tevmc_local):
 
     assert 'Gap found! 121' in str(error)
 
+    # every gap gets reported, not just the first one
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 120), (122, 150), (160, 200)])
+
+    with pytest.raises(ESGapFound) as error:
+        elastic.full_integrity_check()
+
+    assert error.value.gaps == [(121, 121), (151, 159)]
+
     # whole index gap
     prepare_db_for_test(
         tevmc, datetime.now(), [(1, 1), (20_000_000, 20_000_000)])
@@ -41,6 +60,12 @@ def test_python_elastic_integrity_tool(tevmc_local):
 
     assert 'Gap found! 2' in str(error)
 
+    # same result when checking indices in parallel
+    with pytest.raises(ESGapFound) as error:
+        elastic.full_integrity_check(workers=4)
+
+    assert error.value.gaps == [(2, 19_999_999)]
+
     # duplicate block range
     prepare_db_for_test(
         tevmc, datetime.now(), [(100, 200), (150, 151)])
@@ -49,6 +74,16 @@ def test_python_elastic_integrity_tool(tevmc_local):
         elastic.full_integrity_check()
 
     assert 'Duplicates found!' in str(error)
+    assert error.value.delta_dups == [150, 151]
+
+    # more than a single terms agg page worth of duplicates
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 400), (100, 350)])
+
+    with pytest.raises(ESDuplicatesFound) as error:
+        elastic.full_integrity_check()
+
+    assert error.value.delta_dups == list(range(100, 351))
 
     # duplicate by hash
     test_hash = sha256(b'test_tx').hexdigest()
@@ -63,3 +98,181 @@ def test_python_elastic_integrity_tool(tevmc_local):
         elastic.full_integrity_check()
 
     assert 'Duplicates found!' in str(error)
+
+    # duplicate by hash across indices, far from their boundary
+    txs = [
+        {'@raw.block': 110, '@raw.hash': test_hash},
+        {'@raw.block': 390, '@raw.hash': test_hash}
+    ]
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 400)], txs=txs, docs_per_index=100)
+
+    elastic.docs_per_index = 100
+    with pytest.raises(ESDuplicatesFound) as error:
+        elastic.full_integrity_check(workers=4)
+
+    assert error.value.action_dups == [test_hash]
+
+
+@pytest.mark.randomize(False)
+@pytest.mark.services('elastic', 'kibana')
+def test_python_elastic_integrity_checkpoint(tevmc_local, tmp_path):
+    tevmc = tevmc_local
+    checkpoint_path = tmp_path / INTEGRITY_CHECKPOINT
+    elastic = ElasticDriver(tevmc.config, checkpoint_path=checkpoint_path)
+
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 200)])
+
+    elastic.full_integrity_check()
+
+    checkpoint = IntegrityCheckpoint(checkpoint_path)
+    assert checkpoint.watermark == 200
+    assert [
+        summary['docs'] for summary in checkpoint.indices.values()
+        if summary['max'] is not None
+    ] == [101]
+
+    # re-created indices don't match their checkpoint summary
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 120), (122, 200)])
+
+    with pytest.raises(ESGapFound) as error:
+        elastic.full_integrity_check()
+
+    assert error.value.gaps == [(121, 121)]
+
+    # unhealthy checks leave the checkpoint as is
+    assert IntegrityCheckpoint(checkpoint_path).watermark == 200
+
+    # full check ignores the checkpoint
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 250)])
+
+    report = elastic.full_integrity_check(full=True)
+    assert report.blocks == 151
+    assert IntegrityCheckpoint(checkpoint_path).watermark == 250
+
+
+@pytest.mark.randomize(False)
+@pytest.mark.services('elastic', 'kibana')
+def test_python_elastic_hash_chain_check(tevmc_local):
+    tevmc = tevmc_local
+    elastic = ElasticDriver(tevmc.config)
+
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 200)])
+
+    report = elastic.full_integrity_check(hash_chain=True)
+    assert report.hash_breaks == []
+
+    # number continuity alone misses forked blocks
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 200)], broken_links=[120, 121, 150])
+
+    elastic.full_integrity_check()
+
+    with pytest.raises(ESHashChainBroken) as error:
+        elastic.full_integrity_check(hash_chain=True)
+
+    assert error.value.breaks == [(120, 121), (150, 150)]
+
+    # links across index boundaries get stitched
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 300)],
+        docs_per_index=100, broken_links=[200])
+
+    elastic.docs_per_index = 100
+    with pytest.raises(ESHashChainBroken) as error:
+        elastic.full_integrity_check(workers=3, hash_chain=True)
+
+    assert error.value.breaks == [(200, 200)]
+
+
+@pytest.mark.randomize(False)
+@pytest.mark.services('elastic', 'kibana')
+def test_python_elastic_hash_chain_checkpoint(tevmc_local, tmp_path):
+    tevmc = tevmc_local
+    checkpoint_path = tmp_path / INTEGRITY_CHECKPOINT
+    elastic = ElasticDriver(tevmc.config, checkpoint_path=checkpoint_path)
+
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 200)], broken_links=[120])
+
+    # plain checks move the watermark past links they never verified
+    elastic.full_integrity_check()
+    assert IntegrityCheckpoint(checkpoint_path).watermark == 200
+
+    with pytest.raises(ESHashChainBroken) as error:
+        elastic.full_integrity_check(hash_chain=True)
+
+    assert error.value.breaks == [(120, 120)]
+    assert IntegrityCheckpoint(checkpoint_path).watermark == 200
+
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 200)])
+
+    elastic.full_integrity_check(hash_chain=True)
+    checkpoint = IntegrityCheckpoint(checkpoint_path)
+    assert all(
+        summary['hash_chain'] for summary in checkpoint.indices.values())
+
+
+@pytest.mark.randomize(False)
+@pytest.mark.services('elastic', 'kibana')
+def test_python_elastic_repair(tevmc_local):
+    tevmc = tevmc_local
+    elastic = ElasticDriver(tevmc.config)
+    elastic.docs_per_index = 100
+
+    # gap, everything from the last block before it gets purged
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(50, 250), (260, 450)], docs_per_index=100)
+
+    assert elastic.repair_data() == (239, 249)
+    assert elastic.get_last_indexed_block().global_block_num == 249
+    elastic.full_integrity_check()
+
+    # duplicates, purge from the earliest duplicated block
+    test_hash = sha256(b'test_tx').hexdigest()
+    txs = [
+        {'@raw.block': 210, '@raw.hash': test_hash},
+        {'@raw.block': 220, '@raw.hash': test_hash}
+    ]
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(50, 450), (300, 301)],
+        txs=txs, docs_per_index=100)
+
+    assert elastic.repair_data() == (199, 209)
+    elastic.full_integrity_check()
+
+
+@pytest.mark.randomize(False)
+@pytest.mark.services('elastic', 'kibana')
+def test_python_elastic_async_driver(tevmc_local):
+    tevmc = tevmc_local
+    elastic = SyncElasticDriver(tevmc.config)
+
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 200)])
+
+    report = elastic.full_integrity_check(workers=4, hash_chain=True)
+    assert report.blocks == 101
+    assert elastic.get_first_indexed_block().global_block_num == 100
+    assert elastic.get_last_indexed_block().global_block_num == 200
+
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 120), (122, 150), (160, 200)])
+
+    with pytest.raises(ESGapFound) as error:
+        elastic.full_integrity_check(workers=4)
+
+    assert error.value.gaps == [(121, 121), (151, 159)]
+
+    prepare_db_for_test(
+        tevmc, datetime.now(), [(100, 400), (100, 350)])
+
+    with pytest.raises(ESDuplicatesFound) as error:
+        elastic.full_integrity_check(workers=4)
+
+    assert error.value.delta_dups == list(range(100, 351))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+
+import pytest
+
+from tevmc.scheduler import StartupCancelled, StartupScheduler
+
+
+def test_scheduler_respects_dependencies_and_runs_concurrently():
+    order = []
+    lock = threading.Lock()
+
+    def service(name, delay):
+        def _start():
+            time.sleep(delay)
+            with lock:
+                order.append(name)
+        return _start
+
+    scheduler = StartupScheduler()
+    scheduler.add('redis', service('redis', 0.3))
+    scheduler.add('elastic', service('elastic', 0.3))
+    scheduler.add('nodeos', service('nodeos', 0.3))
+    scheduler.add('indexer', service('indexer', 0.1), depends=['elastic', 'nodeos'])
+    scheduler.add('rpc', service('rpc', 0.1), depends=['redis', 'elastic', 'indexer'])
+
+    start = time.monotonic()
+    scheduler.run()
+    elapsed = time.monotonic() - start
+
+    assert order[-2:] == ['indexer', 'rpc']
+    # independent services overlapped instead of adding up
+    assert elapsed < 0.9
+
+    timeline = scheduler.timeline()
+    assert timeline['indexer'][0] >= timeline['nodeos'][1]
+    assert timeline['rpc'][0] >= timeline['indexer'][1]
+    assert len(scheduler.report()) == 5
+
+
+def test_scheduler_sequential_mode():
+    order = []
+    scheduler = StartupScheduler(max_workers=1)
+    for name in ['redis', 'elastic', 'kibana']:
+        scheduler.add(name, lambda name=name: order.append(name))
+
+    scheduler.run()
+    assert order == ['redis', 'elastic', 'kibana']
+
+
+def test_scheduler_failure_and_timeout():
+    started = []
+
+    def fail():
+        raise RuntimeError('boom')
+
+    scheduler = StartupScheduler()
+    scheduler.add('nodeos', fail)
+    scheduler.add('indexer', lambda: started.append('indexer'), depends=['nodeos'])
+
+    with pytest.raises(RuntimeError, match='boom'):
+        scheduler.run()
+
+    assert started == []
+
+    late = []
+    finished = threading.Event()
+
+    def slow():
+        time.sleep(0.5)
+        try:
+            scheduler.check_cancelled()
+            late.append('container')
+
+        except StartupCancelled:
+            ...
+
+        finished.set()
+
+    scheduler = StartupScheduler()
+    scheduler.add('elastic', slow, timeout=0.2)
+
+    with pytest.raises(TimeoutError):
+        scheduler.run()
+
+    # the timed out task keeps running but can't start anything else
+    assert scheduler.cancelled.is_set()
+    assert finished.wait(timeout=5)
+    assert late == []
+
+
+def test_scheduler_rejects_bad_graphs():
+    scheduler = StartupScheduler()
+    scheduler.add('a', lambda: None, depends=['b'])
+    scheduler.add('b', lambda: None, depends=['a'])
+
+    with pytest.raises(ValueError, match='cycle'):
+        scheduler.run()
+
+    scheduler = StartupScheduler()
+    scheduler.add('a', lambda: None, depends=['missing'])
+
+    with pytest.raises(ValueError, match='unknown'):
+        scheduler.run()
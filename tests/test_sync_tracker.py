@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from tevmc.sync import SyncTracker, default_remote_endpoint, parse_block_num
+
+
+def make_tracker(heads: dict, **kwargs):
+    def source(name):
+        def _get():
+            value = heads[name]
+            if isinstance(value, Exception):
+                raise value
+
+            return value
+
+        return _get
+
+    return SyncTracker(
+        source('indexed'), source('local'), source('remote'), **kwargs)
+
+
+def test_rate_and_eta():
+    heads = {'indexed': (1000, 900), 'local': 5000, 'remote': 11000}
+    tracker = make_tracker(heads, window=10.0)
+
+    snap = tracker.sample(now=0.0)
+    assert snap['behind'] == 10_000
+    assert snap['blocks_per_sec'] is None
+    assert snap['eta'] is None
+
+    # first rate measurement is taken as is
+    heads['indexed'] = (2000, 1900)
+    snap = tracker.sample(now=10.0)
+    assert snap['blocks_per_sec'] == pytest.approx(100.0)
+    assert snap['eta'] == pytest.approx(90.0)
+
+    # then smoothed, weighted by elapsed time
+    heads['indexed'] = (2500, 2400)
+    snap = tracker.sample(now=20.0)
+    assert 50.0 < snap['blocks_per_sec'] < 100.0
+
+    # sub second updates move the head but not the rate
+    rate = snap['blocks_per_sec']
+    assert not tracker.observe(2600, now=20.5)
+    assert tracker.rate == rate
+    assert tracker.indexed_block == 2600
+
+
+def test_failing_sources_keep_last_value():
+    heads = {'indexed': (10, 5), 'local': 20, 'remote': 30}
+    tracker = make_tracker(heads, remote_interval=60.0)
+    tracker.sample(now=0.0)
+
+    heads['local'] = ConnectionError('nodeos down')
+    heads['remote'] = 40
+    snap = tracker.sample(now=10.0)
+
+    # remote only polled every remote_interval
+    assert snap['remote_head'] == 30
+    assert snap['local_head'] == 20
+
+    snap = tracker.sample(now=61.0)
+    assert snap['remote_head'] == 40
+    assert snap['behind'] == 30
+
+
+def test_updates_stream_latest():
+    heads = {'indexed': (10, 5), 'local': 20, 'remote': 100}
+    tracker = make_tracker(heads)
+
+    updates = tracker.updates(timeout=0.1)
+    assert next(updates)['indexed_block'] is None
+
+    heads['indexed'] = (50, 45)
+    tracker.sample(now=0.0)
+    heads['indexed'] = (60, 55)
+    tracker.sample(now=1.0)
+
+    # only the latest snapshot is kept for slow readers
+    assert next(updates)['indexed_block'] == 60
+    assert list(updates) == []
+
+
+def test_helpers():
+    assert parse_block_num('1,234') == 1234
+    assert parse_block_num('NaN') is None
+    assert default_remote_endpoint(
+        'telos-mainnet', 'http://127.0.0.1:8888') == 'https://mainnet.telos.net'
+    assert default_remote_endpoint(
+        'telos-local', 'http://127.0.0.1:8888') == 'http://127.0.0.1:8888'
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import tracemalloc
+
+from tevmc.testing.synthetic import (
+    SyntheticChain,
+    WorkloadSpec,
+    es_documents,
+    ship_block_hashes
+)
+
+
+def test_same_seed_same_chain():
+    spec = WorkloadSpec(seed=7, txs_per_block=5)
+    first = list(SyntheticChain(spec).blocks(100, 150))
+    second = list(SyntheticChain(spec).blocks(100, 150))
+    assert first == second
+
+    other = list(SyntheticChain(spec._replace(seed=8)).blocks(100, 150))
+    assert [b['hash'] for b in first] != [b['hash'] for b in other]
+
+    # hash chain links no matter where generation starts
+    late = next(SyntheticChain(spec).blocks(125))
+    assert late['hash'] == first[25]['hash']
+    assert late['prev_hash'] == first[24]['hash']
+    assert ship_block_hashes(SyntheticChain(spec), 150)[100:] == [
+        b['hash'] for b in first]
+
+
+def test_workload_shape():
+    spec = WorkloadSpec(
+        seed=1,
+        txs_per_block=20,
+        logs_per_tx=3,
+        log_data_bytes=128,
+        itxs_per_tx=2,
+        create_ratio=0.25,
+        accounts=50,
+        block_delta=36)
+    blocks = list(SyntheticChain(spec).blocks(1000, 1199))
+    txs = [tx for block in blocks for tx in block['transactions']]
+
+    assert 17 < len(txs) / len(blocks) < 23
+    assert 2.5 < sum(len(tx['logs']) for tx in txs) / len(txs) < 3.5
+    assert 1.5 < sum(len(tx['itxs']) for tx in txs) / len(txs) < 2.5
+    assert all(len(log['data']) == 2 + 2 * 128 for tx in txs for log in tx['logs'])
+
+    creations = [tx for tx in txs if tx['to'] is None]
+    assert 0.2 < len(creations) / len(txs) < 0.3
+    assert all(tx['createdaddr'] for tx in creations)
+
+    assert blocks[0]['evm_block_num'] == 964
+    assert all(tx['block'] == 964 for tx in blocks[0]['transactions'])
+
+    # per sender nonces count up without gaps
+    nonces = {}
+    for tx in txs:
+        assert tx['nonce'] == nonces.get(tx['from'], 0)
+        nonces[tx['from']] = tx['nonce'] + 1
+
+
+def test_es_documents():
+    chain = SyntheticChain(WorkloadSpec(seed=3, txs_per_block=4))
+    blocks = list(chain.blocks(10, 12))
+    docs = list(es_documents(blocks, 'telos-local', docs_per_index=11))
+
+    deltas = [doc for doc in docs if '-delta-' in doc['_index']]
+    actions = [doc for doc in docs if '-action-' in doc['_index']]
+    assert [doc['_source']['@global']['block_num'] for doc in deltas] == [10, 11, 12]
+    assert deltas[0]['_index'] == 'telos-local-delta-v1.5-00000000'
+    assert deltas[1]['_index'] == 'telos-local-delta-v1.5-00000001'
+    assert (deltas[1]['_source']['@evmPrevBlockHash'] ==
+        deltas[0]['_source']['@evmBlockHash'])
+    assert len(actions) == sum(len(b['transactions']) for b in blocks)
+
+
+def test_streaming_memory_is_constant():
+    chain = SyntheticChain(WorkloadSpec(seed=5, txs_per_block=10, accounts=100))
+
+    def peak(amount: int) -> int:
+        tracemalloc.start()
+        for _ in es_documents(chain.blocks(0, amount), 'telos-local'):
+            ...
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    small = peak(100)
+    large = peak(1000)
+    assert large < small * 1.5
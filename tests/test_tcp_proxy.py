@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import socket
+import threading
+
+from tevmc.proxy import TCPProxy
+
+
+def echo_server(tag: bytes):
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+
+    def _serve(conn):
+        with conn:
+            while data := conn.recv(1024):
+                conn.sendall(tag + data)
+
+    def _accept():
+        while True:
+            try:
+                conn, _ = server.accept()
+
+            except OSError:
+                break
+
+            threading.Thread(target=_serve, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=_accept, daemon=True).start()
+    return server, server.getsockname()
+
+
+def request(conn, data: bytes) -> bytes:
+    conn.sendall(data)
+    return conn.recv(1024)
+
+
+def test_switch_and_drain():
+    old_server, old = echo_server(b'old:')
+    new_server, new = echo_server(b'new:')
+
+    proxy = TCPProxy(('127.0.0.1', 0), old)
+    proxy.start()
+    try:
+        kept = socket.create_connection(proxy.listen)
+        assert request(kept, b'a') == b'old:a'
+        assert proxy.active(old) == 1
+
+        proxy.switch(new)
+
+        # new connections go to the new backend, open ones stay put
+        with socket.create_connection(proxy.listen) as conn:
+            assert request(conn, b'b') == b'new:b'
+
+        assert request(kept, b'c') == b'old:c'
+        assert not proxy.wait_drained(old, timeout=0.1)
+
+        kept.close()
+        assert proxy.wait_drained(old, timeout=5)
+        assert proxy.wait_drained(new, timeout=5)
+
+    finally:
+        proxy.close()
+        old_server.close()
+        new_server.close()
+
+
+def test_bind_waits_for_port():
+    holder = socket.socket()
+    holder.bind(('127.0.0.1', 0))
+    holder.listen()
+    address = holder.getsockname()
+
+    threading.Timer(0.2, holder.close).start()
+    proxy = TCPProxy(address, address)
+    proxy.bind(timeout=5)
+    assert proxy.listen == address
+    proxy.close()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import json
+
+from copy import deepcopy
+
+import pytest
+
+from tevmc.config import local
+from tevmc.sweep import SweepRun, format_sweep_table, run_sweep, sweep_grid
+
+
+class Block:
+
+    def __init__(self, block_num):
+        self.block_num = block_num
+
+
+class FakeNodes:
+
+    def __init__(self):
+        self.operations = 0
+
+    def stats(self, **kwargs):
+        return {'nodes': {'n0': {'indices': {'bulk': {
+            'total_operations': self.operations,
+            'total_time_in_millis': self.operations * 20,
+            'total_size_in_bytes': self.operations * 1000
+        }}}}}
+
+
+class FakeElastic:
+    '''Indexed head & bulk totals scripted per sample.
+    '''
+
+    def __init__(self, heads):
+        self.heads = list(heads)
+        self.head = None
+        self.elastic = self
+        self.nodes = FakeNodes()
+
+    def index_catalog(self, refresh=False):
+        ...
+
+    def get_last_indexed_block(self):
+        if self.heads:
+            self.head = self.heads.pop(0)
+            self.nodes.operations += 5
+
+        return Block(self.head) if self.head is not None else None
+
+
+class FakeStats:
+
+    def __init__(self, memory):
+        self.latest = {'memory_bytes': memory}
+
+
+def test_sweep_grid():
+    grid = sweep_grid([1, 4], [256], [1000, 2000])
+    assert len(grid) == 4
+    assert grid[0] == {
+        'worker_amount': 1, 'elastic_dump_size': 256, 'elastic_timeout': 1000}
+
+
+def test_sweep_run_result_and_table():
+    es = FakeElastic([None, 100, 500, 1000])
+    run = SweepRun(es, 1, 1000, poll_interval=0.01)
+    run.begin()
+    done = [
+        run.sample(FakeStats(memory)) for memory in (10, 30, 20, 40)]
+    run.finish()
+
+    assert done == [False, False, False, True]
+
+    params = {
+        'worker_amount': 4, 'elastic_dump_size': 256, 'elastic_timeout': 1000}
+    result = run.result(params)
+    assert result['status'] == 'ok'
+    assert result['head'] == 1000
+    assert result['blocks_per_sec'] > 0
+    assert result['bulk_requests'] == 20
+    assert result['bulk_mean_ms'] == pytest.approx(20)
+    assert result['memory_peak_bytes'] == 40
+    assert result['memory_mean_bytes'] == pytest.approx(25)
+
+    slow = SweepRun(FakeElastic([10]), 1, 1000)
+    slow.begin()
+    slow.sample()
+    slow.finish()
+    timed_out = slow.result({**params, 'worker_amount': 1})
+    assert timed_out['status'] == 'timeout'
+    assert timed_out['blocks_per_sec'] is None
+
+    table = format_sweep_table([timed_out, result]).splitlines()
+    assert len(table) == 3
+    assert table[1].split()[:4] == ['4', '256', '1000', 'ok']
+    assert table[2].split()[3] == 'timeout'
+
+
+# ship mocker ports are fixed, see the ship_mocker fixture
+sweep_config = deepcopy(local.default_config)
+sweep_config['telosevm-translator']['endpoint'] = 'http://127.0.0.1:29999'
+sweep_config['telosevm-translator']['ws_endpoint'] = 'ws://127.0.0.1:29999'
+
+start_block = 1
+end_block = 20_000
+
+
+@pytest.mark.config(**sweep_config)
+@pytest.mark.services('elastic', 'indexer')
+@pytest.mark.start_block(start_block)
+@pytest.mark.end_block(end_block)
+def test_translator_sweep(ship_mocker, tevmc_local, tmp_path):
+    tevmc = tevmc_local
+    results = run_sweep(
+        tevmc,
+        ship_mocker,
+        sweep_grid([1, 4, 16], [256, 1024, 4096], [60 * 1000]),
+        start_block,
+        end_block)
+
+    tevmc.logger.info('\n' + format_sweep_table(results))
+    (tmp_path / 'sweep.json').write_text(json.dumps(results, indent=4))
+
+    assert all(result['status'] == 'ok' for result in results)
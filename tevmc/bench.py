@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+
+import time
+import queue
+import random
+import logging
+import traceback
+import multiprocessing
+
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from leap.sugar import Asset, random_string
+
+
+# tx kinds a bench worker can submit:
+#   raw: signed evm transfer pushed as a native eosio.evm raw action
+#   web3: signed evm transfer sent through eth_sendRawTransaction
+#   deploy: contract creation sent through eth_sendRawTransaction
+BENCH_KINDS = ('raw', 'web3', 'deploy')
+
+DEFAULT_MIX = 'raw=60,web3=30,deploy=10'
+
+# submission -> nodeos accepted the trx, -> translator indexed it in ES,
+# -> rpc returns its receipt
+STAGES = ('included', 'indexed', 'visible')
+
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+# upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+TRANSFER_GAS = 21000
+DEPLOY_GAS = 200000
+
+# init code of a contract whose runtime code returns 42
+DEPLOY_CODE = '0x600a600c600039600a6000f3602a60005260206000f3'
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    '''Parse a ``kind=weight,...`` tx mix, weights get normalized.
+    '''
+    weights = {}
+    for part in mix.split(','):
+        if not part.strip():
+            continue
+
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in BENCH_KINDS:
+            raise ValueError(
+                f'unknown tx kind \"{kind}\", expected one of {BENCH_KINDS}')
+
+        weights[kind] = float(weight) if weight else 1.0
+
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f'tx mix \"{mix}\" has no weight')
+
+    return {kind: weight / total for kind, weight in weights.items()}
+
+
+def pick_kind(rng: random.Random, mix: Dict[str, float]) -> str:
+    point = rng.random()
+    for kind, weight in mix.items():
+        point -= weight
+        if point < 0:
+            return kind
+
+    return kind
+
+
+def latency_stats(
+    samples: Sequence[float],
+    percentiles: Iterable[int] = DEFAULT_PERCENTILES,
+    buckets: Iterable[float] = DEFAULT_BUCKETS
+) -> Dict:
+    '''Count, min, max, mean, nearest rank percentiles & a histogram (per
+    bucket counts, the last bucket is unbounded) of latency ``samples``.
+    '''
+    samples = sorted(samples)
+    buckets = list(buckets)
+    histogram = [0] * (len(buckets) + 1)
+    i = 0
+    for sample in samples:
+        while i < len(buckets) and sample > buckets[i]:
+            i += 1
+
+        histogram[i] += 1
+
+    stats = {
+        'count': len(samples),
+        'min': samples[0] if samples else None,
+        'max': samples[-1] if samples else None,
+        'mean': sum(samples) / len(samples) if samples else None
+    }
+    for p in percentiles:
+        rank = max(int(-(-len(samples) * p // 100)), 1)
+        stats[f'p{p}'] = samples[rank - 1] if samples else None
+
+    stats['histogram'] = [
+        {'le': le, 'count': count}
+        for le, count in zip([*buckets, 'inf'], histogram)
+    ]
+    return stats
+
+
+def new_record(kind: str, worker: int) -> Dict:
+    return {
+        'kind': kind,
+        'worker': worker,
+        'hash': None,
+        'submitted': time.time(),
+        'included': None,
+        'indexed': None,
+        'visible': None,
+        'error': None
+    }
+
+
+class LatencyTracker:
+    '''Stamps indexed & visible times on submitted tx records by polling
+    ES and the rpc for every hash still pending, a batch per poll.
+
+    Timestamps are taken when the poll sees the tx, so their resolution is
+    the poll interval.
+    '''
+
+    def __init__(
+        self,
+        indexed_lookup: Callable[[List[str]], Set[str]],
+        visible_lookup: Callable[[List[str]], Set[str]],
+        batch_size: int = 500
+    ):
+        self.indexed_lookup = indexed_lookup
+        self.visible_lookup = visible_lookup
+        self.batch_size = batch_size
+        self.records: List[Dict] = []
+        self._pending: Dict[str, Dict[str, Dict]] = {
+            'indexed': {}, 'visible': {}}
+
+    def add(self, record: Dict):
+        self.records.append(record)
+        if record['error'] or not record['hash']:
+            return
+
+        for stage in self._pending:
+            self._pending[stage][record['hash']] = record
+
+    @property
+    def pending(self) -> int:
+        return sum(len(waiting) for waiting in self._pending.values())
+
+    def pending_for(self, stage: str) -> int:
+        return len(self._pending[stage])
+
+    def poll(self, now: Optional[float] = None):
+        lookups = {
+            'indexed': self.indexed_lookup,
+            'visible': self.visible_lookup
+        }
+        for stage, lookup in lookups.items():
+            waiting = self._pending[stage]
+            hashes = list(waiting)
+            for i in range(0, len(hashes), self.batch_size):
+                found = lookup(hashes[i:i + self.batch_size])
+                stamp = now if now is not None else time.time()
+                for tx_hash in found:
+                    record = waiting.pop(tx_hash, None)
+                    if record:
+                        record[stage] = stamp
+
+
+def _stage_stats(records: List[Dict], **kwargs) -> Dict:
+    return {
+        stage: latency_stats(
+            [
+                record[stage] - record['submitted']
+                for record in records if record[stage] is not None
+            ],
+            **kwargs
+        )
+        for stage in STAGES
+    }
+
+
+def build_report(
+    records: List[Dict],
+    started: float,
+    finished: float,
+    params: Optional[Dict] = None,
+    **kwargs
+) -> Dict:
+    '''JSON serializable bench report, overall & per tx kind.
+    '''
+    duration = max(finished - started, 1e-9)
+    failed = [record for record in records if record['error']]
+
+    errors: Dict[str, int] = {}
+    for record in failed:
+        errors[record['error']] = errors.get(record['error'], 0) + 1
+
+    kinds = {}
+    for kind in sorted({record['kind'] for record in records}):
+        of_kind = [record for record in records if record['kind'] == kind]
+        kinds[kind] = {
+            'submitted': len(of_kind),
+            'failed': sum(1 for record in of_kind if record['error']),
+            'stages': _stage_stats(of_kind, **kwargs)
+        }
+
+    stages = _stage_stats(records, **kwargs)
+    ok = len(records) - len(failed)
+    return {
+        'params': params if params else {},
+        'started': started,
+        'duration': duration,
+        'submitted': len(records),
+        'failed': len(failed),
+        'throughput': {
+            'submitted_tps': len(records) / duration,
+            'included_tps': stages['included']['count'] / duration
+        },
+        'unresolved': {
+            stage: ok - stages[stage]['count'] for stage in STAGES
+        },
+        'stages': stages,
+        'kinds': kinds,
+        'errors': errors
+    }
+
+
+def format_report(report: Dict) -> str:
+    '''Human readable latency table of a ``build_report`` report.
+    '''
+    percentiles = [
+        key for key in report['stages']['included'] if key.startswith('p')]
+    lines = [
+        f'{report["submitted"]} txs in {report["duration"]:.1f}s, '
+        f'{report["failed"]} failed, '
+        f'{report["throughput"]["submitted_tps"]:.2f} tx/s submitted, '
+        f'{report["throughput"]["included_tps"]:.2f} tx/s included',
+        '',
+        f'{"kind":<8} {"stage":<9} {"count":>7} '
+        + ' '.join(f'{p:>8}' for p in percentiles) + f' {"max":>8}'
+    ]
+
+    def _fmt(value):
+        return f'{value:8.3f}' if value is not None else f'{"-":>8}'
+
+    rows = [('all', report['stages'])] + [
+        (kind, info['stages']) for kind, info in report['kinds'].items()]
+    for kind, stages in rows:
+        for stage in STAGES:
+            stats = stages[stage]
+            lines.append(
+                f'{kind:<8} {stage:<9} {stats["count"]:>7} '
+                + ' '.join(_fmt(stats[p]) for p in percentiles)
+                + f' {_fmt(stats["max"])}')
+
+    return '\n'.join(lines)
+
+
+def bench_target(config: Dict, container: str) -> Dict:
+    '''Where bench workers connect to, ``container`` is the running nodeos
+    container name.
+    '''
+    nodeos_api_port = config['nodeos']['ini']['http_addr'].split(':')[1]
+    rpc_api_port = config['telos-evm-rpc']['api_port']
+    return {
+        'container': container,
+        'cleos_url': f'http://127.0.0.1:{nodeos_api_port}',
+        'evm_url': f'http://127.0.0.1:{rpc_api_port}/evm',
+        'chain_id': config['telos-evm-rpc']['chain_id']
+    }
+
+
+def open_cleos(target: Dict, logger: Optional[logging.Logger] = None):
+    import docker
+
+    from .cleos_evm import CLEOSEVM
+
+    client = docker.from_env()
+    return CLEOSEVM(
+        client,
+        client.containers.get(target['container']),
+        logger=logger if logger else logging.getLogger('tevmc.bench'),
+        url=target['cleos_url'],
+        evm_url=target['evm_url'],
+        chain_id=target['chain_id'])
+
+
+def fund_bench_accounts(
+    cleos,
+    workers: int,
+    funding: int = 1000
+) -> Tuple[str, List[str]]:
+    '''Create a native account paying for the raw pushes & one funded evm
+    key per worker, returns ``(payer, private_keys)``.
+
+    Funds come from ``eosio``, so this only works on local chains.
+    '''
+    from eth_account import Account
+
+    symbol = cleos.sys_token_supply.symbol
+    payer = cleos.new_account()
+    ec, out = cleos.create_evm_account(payer, random_string())
+    assert ec == 0, out
+
+    quantity = Asset(funding * (workers + 1), symbol)
+    cleos.transfer_token('eosio', payer, quantity, 'bench')
+    cleos.transfer_token(payer, 'eosio.evm', quantity, 'Deposit')
+
+    payer_addr = cleos.eth_account_from_name(payer)
+    assert payer_addr
+
+    keys = [Account.create() for _ in range(workers)]
+    for ec, out in cleos.eth_batch_transfer(
+        payer,
+        payer_addr,
+        [(key.address, Asset(funding, symbol)) for key in keys]
+    ):
+        assert ec == 0, out
+
+    return payer, [key.key.hex() for key in keys]
+
+
+def bench_worker(
+    target: Dict,
+    spec: Dict,
+    results: multiprocessing.Queue
+):
+    '''Worker process body, submits txs from its own evm key at
+    ``spec['rate']`` tx/s until ``spec['stop_at']`` and puts one record per
+    tx on ``results``, then a ``None``.
+    '''
+    from eth_account import Account
+
+    from .cleos_evm import EVM_CONTRACT, NonceManager
+
+    logger = logging.getLogger(f'tevmc.bench.{spec["worker"]}')
+    try:
+        cleos = open_cleos(target, logger=logger)
+        rpc = cleos.evm_rpc()
+        account = Account.from_key(spec['key'])
+        sink = Account.create().address
+        nonces = NonceManager(
+            lambda addr: cleos.eth_get_transaction_count(addr) or 0)
+        gas_price = cleos.cached_gas_price()
+        rng = random.Random(spec['seed'])
+        interval = 1.0 / spec['rate']
+
+        next_at = time.monotonic()
+        while time.time() < spec['stop_at']:
+            kind = pick_kind(rng, spec['mix'])
+            record = new_record(kind, spec['worker'])
+            try:
+                tx = {
+                    'nonce': nonces.reserve(account.address),
+                    'gasPrice': gas_price,
+                    'chainId': target['chain_id']
+                }
+                if kind == 'deploy':
+                    tx.update(gas=DEPLOY_GAS, value=0, data=DEPLOY_CODE)
+
+                else:
+                    tx.update(gas=TRANSFER_GAS, to=sink, value=1, data=b'')
+
+                signed = Account.sign_transaction(tx, account.key)
+                raw_tx = bytes(signed.rawTransaction).hex()
+                record['hash'] = '0x' + bytes(signed.hash).hex()
+                record['submitted'] = time.time()
+
+                if kind == 'raw':
+                    ec, out = cleos.push_action(
+                        EVM_CONTRACT,
+                        'raw',
+                        [spec['payer'], raw_tx, False, None],
+                        f'{spec["payer"]}@active'
+                    )
+                    if ec != 0:
+                        raise ValueError(f'raw push failed: {out}')
+
+                else:
+                    msg = rpc.call(
+                        'eth_sendRawTransaction', [f'0x{raw_tx}'])
+                    if not msg or 'error' in msg:
+                        raise ValueError(f'eth_sendRawTransaction failed: {msg}')
+
+                record['included'] = time.time()
+
+            except Exception as e:
+                record['error'] = f'{type(e).__name__}: {str(e)[:200]}'
+                nonces.resync(account.address)
+
+            results.put(record)
+
+            next_at += interval
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            else:
+                # behind schedule, don't burst to catch up
+                next_at = time.monotonic()
+
+    except BaseException:
+        logger.error(traceback.format_exc())
+
+    finally:
+        results.put(None)
+
+
+def run_bench(
+    cleos,
+    target: Dict,
+    elastic,
+    workers: int = 4,
+    rate: float = 10.0,
+    duration: float = 60.0,
+    mix: str = DEFAULT_MIX,
+    funding: int = 1000,
+    seed: int = 0,
+    poll_interval: float = 0.25,
+    settle_timeout: float = 60.0,
+    logger: Optional[logging.Logger] = None
+) -> Dict:
+    '''Fund ``workers`` evm keys, have a process per key submit the ``mix``
+    of txs at ``rate`` tx/s total for ``duration`` seconds and track every
+    tx until the rpc returns its receipt (or ``settle_timeout`` seconds
+    past the end of the run). Returns the ``build_report`` report.
+
+    ``elastic`` is an ``ElasticDriver`` for the stack under test.
+    '''
+    logger = logger if logger else logging.getLogger('tevmc.bench')
+    weights = parse_mix(mix)
+
+    logger.info(f'funding {workers} bench accounts...')
+    payer, keys = fund_bench_accounts(cleos, workers, funding=funding)
+
+    rpc = cleos.evm_rpc()
+
+    def _visible(hashes: List[str]) -> Set[str]:
+        receipts = rpc.batch(
+            ('eth_getTransactionReceipt', [tx_hash]) for tx_hash in hashes)
+        return {
+            tx_hash
+            for tx_hash, msg in zip(hashes, receipts)
+            if msg and msg.get('result')
+        }
+
+    tracker = LatencyTracker(elastic.indexed_tx_hashes, _visible)
+
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    started = time.time()
+    stop_at = started + duration
+    procs = []
+    for i, key in enumerate(keys):
+        spec = {
+            'worker': i,
+            'key': key,
+            'payer': payer,
+            'mix': weights,
+            'rate': rate / workers,
+            'seed': seed + i,
+            'stop_at': stop_at
+        }
+        proc = ctx.Process(
+            target=bench_worker, args=(target, spec, results), daemon=True)
+        proc.start()
+        procs.append(proc)
+
+    logger.info(f'bench running: {workers} workers, {rate} tx/s, {mix}')
+    running = workers
+    last_poll = 0.0
+    while running or (
+        tracker.pending and time.time() < stop_at + settle_timeout
+    ):
+        try:
+            record = results.get(timeout=poll_interval)
+            if record is None:
+                running -= 1
+
+            else:
+                tracker.add(record)
+
+        except queue.Empty:
+            ...
+
+        if time.monotonic() - last_poll >= poll_interval:
+            tracker.poll()
+            last_poll = time.monotonic()
+
+    finished = time.time()
+    for proc in procs:
+        proc.join(timeout=10)
+
+    return build_report(
+        tracker.records,
+        started,
+        min(finished, stop_at),
+        params={
+            'workers': workers,
+            'rate': rate,
+            'duration': duration,
+            'mix': weights,
+            'seed': seed,
+            'poll_interval': poll_interval
+        })
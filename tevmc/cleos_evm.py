@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 
-import time
 import json
+import time
+import threading
 
-from typing import Optional, Union
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 import rlp
-import requests
 
 from rlp.sedes import (
     big_endian_int,
@@ -15,9 +15,15 @@ from rlp.sedes import (
 )
 
 from leap.cleos import CLEOS
-from leap.sugar import Name, Asset
+from leap.sugar import (
+    Name,
+    Asset,
+    docker_open_process,
+    docker_wait_process
+)
 
 from .utils import to_wei, to_int, decode_hex, remove_0x_prefix
+from .evm_rpc import EVMRPCClient
 
 
 EVM_CONTRACT = 'eosio.evm'
@@ -26,10 +32,40 @@ DEFAULT_GAS_LIMIT = '0x1e8480'
 DEFAULT_VALUE = '0x00'
 DEFAULT_DATA = '0x00'
 
+# raw actions packed per native transaction on batch transfers
+DEFAULT_ACTIONS_PER_TX = 20
+
+# seconds a gas price read from the config table gets reused
+DEFAULT_GAS_PRICE_TTL = 5.0
+
+# eosio.evm actions that can change the config table, pushing one drops the
+# cached gas price
+EVM_CONFIG_ACTIONS = frozenset(('init', 'setrevision'))
+
+# (address, amount) pairs funded by create_test_evm_account after the
+# truffle address
+DEFAULT_TEST_FUNDING = [
+    ('0xc51fE232a0153F1F44572369Cefe7b90f2BA08a5', 100000),
+    ('0xf922CC0c6CA8Cdbf5330A295a11A40911FDD3B6e', 10000),
+    ('0xCfCf671eBE5880d2D7798d06Ff7fFBa9bdA1bE64', 10000),
+    ('0xf6E6c4A9Ca3422C2e4F21859790226DC6179364d', 10000),
+    ('0xe83b5B17AfedDb1f6FF08805CE9A4d5eDc547Fa2', 10000),
+    ('0x97baF2200Bf3053cc568AA278a55445059dF2d97', 10000),
+    ('0x2e5A2c606a5d3244A0E8A4C4541Dfa2Ec0bb0a76', 10000),
+    ('0xb4A541e669D73454e37627CdE2229Ad208d19ebF', 10000),
+    ('0x717230bA327FE8DF1E61434D99744E4aDeFC53a0', 10000),
+    ('0x52b7c04839506427620A2B759c9d729BE0d4d126', 10000)
+]
+
 
 address = Binary.fixed_length(20, allow_empty=True)
 
 
+def touches_evm_config(account: str, action: str) -> bool:
+    return str(account) == EVM_CONTRACT and (
+        action in EVM_CONFIG_ACTIONS or 'config' in action or 'gas' in action)
+
+
 class EVMTransaction(rlp.Serializable):
     fields = [
         ('nonce', big_endian_int),
@@ -47,20 +83,96 @@ class EVMTransaction(rlp.Serializable):
         return rlp.encode(self)
 
 
+class NonceManager:
+    '''Hands out evm nonces per sender address, the chain nonce gets read
+    through ``fetch`` on first use and after a ``resync``, from then on
+    nonces are assigned locally.
+
+    Callers must ``resync`` a sender after a push fails, the nonces it had
+    reserved will never make it on chain.
+    '''
+
+    def __init__(self, fetch: Callable[[str], int]):
+        self.fetch = fetch
+        self._next: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(sender: str) -> str:
+        return remove_0x_prefix(sender).lower()
+
+    def reserve(self, sender: str, count: int = 1) -> int:
+        '''Reserve ``count`` consecutive nonces for ``sender``, returns the
+        first one.
+        '''
+        key = self._key(sender)
+        with self._lock:
+            if key not in self._next:
+                self._next[key] = self.fetch(sender)
+
+            nonce = self._next[key]
+            self._next[key] = nonce + count
+            return nonce
+
+    def resync(self, sender: str):
+        with self._lock:
+            self._next.pop(self._key(sender), None)
+
+    def clear(self):
+        with self._lock:
+            self._next.clear()
+
+
 class CLEOSEVM(CLEOS):
 
     def __init__(
         self,
+        docker_client,
+        container,
         *args,
         chain_id: int = 41,
         evm_url: str = 'http://localhost:7000/evm',
+        evm_ws_url: Optional[str] = None,
+        gas_price_ttl: float = DEFAULT_GAS_PRICE_TTL,
         **kwargs
     ):
-        super().__init__(*args, **kwargs)
+        super().__init__(docker_client, container, *args, **kwargs)
+
+        # kept to run cleos commands the base class has no wrapper for
+        self.docker_client = docker_client
+        self.node_container = container
 
         self.evm_url = evm_url
         self.chain_id = chain_id
 
+        self._evm_clients: Dict[str, EVMRPCClient] = {
+            evm_url: EVMRPCClient(evm_url, ws_url=evm_ws_url)
+        }
+
+        self._init_tx_state(gas_price_ttl)
+
+    def _init_tx_state(self, gas_price_ttl: float = DEFAULT_GAS_PRICE_TTL):
+        self.nonces = NonceManager(self.eth_get_transaction_count)
+        self.gas_price_ttl = gas_price_ttl
+        self._gas_price: Optional[Tuple[int, float]] = None
+        self._gas_price_lock = threading.Lock()
+
+    def evm_rpc(self, url: Optional[str] = None) -> EVMRPCClient:
+        '''Pooled JSON-RPC client for ``url``, the configured evm endpoint
+        by default.
+        '''
+        url = url if url else self.evm_url
+        if url not in self._evm_clients:
+            self._evm_clients[url] = EVMRPCClient(url)
+
+        return self._evm_clients[url]
+
+    def push_action(self, account, action, *args, **kwargs):
+        result = super().push_action(account, action, *args, **kwargs)
+        if touches_evm_config(account, action):
+            self.invalidate_gas_price()
+
+        return result
 
     def deploy_evm(
         self,
@@ -124,7 +236,8 @@ class CLEOSEVM(CLEOS):
         self,
         name: str = 'evmuser1',
         data: str = 'foobar',
-        truffle_addr: str = '0xf79b834a37f3143f4a73fc3934edac67fd3a01cd'
+        truffle_addr: str = '0xf79b834a37f3143f4a73fc3934edac67fd3a01cd',
+        funding: Optional[Sequence[Tuple[str, int]]] = None
     ):
         self.new_account(
             name,
@@ -142,29 +255,20 @@ class CLEOSEVM(CLEOS):
 
         self.logger.info(f'{name}: {eth_addr}')
 
-        addr_amount_pairs = [
-            (truffle_addr, 100000000),
-            ('0xc51fE232a0153F1F44572369Cefe7b90f2BA08a5', 100000),
-            ('0xf922CC0c6CA8Cdbf5330A295a11A40911FDD3B6e', 10000),
-            ('0xCfCf671eBE5880d2D7798d06Ff7fFBa9bdA1bE64', 10000),
-            ('0xf6E6c4A9Ca3422C2e4F21859790226DC6179364d', 10000),
-            ('0xe83b5B17AfedDb1f6FF08805CE9A4d5eDc547Fa2', 10000),
-            ('0x97baF2200Bf3053cc568AA278a55445059dF2d97', 10000),
-            ('0x2e5A2c606a5d3244A0E8A4C4541Dfa2Ec0bb0a76', 10000),
-            ('0xb4A541e669D73454e37627CdE2229Ad208d19ebF', 10000),
-            ('0x717230bA327FE8DF1E61434D99744E4aDeFC53a0', 10000),
-            ('0x52b7c04839506427620A2B759c9d729BE0d4d126', 10000)
-        ]
+        if funding is None:
+            funding = DEFAULT_TEST_FUNDING
 
-        for addr, amount in addr_amount_pairs:
-            ec, out = self.eth_transfer(
-                'evmuser1',
-                eth_addr,
-                addr,
-                Asset(amount, self.sys_token_supply.symbol)
-            )
-            time.sleep(0.05)
-            assert ec == 0
+        addr_amount_pairs = [(truffle_addr, 100000000), *funding]
+
+        for ec, out in self.eth_batch_transfer(
+            name,
+            eth_addr,
+            [
+                (addr, Asset(amount, self.sys_token_supply.symbol))
+                for addr, amount in addr_amount_pairs
+            ]
+        ):
+            assert ec == 0, out
 
 
     """    eosio.evm interaction
@@ -214,6 +318,21 @@ class CLEOSEVM(CLEOS):
         assert 'gas_price' in config
         return to_int(hexstr=f'0x{config["gas_price"]}')
 
+    def cached_gas_price(self) -> int:
+        '''``eth_gas_price`` reused for ``gas_price_ttl`` seconds.
+        '''
+        with self._gas_price_lock:
+            now = time.monotonic()
+            if (self._gas_price is None or
+                now - self._gas_price[1] >= self.gas_price_ttl):
+                self._gas_price = (self.eth_gas_price(), now)
+
+            return self._gas_price[0]
+
+    def invalidate_gas_price(self):
+        with self._gas_price_lock:
+            self._gas_price = None
+
     def eth_get_balance(self, addr: str) -> int:
         addr = remove_0x_prefix(addr)
         addr = ('0' * (12 * 2)) + addr
@@ -248,30 +367,20 @@ class CLEOSEVM(CLEOS):
         return rows[0]['nonce']
 
     def eth_get_transaction_receipt(self, transaction_hash, url=None):
-        payload = {
-            'jsonrpc': '2.0',
-            'method': 'eth_getTransactionReceipt',
-            'params': [transaction_hash],
-            'id': 1
-        }
-        response = requests.post(
-            url if url else self.evm_url,
-            json=payload,
-            headers={'Content-Type': 'application/json'})
-        return response.json() if response.status_code == 200 else None
+        return self.evm_rpc(url).call(
+            'eth_getTransactionReceipt', [transaction_hash])
+
+    def eth_get_transaction_receipts(
+        self,
+        transaction_hashes: Sequence[str],
+        url: Optional[str] = None
+    ) -> List[Optional[dict]]:
+        return self.evm_rpc(url).batch(
+            ('eth_getTransactionReceipt', [tx_hash])
+            for tx_hash in transaction_hashes)
 
     def eth_get_code(self, address, block='latest', url=None):
-        payload = {
-            'jsonrpc': '2.0',
-            'method': 'eth_getCode',
-            'params': [address, block],
-            'id': 1
-        }
-        response = requests.post(
-            url if url else self.evm_url,
-            json=payload,
-            headers={'Content-Type': 'application/json'})
-        return response.json() if response.status_code == 200 else None
+        return self.evm_rpc(url).call('eth_getCode', [address, block])
 
     def eth_raw_tx(
         self,
@@ -284,8 +393,8 @@ class CLEOSEVM(CLEOS):
         if isinstance(gas, str):
             gas = to_int(hexstr=gas)
 
-        nonce = self.eth_get_transaction_count(sender)
-        gas_price = self.eth_gas_price()
+        nonce = self.nonces.reserve(sender)
+        gas_price = self.cached_gas_price()
 
         if isinstance(data, str):
             data = decode_hex(data)
@@ -332,12 +441,115 @@ class CLEOSEVM(CLEOS):
             'wei': to_wei(quantity.amount, 'ether')
         }, indent=4))
 
-        return self.push_action(
-            EVM_CONTRACT,
-            'raw',
-            [account, raw_tx, estimate_gas, sender],
-            f'{account}@active'
+        try:
+            ec, out = self.push_action(
+                EVM_CONTRACT,
+                'raw',
+                [account, raw_tx, estimate_gas, sender],
+                f'{account}@active'
+            )
+
+        except BaseException:
+            self.nonces.resync(sender)
+            raise
+
+        if ec != 0:
+            self.nonces.resync(sender)
+
+        return ec, out
+
+    def eth_build_transfers(
+        self,
+        sender: str,
+        transfers: Sequence[Tuple[str, Asset]],
+        gas: str = DEFAULT_GAS_LIMIT
+    ) -> List[str]:
+        '''RLP encode a transfer per ``(to, quantity)`` pair, nonces come
+        from the sender's ``NonceManager`` reservation.
+        '''
+        nonce = self.nonces.reserve(sender, len(transfers))
+        gas_price = self.cached_gas_price()
+        gas = to_int(hexstr=gas)
+
+        return [
+            EVMTransaction(
+                nonce=nonce + i,
+                gas_price=gas_price,
+                gas=gas,
+                to=decode_hex(to),
+                value=to_wei(quantity.amount, 'ether'),
+                data=b''
+            ).encode().hex()
+            for i, (to, quantity) in enumerate(transfers)
+        ]
+
+    def push_transaction(self, actions: List[dict]):
+        '''Push several actions as a single native transaction, ``data`` of
+        each action can be anything ``push_action`` accepts as args.
+        '''
+        exec_id, exec_stream = docker_open_process(
+            self.docker_client,
+            self.node_container,
+            [
+                'cleos', '--url', self.url,
+                'push', 'transaction', json.dumps({'actions': actions}),
+                '-j'
+            ]
         )
+        result = docker_wait_process(self.docker_client, exec_id, exec_stream)
+        if any(
+            touches_evm_config(action['account'], action['name'])
+            for action in actions
+        ):
+            self.invalidate_gas_price()
+
+        return result
+
+    def eth_batch_transfer(
+        self,
+        account: Name,
+        sender: str,  # eth addr
+        transfers: Sequence[Tuple[str, Asset]],
+        actions_per_tx: int = DEFAULT_ACTIONS_PER_TX
+    ) -> List[Tuple[int, str]]:
+        '''Transfer from ``sender`` to every ``(to, quantity)`` pair, packing
+        up to ``actions_per_tx`` raw actions per native transaction.
+
+        Transactions get pushed in nonce order and the batch stops at the
+        first failure, returns the ``(ec, out)`` of every push done.
+        '''
+        raw_txs = self.eth_build_transfers(sender, transfers)
+        sender = remove_0x_prefix(sender)
+
+        results = []
+        for i in range(0, len(raw_txs), actions_per_tx):
+            actions = [
+                {
+                    'account': EVM_CONTRACT,
+                    'name': 'raw',
+                    'authorization': [
+                        {'actor': account, 'permission': 'active'}],
+                    'data': [account, raw_tx, False, sender]
+                }
+                for raw_tx in raw_txs[i:i + actions_per_tx]
+            ]
+            try:
+                ec, out = self.push_transaction(actions)
+
+            except BaseException:
+                # nonces reserved for this and the later txs never got used
+                self.nonces.resync(sender)
+                raise
+
+            results.append((ec, out))
+            if ec != 0:
+                self.logger.error(f'batch transfer push failed: {out}')
+                self.nonces.resync(sender)
+                break
+
+        self.logger.info(
+            f'{sender}: {len(raw_txs)} transfers in {len(results)} transactions')
+        return results
 
     def eth_withdraw(self,
         account: Name,
@@ -357,17 +569,15 @@ class CLEOSEVM(CLEOS):
         full_transactions: bool= False,
         url: Optional[str] = None
     ):
-        headers = {'Content-Type': 'application/json'}
-        payload = {
-            'jsonrpc': '2.0',
-            'method': 'eth_getBlockByNumber',
-            'params': [
-                block_number,
-                full_transactions
-            ],
-            'id': 1
-        }
-        response = requests.post(
-            url if url else self.evm_url,
-            json=payload, headers=headers)
-        return response.json() if response.status_code == 200 else None
+        return self.evm_rpc(url).call(
+            'eth_getBlockByNumber', [block_number, full_transactions])
+
+    def eth_get_blocks_by_number(
+        self,
+        block_numbers: Sequence[Union[int, str]],
+        full_transactions: bool = False,
+        url: Optional[str] = None
+    ) -> List[Optional[dict]]:
+        return self.evm_rpc(url).batch(
+            ('eth_getBlockByNumber', [block_number, full_transactions])
+            for block_number in block_numbers)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import logging
+
+import click
+
+from .cli import cli, get_docker_client
+from ..config import load_config
+
+
+@cli.command()
+@click.option(
+    '--pid', default='tevmc.pid',
+    help='Path to lock file for daemon')
+@click.option(
+    '--target-dir', default='.',
+    help='target')
+@click.option(
+    '--config', default='tevmc.json',
+    help='Unified config file name.')
+@click.option(
+    '--workers', default=4,
+    help='Worker processes, each one sends from its own evm account.')
+@click.option(
+    '--rate', default=10.0,
+    help='Target tx/s across all workers.')
+@click.option(
+    '--duration', default=60.0,
+    help='Seconds to submit txs for.')
+@click.option(
+    '--mix', default='raw=60,web3=30,deploy=10',
+    help='Weighted tx kinds, any of raw, web3 & deploy.')
+@click.option(
+    '--funding', default=1000,
+    help='TLOS each worker account gets funded with.')
+@click.option(
+    '--seed', default=0,
+    help='Seed of the tx kind picks.')
+@click.option(
+    '--poll-interval', default=0.25,
+    help='Seconds between ES & rpc polls for pending txs.')
+@click.option(
+    '--settle-timeout', default=60.0,
+    help='Seconds to keep tracking txs after the run ends.')
+@click.option(
+    '--report', default='bench.json',
+    help='JSON report path, - for stdout.')
+@click.option(
+    '--loglevel', default='info',
+    help='Provide logging level. Example --loglevel debug, default=warning')
+def bench(
+    pid,
+    target_dir,
+    config,
+    workers,
+    rate,
+    duration,
+    mix,
+    funding,
+    seed,
+    poll_interval,
+    settle_timeout,
+    report,
+    loglevel
+):
+    """Load test a running local stack and report latency percentiles from
+    submission to nodeos inclusion, ES indexing & rpc receipt visibility.
+    """
+    from ..bench import bench_target, format_report, open_cleos, run_bench
+    from ..testing.database import ElasticDriver
+
+    logging.basicConfig(level=loglevel.upper())
+
+    try:
+        config = load_config(target_dir, config)
+
+    except FileNotFoundError:
+        print('Config not found.')
+        sys.exit(1)
+
+    try:
+        with open(pid, 'r') as pidfile:
+            pid = int(pidfile.read())
+
+    except FileNotFoundError:
+        print('daemon not running.')
+        sys.exit(1)
+
+    chain_name = config['telos-evm-rpc']['elastic_prefix']
+    container = f'{config["nodeos"]["name"]}-{pid}-{chain_name}'
+
+    # fail early if docker isn't reachable
+    get_docker_client()
+
+    target = bench_target(config, container)
+    result = run_bench(
+        open_cleos(target),
+        target,
+        ElasticDriver(config),
+        workers=workers,
+        rate=rate,
+        duration=duration,
+        mix=mix,
+        funding=funding,
+        seed=seed,
+        poll_interval=poll_interval,
+        settle_timeout=settle_timeout)
+
+    print(format_report(result))
+
+    if report == '-':
+        print(json.dumps(result, indent=4))
+
+    else:
+        with open(report, 'w') as report_file:
+            report_file.write(json.dumps(result, indent=4))
+
+        print(f'report written to {report}')
@@ -9,7 +9,7 @@ import json
 import click
 import docker
 
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List
 from hashlib import sha1
 from pathlib import Path
 from datetime import datetime
@@ -54,15 +54,42 @@ def patch_config(template_dict, current_dict):
     return final_dict, diffs
 
 
-def perform_config_build(target_dir, config):
-    target_dir = Path(target_dir).resolve()
-    target_dir.mkdir(parents=True, exist_ok=True)
+RENDER_MANIFEST = '.tevmc-render.json'
 
-    docker_dir = target_dir / 'docker'
-    docker_dir.mkdir(exist_ok=True)
 
-    # config build
-    timestamp = {'timestamp': str(datetime.now())}
+class RenderTarget:
+    '''A single file produced by the config build.
+
+    ``depends`` lists the config keys (dotted paths as understood by
+    ``get_config``) the output is a function of, ``render`` produces the file
+    contents and ``sources`` the template texts involved, so that template
+    upgrades also invalidate the output.
+    '''
+
+    def __init__(
+        self,
+        path: str,
+        service: str,
+        depends: List[str],
+        render: Callable[[], str],
+        sources: List[str]
+    ):
+        self.path = path
+        self.service = service
+        self.depends = depends
+        self.render = render
+        self.sources = sources
+
+    def digest(self, config: Dict) -> str:
+        inputs = {key: get_config(key, config) for key in self.depends}
+        hasher = sha1(json.dumps(inputs, sort_keys=True).encode('utf-8'))
+        for source in self.sources:
+            hasher.update(source.encode('utf-8'))
+
+        return hasher.hexdigest()
+
+
+def config_render_targets(config: Dict) -> List[RenderTarget]:
     templates = load_config_templates()
     docker_templates = load_docker_templates()
 
@@ -83,20 +110,19 @@ def perform_config_build(target_dir, config):
 
         return ndict
 
-    def write_config_file(
-        fname: str,
-        dir_target: str,
-        subst: Dict[str, Any]
-    ):
-        with open(docker_dir / Path(dir_target) / fname, 'w+') as target_file:
-            target_file.write(
-                templates[fname].substitute(**subst))
-
-    def write_docker_template(file, subst: Dict[str, Any]):
-        with open(docker_dir / file, 'w+') as conf_file:
-            conf_file.write(
-                docker_templates[file].substitute(**subst))
+    targets = []
 
+    def docker_template(
+        file: str,
+        service: str,
+        depends: List[str],
+        subst: Callable[[], Dict[str, Any]]
+    ):
+        templ = docker_templates[file]
+        targets.append(RenderTarget(
+            file, service, depends,
+            lambda: templ.substitute(**subst()),
+            [templ.template]))
 
     # redis
     redis_conf = config['redis']
@@ -105,26 +131,26 @@ def perform_config_build(target_dir, config):
     redis_build_dir = redis_dir + '/' + 'build'
     redis_conf_dir = redis_dir + '/' +  redis_conf['conf_dir']
 
-    subst = flatten('redis', config)
-    write_docker_template(f'{redis_build_dir}/Dockerfile', subst)
-    write_docker_template(f'{redis_conf_dir}/redis.conf', subst)
+    redis_subst = lambda: flatten('redis', config)
+    docker_template(
+        f'{redis_build_dir}/Dockerfile', 'redis', ['redis'], redis_subst)
+    docker_template(
+        f'{redis_conf_dir}/redis.conf', 'redis', ['redis'], redis_subst)
 
     # elasticsearch
     elastic_conf = config['elasticsearch']
 
     elastic_dir = elastic_conf['docker_path']
     elastic_build_dir = elastic_dir + '/' + 'build'
-    elastic_data_dir = elastic_dir + '/' + elastic_conf['data_dir']
-    subst = {
+    elastic_subst = lambda: {
         'elasticsearch_port': config['elasticsearch']['host'].split(':')[-1]
     }
-    write_docker_template(f'{elastic_build_dir}/Dockerfile', subst)
-    write_docker_template(f'{elastic_build_dir}/elasticsearch.yml', subst)
-
-    host_dir = (docker_dir / elastic_data_dir)
-    host_dir.mkdir(parents=True, exist_ok=True)
-
-    os.chown(host_dir, uid=os.getuid(), gid=os.getgid())
+    docker_template(
+        f'{elastic_build_dir}/Dockerfile', 'elasticsearch',
+        ['elasticsearch.host'], elastic_subst)
+    docker_template(
+        f'{elastic_build_dir}/elasticsearch.yml', 'elasticsearch',
+        ['elasticsearch.host'], elastic_subst)
 
     # kibana
     kibana_conf = config['kibana']
@@ -133,9 +159,11 @@ def perform_config_build(target_dir, config):
     kibana_build_dir = kibana_dir + '/' + 'build'
     kibana_conf_dir  = kibana_dir + '/' + kibana_conf['conf_dir']
 
-    subst = flatten('kibana', config)
-    write_docker_template(f'{kibana_build_dir}/Dockerfile', subst)
-    write_docker_template(f'{kibana_conf_dir}/kibana.yml', subst)
+    kibana_subst = lambda: flatten('kibana', config)
+    docker_template(
+        f'{kibana_build_dir}/Dockerfile', 'kibana', ['kibana'], kibana_subst)
+    docker_template(
+        f'{kibana_conf_dir}/kibana.yml', 'kibana', ['kibana'], kibana_subst)
 
     # nodeos
     chain_name = config['telos-evm-rpc']['elastic_prefix']
@@ -147,100 +175,183 @@ def perform_config_build(target_dir, config):
     nodeos_build_dir = nodeos_dir + '/' + 'build'
     nodeos_http_port = int(ini_conf['http_addr'].split(':')[-1])
 
-    subst = {
-        'nodeos_port': nodeos_http_port,
-        'nodeos_history_port': ini_conf['history_endpoint'].split(':')[-1]
-    }
-    write_docker_template(f'{nodeos_build_dir}/Dockerfile', subst)
+    docker_template(
+        f'{nodeos_build_dir}/Dockerfile', 'nodeos',
+        ['nodeos.ini.http_addr', 'nodeos.ini.history_endpoint'],
+        lambda: {
+            'nodeos_port': nodeos_http_port,
+            'nodeos_history_port': ini_conf['history_endpoint'].split(':')[-1]
+        })
 
     # nodeos.config.ini
-    subst = {}
-    subst.update(get_config('nodeos.ini', config))
-    subst.update(timestamp)
+    def render_nodeos_ini() -> str:
+        subst = {}
+        subst.update(get_config('nodeos.ini', config))
+        subst.update({'timestamp': str(datetime.now())})
 
-    # normalize bools
-    for key, val in subst.items():
-        if isinstance(val, bool):
-            subst[key] = str(val).lower()
+        # normalize bools
+        for key, val in subst.items():
+            if isinstance(val, bool):
+                subst[key] = str(val).lower()
 
-    conf_str = templates['nodeos.config.ini'].substitute(**subst) + '\n'
+        conf_str = templates['nodeos.config.ini'].substitute(**subst) + '\n'
 
-    if 'local' in chain_name:
-        conf_str += templates['nodeos.local.config.ini'].substitute(**subst) + '\n'
+        if 'local' in chain_name:
+            conf_str += templates['nodeos.local.config.ini'].substitute(**subst) + '\n'
 
-    for plugin in subst['plugins']:
-        conf_str += f'plugin = {plugin}\n'
+        for plugin in subst['plugins']:
+            conf_str += f'plugin = {plugin}\n'
 
-    if 'subst' in subst:
-        conf_str += f'plugin = eosio::subst_plugin\n'
-        conf_str += '\n'
-        sinfo = subst['subst']
-        if isinstance(sinfo, str):
-            conf_str += f'subst-manifest = {sinfo}'
+        if 'subst' in subst:
+            conf_str += f'plugin = eosio::subst_plugin\n'
+            conf_str += '\n'
+            sinfo = subst['subst']
+            if isinstance(sinfo, str):
+                conf_str += f'subst-manifest = {sinfo}'
 
-        elif isinstance(sinfo, dict):
-            for skey, val in sinfo.items():
-                conf_str += f'subst-by-name = {skey}:{val}'
+            elif isinstance(sinfo, dict):
+                for skey, val in sinfo.items():
+                    conf_str += f'subst-by-name = {skey}:{val}'
 
-    conf_str += '\n'
+        conf_str += '\n'
 
-    for peer in subst['peers']:
-        conf_str += f'p2p-peer-address = {peer}\n'
+        for peer in subst['peers']:
+            conf_str += f'p2p-peer-address = {peer}\n'
 
-    with open(docker_dir / nodeos_conf_dir / 'config.ini', 'w+') as target_file:
-        target_file.write(conf_str)
+        return conf_str
 
-    # beats
-    beats_conf = config['beats']
-    beats_dir = docker_dir / beats_conf['docker_path']
+    targets.append(RenderTarget(
+        f'{nodeos_conf_dir}/config.ini', 'nodeos',
+        ['nodeos.ini', 'telos-evm-rpc.elastic_prefix'],
+        render_nodeos_ini,
+        [templates['nodeos.config.ini'].template,
+         templates['nodeos.local.config.ini'].template]))
 
     # telosevm-translator
     tevmi_conf = config['telosevm-translator']
     tevmi_dir = tevmi_conf['docker_path']
     tevmi_build_dir = tevmi_dir + '/' + 'build'
 
-    subst = {
-        'broadcast_port':
-            config['telos-evm-rpc']['indexer_websocket_port'],
-    }
-    write_docker_template(f'{tevmi_build_dir}/Dockerfile', subst)
+    docker_template(
+        f'{tevmi_build_dir}/Dockerfile', 'telosevm-translator',
+        ['telos-evm-rpc.indexer_websocket_port'],
+        lambda: {
+            'broadcast_port':
+                config['telos-evm-rpc']['indexer_websocket_port'],
+        })
 
     # telos-evm-rpc
     rpc_conf = config['telos-evm-rpc']
 
     rpc_dir = rpc_conf['docker_path']
     rpc_build_dir = rpc_dir + '/' + 'build'
-    subst = jsonize({
-        'rpc_chain_id': rpc_conf['chain_id'],
-        'rpc_debug': rpc_conf['debug'],
-        'rpc_host': rpc_conf['api_host'],
-        'rpc_api': rpc_conf['api_port'],
-        'rpc_nodeos_read': f'http://127.0.0.1:{nodeos_http_port}',
-        'rpc_signer_account': rpc_conf['signer_account'],
-        'rpc_signer_permission': rpc_conf['signer_permission'],
-        'rpc_signer_key': rpc_conf['signer_key'],
-        'rpc_contracts': rpc_conf['contracts'],
-        'rpc_indexer_websocket_host': rpc_conf['indexer_websocket_host'],
-        'rpc_indexer_websocket_port': rpc_conf['indexer_websocket_port'],
-        'rpc_indexer_websocket_uri': rpc_conf['indexer_websocket_uri'],
-        'rpc_websocket_host': rpc_conf['rpc_websocket_host'],
-        'rpc_websocket_port': rpc_conf['rpc_websocket_port'],
-        'redis_host': config['redis']['host'],
-        'redis_port': config['redis']['port'],
-        'rpc_elastic_node': f'http://{elastic_conf["host"]}',
-        'elasticsearch_user': elastic_conf['user'],
-        'elasticsearch_pass': elastic_conf['pass'],
-        'elasticsearch_prefix': rpc_conf['elastic_prefix'],
-        'elasticsearch_index_version': rpc_conf['elasitc_index_version']
-    })
-    write_docker_template(f'{rpc_build_dir}/config.json', subst)
-    subst = {
-        'api_port':
-            config['telos-evm-rpc']['api_port'],
-        'ws_port':
-            config['telos-evm-rpc']['indexer_websocket_port']
-    }
-    write_docker_template(f'{rpc_build_dir}/Dockerfile', subst)
+    docker_template(
+        f'{rpc_build_dir}/config.json', 'telos-evm-rpc',
+        [
+            'telos-evm-rpc',
+            'nodeos.ini.http_addr',
+            'redis.host', 'redis.port',
+            'elasticsearch.host', 'elasticsearch.user', 'elasticsearch.pass'
+        ],
+        lambda: jsonize({
+            'rpc_chain_id': rpc_conf['chain_id'],
+            'rpc_debug': rpc_conf['debug'],
+            'rpc_host': rpc_conf['api_host'],
+            'rpc_api': rpc_conf['api_port'],
+            'rpc_nodeos_read': f'http://127.0.0.1:{nodeos_http_port}',
+            'rpc_signer_account': rpc_conf['signer_account'],
+            'rpc_signer_permission': rpc_conf['signer_permission'],
+            'rpc_signer_key': rpc_conf['signer_key'],
+            'rpc_contracts': rpc_conf['contracts'],
+            'rpc_indexer_websocket_host': rpc_conf['indexer_websocket_host'],
+            'rpc_indexer_websocket_port': rpc_conf['indexer_websocket_port'],
+            'rpc_indexer_websocket_uri': rpc_conf['indexer_websocket_uri'],
+            'rpc_websocket_host': rpc_conf['rpc_websocket_host'],
+            'rpc_websocket_port': rpc_conf['rpc_websocket_port'],
+            'redis_host': config['redis']['host'],
+            'redis_port': config['redis']['port'],
+            'rpc_elastic_node': f'http://{elastic_conf["host"]}',
+            'elasticsearch_user': elastic_conf['user'],
+            'elasticsearch_pass': elastic_conf['pass'],
+            'elasticsearch_prefix': rpc_conf['elastic_prefix'],
+            'elasticsearch_index_version': rpc_conf['elasitc_index_version']
+        }))
+    docker_template(
+        f'{rpc_build_dir}/Dockerfile', 'telos-evm-rpc',
+        ['telos-evm-rpc.api_port', 'telos-evm-rpc.indexer_websocket_port'],
+        lambda: {
+            'api_port':
+                config['telos-evm-rpc']['api_port'],
+            'ws_port':
+                config['telos-evm-rpc']['indexer_websocket_port']
+        })
+
+    return targets
+
+
+def perform_config_build(target_dir, config) -> Dict[str, Any]:
+    '''Render every config file & Dockerfile from the templates.
+
+    A manifest stored in the docker dir remembers the digest of the inputs
+    of each output, so only files whose inputs changed get re-rendered, and
+    files are only rewritten if their contents changed, unchanged files keep
+    their mtime so docker layer caching keeps working.
+
+    Returns a report with the rendered files per service and the list of
+    services whose build context changed and need an image rebuild.
+    '''
+    target_dir = Path(target_dir).resolve()
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    docker_dir = target_dir / 'docker'
+    docker_dir.mkdir(exist_ok=True)
+
+    manifest_path = docker_dir / RENDER_MANIFEST
+    manifest = {}
+    if manifest_path.is_file():
+        with open(manifest_path, 'r') as manifest_file:
+            manifest = json.loads(manifest_file.read())
+
+    new_manifest = {}
+    report = {'changed': {}, 'rebuild': []}
+
+    for target in config_render_targets(config):
+        out_path = docker_dir / target.path
+        digest = target.digest(config)
+        new_manifest[target.path] = digest
+
+        if manifest.get(target.path) == digest and out_path.is_file():
+            continue
+
+        content = target.render()
+
+        if out_path.is_file():
+            with open(out_path, 'r') as out_file:
+                if out_file.read() == content:
+                    continue
+
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(out_path, 'w+') as out_file:
+            out_file.write(content)
+
+        report['changed'].setdefault(target.service, []).append(target.path)
+
+        if ('/build/' in target.path and
+            target.service not in report['rebuild']):
+            report['rebuild'].append(target.service)
+
+    with open(manifest_path, 'w+') as manifest_file:
+        manifest_file.write(json.dumps(new_manifest, indent=4))
+
+    elastic_conf = config['elasticsearch']
+    elastic_data_dir = elastic_conf['docker_path'] + '/' + elastic_conf['data_dir']
+
+    host_dir = (docker_dir / elastic_data_dir)
+    host_dir.mkdir(parents=True, exist_ok=True)
+
+    os.chown(host_dir, uid=os.getuid(), gid=os.getgid())
+
+    return report
 
 
 def service_alias_to_fullname(alias: str):
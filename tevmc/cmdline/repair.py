@@ -13,12 +13,16 @@ from docker.types import Mount
 from leap.sugar import download_snapshot
 from tevmc.cmdline.build import build_service
 from tevmc.config import load_config
-from tevmc.testing.database import ElasticDataEmptyError, ElasticDriver
+from tevmc.testing.database import (
+    INTEGRITY_CHECKPOINT, ElasticDataEmptyError)
+from tevmc.testing.async_database import SyncElasticDriver
 
 from .cli import cli
 
 
-def perform_data_repair(config_path, progress=True):
+def perform_data_repair(
+    config_path, progress=True, workers=1, full=False, hash_chain=False
+):
     from tevmc.tevmc import TEVMController
 
     root_pwd = config_path.parent.resolve()
@@ -40,8 +44,10 @@ def perform_data_repair(config_path, progress=True):
     with TEVMController(
         config, root_pwd=root_pwd, services=['elastic']):
         time.sleep(5)
-        es = ElasticDriver(config)
-        last_valid_nums = es.repair_data()
+        es = SyncElasticDriver(
+            config, checkpoint_path=root_pwd / INTEGRITY_CHECKPOINT)
+        last_valid_nums = es.repair_data(
+            workers=workers, full=full, hash_chain=hash_chain)
 
     logging.info(f'done, last valid blocks {last_valid_nums}')
     logging.info('downloading closest snapshot...')
@@ -90,9 +96,19 @@ def perform_data_repair(config_path, progress=True):
 @click.option(
     '--config', default='tevmc.json',
     help='Path to config file.')
-def repair(config):
+@click.option(
+    '--workers', default=1,
+    help='Amount of indices to check in parallel.')
+@click.option(
+    '--full/--incremental', default=False,
+    help='Ignore the integrity checkpoint and re-check all indexed data.')
+@click.option(
+    '--hash-chain/--no-hash-chain', default=False,
+    help='Also verify evm block hashes link to their previous block.')
+def repair(config, workers, full, hash_chain):
     try:
-        perform_data_repair(Path(config))
+        perform_data_repair(
+            Path(config), workers=workers, full=full, hash_chain=hash_chain)
 
     except ElasticDataEmptyError:
         logging.info('no data to repair')
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+import json
+import itertools
+import threading
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from websocket import create_connection
+
+
+RPCCall = Tuple[str, Sequence[Any]]
+
+
+class HTTPTransport:
+    '''JSON-RPC over a keep-alive ``requests.Session``, connections get
+    reused across calls & threads up to ``pool_size``.
+    '''
+
+    def __init__(self, url: str, pool_size: int = 10, timeout: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+    def send(self, payload) -> Optional[Any]:
+        response = self.session.post(
+            self.url, data=json.dumps(payload), timeout=self.timeout)
+        return response.json() if response.status_code == 200 else None
+
+    def send_many(self, payloads: List[Dict]) -> List[Optional[Dict]]:
+        return [self.send(payload) for payload in payloads]
+
+    def close(self):
+        self.session.close()
+
+
+class WebsocketTransport:
+    '''JSON-RPC over a single websocket, ``send_many`` pipelines: every
+    request gets written before reading any response, responses are matched
+    back by id.
+    '''
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+        self._ws = None
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        if self._ws is None or not self._ws.connected:
+            self._ws = create_connection(self.url, timeout=self.timeout)
+
+        return self._ws
+
+    def send_many(self, payloads: List[Dict]) -> List[Optional[Dict]]:
+        with self._lock:
+            ws = self._conn()
+            try:
+                for payload in payloads:
+                    ws.send(json.dumps(payload))
+
+                pending = {payload['id'] for payload in payloads}
+                results = {}
+                while pending:
+                    msg = json.loads(ws.recv())
+                    # subscription notifications carry no id, skip them
+                    if msg.get('id') in pending:
+                        pending.discard(msg['id'])
+                        results[msg['id']] = msg
+
+            except Exception:
+                # half read responses would desync the next exchange
+                self.close()
+                raise
+
+        return [results.get(payload['id']) for payload in payloads]
+
+    def send(self, payload) -> Optional[Any]:
+        if isinstance(payload, list):
+            return self.send_many(payload)
+
+        return self.send_many([payload])[0]
+
+    def close(self):
+        if self._ws is not None:
+            try:
+                self._ws.close()
+
+            except Exception:
+                ...
+
+            self._ws = None
+
+
+class EVMRPCClient:
+    '''Reusable client for an evm JSON-RPC endpoint.
+
+    ``batch`` sends many calls as JSON-RPC batch requests of up to
+    ``batch_size`` calls each, over HTTP the batches get posted concurrently
+    on ``workers`` pooled connections. Endpoints that answer batches with a
+    single object (no batch support) fall back to one request per call.
+
+    ``ws_url`` switches to the websocket transport, where batches get
+    pipelined over the one connection instead.
+    '''
+
+    def __init__(
+        self,
+        url: str,
+        ws_url: Optional[str] = None,
+        pool_size: int = 10,
+        batch_size: int = 100,
+        workers: int = 4,
+        timeout: float = 30.0
+    ):
+        self.url = url
+        self.batch_size = batch_size
+        self.workers = workers
+        self._ids = itertools.count(1)
+        self._ids_lock = threading.Lock()
+
+        if ws_url:
+            self.transport = WebsocketTransport(ws_url, timeout=timeout)
+
+        else:
+            self.transport = HTTPTransport(url, pool_size=pool_size, timeout=timeout)
+
+        self._batch_supported = True
+
+    def _payload(self, method: str, params: Sequence[Any]) -> Dict:
+        with self._ids_lock:
+            call_id = next(self._ids)
+
+        return {
+            'jsonrpc': '2.0',
+            'method': method,
+            'params': list(params),
+            'id': call_id
+        }
+
+    def call(self, method: str, params: Sequence[Any] = ()) -> Optional[Dict]:
+        '''Single call, returns the whole JSON-RPC response or None on a non
+        200 HTTP status.
+        '''
+        return self.transport.send(self._payload(method, params))
+
+    def _send_chunk(self, payloads: List[Dict]) -> List[Optional[Dict]]:
+        if isinstance(self.transport, WebsocketTransport):
+            return self.transport.send_many(payloads)
+
+        if self._batch_supported:
+            result = self.transport.send(payloads)
+            if isinstance(result, list):
+                by_id = {msg.get('id'): msg for msg in result}
+                return [by_id.get(payload['id']) for payload in payloads]
+
+            self._batch_supported = False
+
+        return self.transport.send_many(payloads)
+
+    def batch(self, calls: Iterable[RPCCall]) -> List[Optional[Dict]]:
+        '''Run every ``(method, params)`` call, responses come back in the
+        same order as the calls.
+        '''
+        payloads = [self._payload(method, params) for method, params in calls]
+        chunks = [
+            payloads[i:i + self.batch_size]
+            for i in range(0, len(payloads), self.batch_size)
+        ]
+        if len(chunks) <= 1 or self.workers <= 1:
+            results = [self._send_chunk(chunk) for chunk in chunks]
+
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(self._send_chunk, chunks))
+
+        return [msg for chunk in results for msg in chunk]
+
+    def close(self):
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
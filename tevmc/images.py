@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+import os
+import logging
+import threading
+
+from typing import Dict, List, Optional
+from hashlib import sha256
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import docker
+
+from docker.models.images import Image
+
+from tevmc.cmdline.build import build_service, service_alias_to_fullname
+
+
+CONTEXT_HASH_LABEL = 'tevmc.context-hash'
+
+
+def hash_build_context(path: Path) -> str:
+    '''Content hash of a docker build context, covers relative file paths,
+    executable bits and file contents.
+    '''
+    path = Path(path)
+    hasher = sha256()
+    for node in sorted(p for p in path.rglob('*') if p.is_file()):
+        rel = node.relative_to(path).as_posix()
+        hasher.update(rel.encode())
+        hasher.update(b'x' if os.access(node, os.X_OK) else b'-')
+        with open(node, 'rb') as node_file:
+            for block in iter(lambda: node_file.read(1024 * 1024), b''):
+                hasher.update(block)
+
+        hasher.update(b'\0')
+
+    return hasher.hexdigest()
+
+
+class ImageManager:
+    '''Keeps an in memory index of local image tags and skips rebuilding
+    images whose build context didn't change since they were built.
+
+    Built images get labeled with the content hash of their build context, a
+    service is only rebuilt if no image with its tag exists or the label
+    doesn't match the current context.
+    '''
+
+    def __init__(
+        self,
+        client: docker.DockerClient,
+        logger: Optional[logging.Logger] = None,
+        max_workers: int = 3
+    ):
+        self.client = client
+        self.logger = logger if logger else logging.getLogger('tevmc.images')
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self._tags: Optional[Dict[str, Image]] = None
+
+    def refresh(self):
+        tags = {}
+        for img in self.client.images.list(all=True):
+            for tag in img.tags:
+                tags[tag] = img
+
+        with self._lock:
+            self._tags = tags
+
+    def _index(self) -> Dict[str, Image]:
+        if self._tags is None:
+            self.refresh()
+
+        return self._tags
+
+    def get(self, tag: str) -> Optional[Image]:
+        return self._index().get(tag)
+
+    def has(self, tag: str) -> bool:
+        return tag in self._index()
+
+    def _update(self, tag: str):
+        try:
+            img = self.client.images.get(tag)
+
+        except docker.errors.NotFound:
+            return
+
+        # an index not loaded yet picks the image up once it gets listed
+        with self._lock:
+            if self._tags is not None:
+                self._tags[tag] = img
+
+    def pull(self, image: str):
+        '''Pull ``repo:tag`` from remote, raises ``docker.errors.NotFound``
+        if it isn't on either local or remote repos.
+        '''
+        splt_image = image.split(':')
+        if len(splt_image) == 2:
+            repo, tag = splt_image
+        else:
+            raise ValueError(
+                f'Expected \'{image}\' to have \'repo:tag\' format.')
+
+        updates = {}
+        for update in self.client.api.pull(
+            repo, tag=tag, stream=True, decode=True
+        ):
+            _id = update.get('id', image)
+            status = update.get('status')
+            if updates.get(_id) != status:
+                updates[_id] = status
+                self.logger.info(f'{_id}: {status}')
+
+        self._update(image)
+
+    def needs_build(self, tag: str, context_hash: str) -> bool:
+        img = self.get(tag)
+        if img is None:
+            return True
+
+        labels = img.labels or {}
+        return labels.get(CONTEXT_HASH_LABEL) != context_hash
+
+    def build_services(
+        self,
+        target_dir: Path,
+        services: List[str],
+        config: dict,
+        nocache: bool = False
+    ) -> List[str]:
+        '''Build images of ``services`` concurrently, skipping the ones that
+        are up to date, returns the list of services actually built.
+        '''
+        chain_name = config['telos-evm-rpc']['elastic_prefix']
+        docker_dir = Path(target_dir) / 'docker'
+
+        to_build = {}
+        for service in services:
+            name = service_alias_to_fullname(service)
+            conf = config[name]
+            if 'docker_path' not in conf:
+                continue
+
+            tag = f'{conf["tag"]}-{chain_name}'
+            context_hash = hash_build_context(
+                docker_dir / conf['docker_path'] / 'build')
+
+            if not nocache and not self.needs_build(tag, context_hash):
+                self.logger.info(f'{tag} up to date, skipping build')
+                continue
+
+            to_build[name] = (tag, context_hash)
+
+        def _build(name: str):
+            tag, context_hash = to_build[name]
+            self.logger.info(f'building {tag}...')
+            build_service(
+                Path(target_dir), name, config, self.logger,
+                nocache=nocache,
+                labels={CONTEXT_HASH_LABEL: context_hash})
+            self._update(tag)
+
+        if to_build:
+            with ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='tevmc-build'
+            ) as executor:
+                # list() to propagate the first build error
+                list(executor.map(_build, to_build.keys()))
+
+        return list(to_build.keys())
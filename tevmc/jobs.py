@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import time
+import uuid
+import logging
+import threading
+import traceback
+
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    '''A long daemon operation running on the ``JobManager`` pool.
+    '''
+
+    def __init__(self, operation: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.operation = operation
+        self.params = params
+        self.status = 'pending'
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout=timeout)
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'operation': self.operation,
+            'params': self.params,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobManager:
+    '''Runs restart, check & patch style operations off the request threads
+    so read only routes keep answering while they run.
+
+    ``exclusive`` jobs (the ones that stop & start services) get serialized
+    on their own worker so queued ones never hold up the shared pool, the
+    rest run concurrently up to ``max_workers``. Only the last ``keep``
+    finished jobs are remembered.
+    '''
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        keep: int = 100,
+        logger: Optional[logging.Logger] = None
+    ):
+        self.logger = logger if logger else logging.getLogger('tevmc.jobs')
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='tevmc-job')
+        self._exclusive = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='tevmc-job-exclusive')
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _run(self, job: Job, fn: Callable[[], Any]):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = fn()
+            job.status = 'done'
+
+        except BaseException as e:
+            job.status = 'failed'
+            job.error = f'{type(e).__name__}: {e}'
+            self.logger.error(
+                f'job {job.id} ({job.operation}) failed:\n'
+                f'{traceback.format_exc()}')
+
+        finally:
+            job.finished_at = time.time()
+            job._done.set()
+
+    def _prune(self):
+        # caller holds the lock
+        finished = [
+            job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.keep, 0)]:
+            del self._jobs[job_id]
+
+    def submit(
+        self,
+        operation: str,
+        fn: Callable[[], Any],
+        exclusive: bool = False,
+        **params
+    ) -> Job:
+        job = Job(operation, params)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+
+        self.logger.info(f'job {job.id}: {operation} {params}')
+        pool = self._exclusive if exclusive else self._pool
+        pool.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self, wait: bool = False):
+        self._exclusive.shutdown(wait=wait)
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+
+import re
+import os
+import sys
+import time
+import queue
+import select
+import ctypes
+import ctypes.util
+import logging
+import threading
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Pattern, Set, Union
+from pathlib import Path
+
+from .utils import DockerLogStream
+
+
+def read_last_lines(
+    fd: int,
+    lines: int,
+    end: Optional[int] = None,
+    block_size: int = 64 * 1024
+) -> List[bytes]:
+    '''Return the last ``lines`` complete lines before offset ``end`` of an
+    open file descriptor, reading backwards in blocks so that only the tail
+    of the file is touched.
+    '''
+    if end is None:
+        end = os.fstat(fd).st_size
+
+    if lines <= 0 or end <= 0:
+        return []
+
+    blocks = []
+    newlines = 0
+    pos = end
+    # a trailing newline terminates the last line, it doesn't start a new one
+    needed = lines + 1
+    while pos > 0 and newlines < needed:
+        size = min(block_size, pos)
+        pos -= size
+        block = os.pread(fd, size, pos)
+        newlines += block.count(b'\n')
+        blocks.append(block)
+
+    data = b''.join(reversed(blocks))
+    result = data.splitlines(keepends=True)
+    return result[-lines:]
+
+
+class _InotifyWatcher:
+    '''Minimal inotify binding through ctypes, watches the log directory so
+    writes, creations and renames of any file inside it wake the tailer.
+    '''
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, directory: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        mask = (
+            self.IN_MODIFY | self.IN_ATTRIB | self.IN_CREATE |
+            self.IN_DELETE | self.IN_MOVED_FROM | self.IN_MOVED_TO
+        )
+        wd = libc.inotify_add_watch(
+            self._fd, str(directory).encode(), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(err, f'inotify_add_watch failed on {directory}')
+
+    def wait(self, timeout: float):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if readable:
+            # events are only used as a wake up signal, drain them
+            try:
+                while os.read(self._fd, 64 * 1024):
+                    ...
+
+            except BlockingIOError:
+                ...
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _PollWatcher:
+
+    def __init__(self, directory: Path):
+        ...
+
+    def wait(self, timeout: float):
+        time.sleep(timeout)
+
+    def close(self):
+        ...
+
+
+def _open_watcher(directory: Path):
+    if 'linux' in sys.platform:
+        try:
+            return _InotifyWatcher(directory)
+
+        except (OSError, AttributeError):
+            ...
+
+    return _PollWatcher(directory)
+
+
+class TailReader:
+    '''A single consumer of a ``FileTailer``, receives every line appended to
+    the file after it subscribed, preceded by the requested backlog.
+    '''
+
+    def __init__(self, tailer: 'FileTailer', maxsize: int = 0):
+        self._tailer = tailer
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.closed = False
+
+    def _put(self, line: str):
+        try:
+            self._queue.put_nowait(line)
+
+        except queue.Full:
+            # slow consumer, drop oldest line to keep the tailer moving
+            try:
+                self._queue.get_nowait()
+
+            except queue.Empty:
+                ...
+
+            self._queue.put_nowait(line)
+
+    def readline(self, timeout: Optional[float] = None) -> Optional[str]:
+        '''Return next line or ``None`` if nothing arrived within timeout.
+        '''
+        try:
+            return self._queue.get(timeout=timeout)
+
+        except queue.Empty:
+            return None
+
+    def iter_lines(self, deadline: Optional[float] = None):
+        '''Yield lines until ``deadline`` (a ``time.monotonic`` value) is
+        reached or the reader is closed.
+        '''
+        while not self.closed:
+            timeout = self._tailer.poll_interval
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    return
+
+            line = self.readline(timeout=timeout)
+            if line is not None:
+                yield line
+
+    def __iter__(self):
+        return self.iter_lines()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._tailer._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FileTailer:
+    '''In process ``tail -F`` replacement.
+
+    A background thread follows ``path`` using inotify when available or
+    polling otherwise, and fans out each complete line to every subscribed
+    ``TailReader``. Rotation (path now points to a new inode) is handled by
+    draining the old handle before reopening, and truncation (``copytruncate``
+    as done by the logrotator container) by rewinding to the start.
+    '''
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        poll_interval: float = 0.5,
+        block_size: int = 64 * 1024,
+        logger: Optional[logging.Logger] = None
+    ):
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self.block_size = block_size
+        self.logger = logger if logger else logging.getLogger('tevmc.logs')
+
+        self._lock = threading.RLock()
+        self._readers: List[TailReader] = []
+        self._fd: Optional[int] = None
+        self._ino: Optional[int] = None
+        self._pos = 0
+        self._partial = b''
+        self._thread: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        self._watcher = None
+
+    def _open(self, from_start: bool) -> bool:
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+
+        except FileNotFoundError:
+            return False
+
+        stat = os.fstat(fd)
+        self._fd = fd
+        self._ino = stat.st_ino
+        self._pos = 0 if from_start else stat.st_size
+        self._partial = b''
+        return True
+
+    def _close_fd(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._ino = None
+
+    def _dispatch(self, data: bytes):
+        data = self._partial + data
+        lines = data.split(b'\n')
+        self._partial = lines.pop()
+        if not lines:
+            return
+
+        for line in lines:
+            msg = (line + b'\n').decode('utf-8', errors='replace')
+            for reader in self._readers:
+                reader._put(msg)
+
+    def _drain(self):
+        while True:
+            data = os.pread(self._fd, self.block_size, self._pos)
+            if not data:
+                break
+
+            self._pos += len(data)
+            self._dispatch(data)
+
+    def _pump(self):
+        with self._lock:
+            if self._fd is None:
+                # file appeared after we started, read it whole
+                if not self._open(from_start=True):
+                    return
+
+            try:
+                path_ino = os.stat(self.path).st_ino
+
+            except FileNotFoundError:
+                path_ino = None
+
+            if path_ino != self._ino:
+                # rotated: finish reading the old file before switching
+                self._drain()
+                self._close_fd()
+                self.logger.debug(f'{self.path} rotated, reopening')
+                if path_ino is None or not self._open(from_start=True):
+                    return
+
+            if os.fstat(self._fd).st_size < self._pos:
+                self.logger.debug(f'{self.path} truncated, rewinding')
+                self._pos = 0
+                self._partial = b''
+
+            self._drain()
+
+    def _run(self):
+        while not self._closed.is_set():
+            try:
+                self._pump()
+
+            except OSError as e:
+                self.logger.warning(f'error while tailing {self.path}: {e}')
+
+            self._watcher.wait(self.poll_interval)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._open(from_start=False)
+            self._watcher = _open_watcher(self.path.parent)
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f'tail-{self.path.name}',
+                daemon=True)
+            self._thread.start()
+
+    def subscribe(self, backlog: int = 0, maxsize: int = 0) -> TailReader:
+        '''Register a new reader, it first receives the last ``backlog``
+        complete lines of the file and then every new line.
+        '''
+        self.start()
+        reader = TailReader(self, maxsize=maxsize)
+        with self._lock:
+            if backlog > 0 and self._fd is not None:
+                end = self._pos - len(self._partial)
+                for line in read_last_lines(
+                    self._fd, backlog, end=end, block_size=self.block_size
+                ):
+                    reader._put(line.decode('utf-8', errors='replace'))
+
+            self._readers.append(reader)
+
+        return reader
+
+    def _unsubscribe(self, reader: TailReader):
+        with self._lock:
+            if reader in self._readers:
+                self._readers.remove(reader)
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval * 4)
+
+        with self._lock:
+            for reader in list(self._readers):
+                reader.closed = True
+
+            self._readers.clear()
+            self._close_fd()
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+
+
+class LogEvent(NamedTuple):
+    service: str
+    kind: str
+    line: str
+    groups: Dict[str, str]
+    timestamp: float
+
+
+# per service readiness & progress patterns, named groups get passed along
+# on the event
+SERVICE_LOG_PATTERNS = {
+    'redis': {
+        'ready': r'Ready to accept connections'
+    },
+    'elasticsearch': {
+        'ready': r' indices into cluster_state',
+        'error': r'"level": ?"ERROR"'
+    },
+    'nodeos': {
+        'produced': r'Produced block',
+        'received': r'Received block',
+        'error': r'^error '
+    },
+    'telosevm-translator': {
+        'drained': r'drained',
+        'block_pushed': r': \[(?P<block_num>[^|\]]*)\|(?P<evm_block_num>[^\]]*)\] pushed, at ',
+        'error': r'(?i:\berror\b)'
+    },
+    'telos-evm-rpc': {
+        'ready': r'Telos EVM RPC started!!!',
+        'error': r'(?i:\berror\b)'
+    }
+}
+
+
+_NAMED_GROUP = re.compile(r'\(\?P<\w+>')
+
+
+class EventSubscription:
+    '''Queue of ``LogEvent`` for a set of event kinds of a ``LogEventBus``.
+    '''
+
+    def __init__(self, bus: 'LogEventBus', kinds: Set[str], maxsize: int = 0):
+        self._bus = bus
+        self.kinds = kinds
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def _put(self, event: LogEvent):
+        try:
+            self._queue.put_nowait(event)
+
+        except queue.Full:
+            ...
+
+    def get(self, timeout: Optional[float] = None) -> Optional[LogEvent]:
+        try:
+            return self._queue.get(timeout=timeout)
+
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._bus._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class LogEventBus:
+    '''Runs every line of a service log through a single compiled matcher
+    and fans out typed ``LogEvent`` to subscribers.
+
+    All registered patterns are merged into one alternation used as a
+    prefilter, so the common case of a line that matches nothing costs a
+    single regex search; only lines that hit get matched against each
+    individual pattern to figure out which events to emit.
+
+    The last event of each kind is latched, which lets waiters that subscribe
+    after the fact (e.g. the docker log replay already went past the ready
+    line) return immediately, and a per kind counter is kept for metrics.
+    '''
+
+    def __init__(
+        self,
+        service: str,
+        patterns: Optional[Dict[str, str]] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        self.service = service
+        self.logger = logger if logger else logging.getLogger('tevmc.logs')
+
+        self.counts: Dict[str, int] = {}
+        self.last: Dict[str, LogEvent] = {}
+
+        self._lock = threading.Lock()
+        self._patterns: Dict[str, Pattern] = {}
+        self._matcher: Optional[Pattern] = None
+        self._subs: List[EventSubscription] = []
+        self._waiters = 0
+        self._thread: Optional[threading.Thread] = None
+        self._source = None
+        self.closed = False
+
+        if patterns is None:
+            patterns = SERVICE_LOG_PATTERNS.get(service, {})
+
+        for kind, pattern in patterns.items():
+            self.register(kind, pattern)
+
+    def register(self, kind: str, pattern: str):
+        with self._lock:
+            self._patterns[kind] = re.compile(pattern)
+            self.counts.setdefault(kind, 0)
+            self._matcher = re.compile('|'.join(
+                f'(?:{_NAMED_GROUP.sub("(?:", p.pattern)})'
+                for p in self._patterns.values()
+            ))
+
+    def dispatch(self, line: str) -> List[LogEvent]:
+        if self._waiters:
+            self.logger.info(line.rstrip())
+        else:
+            self.logger.debug(line.rstrip())
+
+        if self._matcher is None or not self._matcher.search(line):
+            return []
+
+        now = time.time()
+        events = []
+        with self._lock:
+            for kind, pattern in self._patterns.items():
+                match = pattern.search(line)
+                if not match:
+                    continue
+
+                event = LogEvent(
+                    self.service, kind, line, match.groupdict(), now)
+                self.counts[kind] += 1
+                self.last[kind] = event
+                events.append(event)
+
+                for sub in self._subs:
+                    if kind in sub.kinds:
+                        sub._put(event)
+
+        return events
+
+    def subscribe(self, *kinds: str, maxsize: int = 0) -> EventSubscription:
+        sub = EventSubscription(self, set(kinds), maxsize=maxsize)
+        with self._lock:
+            self._subs.append(sub)
+
+        return sub
+
+    def _unsubscribe(self, sub: EventSubscription):
+        with self._lock:
+            if sub in self._subs:
+                self._subs.remove(sub)
+
+    def forget(self, *kinds: str):
+        '''Drop latched events so later waits only see new occurrences.
+        '''
+        with self._lock:
+            for kind in kinds if kinds else list(self.last):
+                self.last.pop(kind, None)
+
+    def wait_for(
+        self,
+        kind: str,
+        timeout: Optional[float] = None,
+        latched: bool = True
+    ) -> Optional[LogEvent]:
+        '''Block until an event of ``kind`` is seen, returns ``None`` on
+        timeout or if the log source ended.
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.subscribe(kind) as sub:
+            if latched and kind in self.last:
+                return self.last[kind]
+
+            with self._lock:
+                self._waiters += 1
+
+            try:
+                while not self.closed:
+                    wait = 0.5
+                    if deadline is not None:
+                        wait = min(wait, deadline - time.monotonic())
+                        if wait <= 0:
+                            break
+
+                    event = sub.get(timeout=wait)
+                    if event:
+                        return event
+
+                    if self._thread and not self._thread.is_alive():
+                        break
+
+            finally:
+                with self._lock:
+                    self._waiters -= 1
+
+        return None
+
+    def _pump(self, lines: Iterable[str]):
+        try:
+            for line in lines:
+                if self.closed:
+                    break
+
+                self.dispatch(line)
+
+        except Exception as e:
+            self.logger.warning(f'{self.service} log source ended: {e}')
+
+    def start(self, lines: Iterable[str]):
+        '''Consume ``lines`` on a background thread.
+        '''
+        self._source = lines
+        self._thread = threading.Thread(
+            target=self._pump, args=(lines,),
+            name=f'logbus-{self.service}',
+            daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.closed = True
+        # unblock the reader thread, plain generators can't be closed from
+        # another thread while running
+        if isinstance(self._source, (TailReader, DockerLogStream)):
+            self._source.close()
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+
+import time
+import logging
+import threading
+
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, timezone
+from contextlib import contextmanager
+
+import requests
+
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> LabelSet:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return 'NaN'
+
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+class Metric:
+    '''A metric family, one value per label set.
+    '''
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, kind: str, doc: str):
+        self._registry = registry
+        self.name = name
+        self.kind = kind
+        self.doc = doc
+        self.samples: Dict[LabelSet, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._registry._lock:
+            self.samples[_labels(labels)] = value
+            self._registry._dirty = True
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._registry._lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+            self._registry._dirty = True
+
+    def replace(self, samples: Dict[LabelSet, float]):
+        '''Swap in a whole new set of series, drops the ones that went away
+        (removed containers, deleted indices).
+        '''
+        with self._registry._lock:
+            self.samples = samples
+            self._registry._dirty = True
+
+    def lines(self) -> Iterator[str]:
+        yield f'# HELP {self.name} {self.doc}'
+        yield f'# TYPE {self.name} {self.kind}'
+        for labels, value in self.samples.items():
+            suffix = ''
+            if self.kind == 'summary':
+                # summaries carry their _sum/_count suffix as a last pseudo
+                # label, see MetricsRegistry.observe
+                labels, suffix = labels[:-1], labels[-1][1]
+
+            label_str = ''
+            if labels:
+                label_str = '{' + ','.join(
+                    f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+            yield f'{self.name}{suffix}{label_str} {_format_value(value)}'
+
+
+class MetricsRegistry:
+    '''In memory metric families rendered in the prometheus text format.
+
+    The exposition text is only rebuilt when something changed since the
+    last render, so scrapes between sampler rounds just return a string.
+    '''
+
+    def __init__(self, prefix: str = 'tevmc'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+        self._dirty = True
+        self._text = ''
+
+    def _family(self, name: str, kind: str, doc: str) -> Metric:
+        name = f'{self.prefix}_{name}'
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Metric(self, name, kind, doc)
+
+            return self._metrics[name]
+
+    def gauge(self, name: str, doc: str) -> Metric:
+        return self._family(name, 'gauge', doc)
+
+    def counter(self, name: str, doc: str) -> Metric:
+        return self._family(name, 'counter', doc)
+
+    def summary(self, name: str, doc: str) -> Metric:
+        return self._family(name, 'summary', doc)
+
+    def observe(self, name: str, doc: str, seconds: float, **labels):
+        metric = self.summary(name, doc)
+        key = _labels(labels)
+        with self._lock:
+            for suffix, amount in (('_sum', seconds), ('_count', 1)):
+                series = key + (('', suffix),)
+                metric.samples[series] = metric.samples.get(series, 0) + amount
+
+            self._dirty = True
+
+    @contextmanager
+    def timed(self, operation: str, **labels):
+        '''Time a daemon operation, recorded on exit even if it raised.
+        '''
+        start = time.monotonic()
+        status = 'error'
+        try:
+            yield
+            status = 'ok'
+
+        finally:
+            elapsed = time.monotonic() - start
+            self.observe(
+                'operation_duration_seconds',
+                'Duration of daemon operations.',
+                elapsed, operation=operation, **labels)
+            self.gauge(
+                'operation_last_duration_seconds',
+                'Duration of the last run of each daemon operation.'
+            ).set(elapsed, operation=operation, **labels)
+            self.counter(
+                'operations_total',
+                'Daemon operations run, by outcome.'
+            ).inc(operation=operation, status=status, **labels)
+
+    def render(self) -> str:
+        with self._lock:
+            if self._dirty:
+                lines = []
+                for metric in self._metrics.values():
+                    if metric.samples:
+                        lines.extend(metric.lines())
+
+                self._text = '\n'.join(lines) + '\n'
+                self._dirty = False
+
+            return self._text
+
+
+def container_usage(stats: dict) -> Dict[str, float]:
+    '''CPU, memory & network figures out of a docker stats sample.
+    '''
+    cpu = stats.get('cpu_stats', {})
+    precpu = stats.get('precpu_stats', {})
+    cpu_delta = (
+        cpu.get('cpu_usage', {}).get('total_usage', 0) -
+        precpu.get('cpu_usage', {}).get('total_usage', 0))
+    system_delta = (
+        cpu.get('system_cpu_usage', 0) - precpu.get('system_cpu_usage', 0))
+    cpus = cpu.get('online_cpus') or len(
+        cpu.get('cpu_usage', {}).get('percpu_usage') or [1])
+
+    cpu_ratio = 0.0
+    if cpu_delta > 0 and system_delta > 0:
+        cpu_ratio = cpu_delta / system_delta * cpus
+
+    memory = stats.get('memory_stats', {})
+    mem_stats = memory.get('stats', {})
+    # same as docker stats cli, page cache doesn't count
+    cache = mem_stats.get('inactive_file', mem_stats.get('cache', 0))
+
+    rx = tx = 0
+    for net in (stats.get('networks') or {}).values():
+        rx += net.get('rx_bytes', 0)
+        tx += net.get('tx_bytes', 0)
+
+    return {
+        'cpu_ratio': cpu_ratio,
+        'memory_bytes': max(memory.get('usage', 0) - cache, 0),
+        'memory_limit_bytes': memory.get('limit', 0),
+        'network_rx_bytes': rx,
+        'network_tx_bytes': tx
+    }
+
+
+class ContainerStatsStream:
+    '''Keeps the latest sample of a container docker stats stream, the
+    stream is opened once instead of doing a two second blocking
+    ``stats(stream=False)`` call per scrape.
+    '''
+
+    def __init__(self, container, logger: Optional[logging.Logger] = None):
+        self.container = container
+        self.logger = logger if logger else logging.getLogger('tevmc.metrics')
+        self.latest: Optional[Dict[str, float]] = None
+        self.closed = False
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f'stats-{container.name}',
+            daemon=True)
+
+    def _run(self):
+        try:
+            for stats in self.container.stats(stream=True, decode=True):
+                if self.closed:
+                    break
+
+                self.latest = container_usage(stats)
+
+        except Exception as e:
+            self.logger.debug(f'stats stream of {self.container.name} ended: {e}')
+
+        self.closed = True
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.closed = True
+
+
+class MetricsSampler:
+    '''Runs every collector once per ``interval`` on a background thread,
+    so scrapes never touch docker, nodeos or elasticsearch.
+    '''
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        collectors: List[Callable[[MetricsRegistry], None]],
+        interval: float = 15.0,
+        logger: Optional[logging.Logger] = None
+    ):
+        self.registry = registry
+        self.collectors = collectors
+        self.interval = interval
+        self.logger = logger if logger else logging.getLogger('tevmc.metrics')
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def collect(self):
+        for collector in self.collectors:
+            start = time.monotonic()
+            try:
+                collector(self.registry)
+                ok = 1
+
+            except Exception as e:
+                self.logger.debug(f'metrics: {collector.__name__} failed: {e}')
+                ok = 0
+
+            name = collector.__name__.lstrip('_')
+            self.registry.gauge(
+                'collector_up', 'Whether the last run of a collector worked.'
+            ).set(ok, collector=name)
+            self.registry.gauge(
+                'collector_duration_seconds', 'Duration of the last collector run.'
+            ).set(time.monotonic() - start, collector=name)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.collect()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='metrics-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+
+
+def _nodeos_time_lag(head_block_time: str) -> float:
+    head = datetime.strptime(head_block_time[:19], '%Y-%m-%dT%H:%M:%S')
+    head = head.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - head).total_seconds()
+
+
+def daemon_collectors(tevmc: 'TEVMController') -> List[Callable[[MetricsRegistry], None]]:
+    '''Collectors for every service a ``TEVMController`` runs.
+    '''
+    streams: Dict[str, ContainerStatsStream] = {}
+
+    def _containers(registry: MetricsRegistry):
+        up = {}
+        usage = {key: {} for key in (
+            'cpu_ratio', 'memory_bytes', 'memory_limit_bytes',
+            'network_rx_bytes', 'network_tx_bytes')}
+
+        for name, container in list(tevmc.containers.items()):
+            stream = streams.get(name)
+            if (stream is None or
+                stream.closed or
+                stream.container.id != container.id):
+                # first sample, container got replaced or stream died
+                if stream:
+                    stream.close()
+
+                stream = ContainerStatsStream(
+                    container, logger=tevmc.logger).start()
+                streams[name] = stream
+
+            key = _labels({'container': name})
+            up[key] = 0 if stream.closed else 1
+            if stream.latest:
+                for field, value in stream.latest.items():
+                    usage[field][key] = value
+
+        for name in set(streams) - set(tevmc.containers):
+            streams.pop(name).close()
+
+        restarts, ooms = {}, {}
+        for name, container in list(tevmc.containers.items()):
+            state = tevmc.watcher.get(container.name)
+            if state:
+                key = _labels({'container': name})
+                restarts[key] = state['restarts']
+                ooms[key] = state['oom_kills']
+
+        registry.gauge(
+            'container_up', 'Whether the container stats stream is live.'
+        ).replace(up)
+        registry.gauge(
+            'container_cpu_ratio', 'Container cpu usage, 1.0 is one core.'
+        ).replace(usage['cpu_ratio'])
+        registry.gauge(
+            'container_memory_bytes', 'Container memory usage minus page cache.'
+        ).replace(usage['memory_bytes'])
+        registry.gauge(
+            'container_memory_limit_bytes', 'Container memory limit.'
+        ).replace(usage['memory_limit_bytes'])
+        registry.counter(
+            'container_network_rx_bytes_total', 'Bytes received by the container.'
+        ).replace(usage['network_rx_bytes'])
+        registry.counter(
+            'container_network_tx_bytes_total', 'Bytes sent by the container.'
+        ).replace(usage['network_tx_bytes'])
+        registry.counter(
+            'container_restarts_total', 'Container restarts seen by the watcher.'
+        ).replace(restarts)
+        registry.counter(
+            'container_oom_kills_total', 'Container OOM kills seen by the watcher.'
+        ).replace(ooms)
+
+    def _nodeos(registry: MetricsRegistry):
+        if 'nodeos' not in tevmc.containers:
+            return
+
+        info = tevmc.cleos.get_info()
+        head = info['head_block_num']
+        lib = info['last_irreversible_block_num']
+        registry.gauge(
+            'nodeos_head_block', 'Local nodeos head block number.').set(head)
+        registry.gauge(
+            'nodeos_lib_block', 'Local nodeos last irreversible block.').set(lib)
+        registry.gauge(
+            'nodeos_lib_lag_blocks', 'Blocks between head and LIB.').set(head - lib)
+        registry.gauge(
+            'nodeos_head_lag_seconds', 'Age of the local nodeos head block.'
+        ).set(_nodeos_time_lag(info['head_block_time']))
+
+    def _sync(registry: MetricsRegistry):
+        if 'telosevm-translator' not in tevmc.containers:
+            return
+
+        sync = tevmc.sync_tracker()
+        snap = sync.snapshot()
+        series = {
+            'indexed_block': (
+                'translator_indexed_block', 'Last block pushed by the translator.'),
+            'remote_head': (
+                'remote_head_block', 'Head block of the remote sync endpoint.'),
+            'behind': (
+                'translator_behind_blocks', 'Blocks left to reach the sync target.'),
+            'blocks_per_sec': (
+                'translator_blocks_per_second', 'Smoothed translator throughput.'),
+            'eta': (
+                'translator_eta_seconds', 'Estimated seconds to catch up.')
+        }
+        for field, (name, doc) in series.items():
+            if snap[field] is not None:
+                registry.gauge(name, doc).set(snap[field])
+
+        if snap['remote_head'] is not None and snap['local_head'] is not None:
+            registry.gauge(
+                'nodeos_remote_lag_blocks',
+                'Blocks the local nodeos is behind the remote endpoint.'
+            ).set(snap['remote_head'] - snap['local_head'])
+
+    def _log_events(registry: MetricsRegistry):
+        events = {}
+        for service, bus in list(tevmc.log_buses.items()):
+            for kind, count in list(bus.counts.items()):
+                events[_labels({'service': service, 'kind': kind})] = count
+
+        registry.counter(
+            'log_events_total', 'Service log events matched by the log buses.'
+        ).replace(events)
+
+    def _elastic(registry: MetricsRegistry):
+        if 'elastic' not in tevmc.services:
+            return
+
+        catalog = tevmc.elastic_driver().index_catalog()
+        registry.gauge(
+            'elasticsearch_index_docs', 'Documents per chain index.'
+        ).replace({
+            _labels({'index': info.name, 'family': info.family}): info.docs
+            for info in catalog.indices
+        })
+
+    def _rpc(registry: MetricsRegistry):
+        if 'telos-evm-rpc' not in tevmc.containers:
+            return
+
+        bus = tevmc.log_buses.get('telos-evm-rpc')
+        ready = 1 if bus and 'ready' in bus.last else 0
+        block = None
+        try:
+            port = tevmc.config['telos-evm-rpc']['api_port']
+            resp = requests.post(
+                f'http://127.0.0.1:{port}/evm',
+                json={
+                    'jsonrpc': '2.0', 'id': 1,
+                    'method': 'eth_blockNumber', 'params': []
+                },
+                timeout=5).json()
+            block = int(resp['result'], 16)
+
+        except Exception:
+            ready = 0
+
+        registry.gauge(
+            'rpc_up', 'Whether the evm rpc logged ready and answers requests.'
+        ).set(ready)
+        if block is not None:
+            registry.gauge(
+                'rpc_block_number', 'eth_blockNumber reported by the rpc.'
+            ).set(block)
+
+    return [_containers, _nodeos, _sync, _log_events, _elastic, _rpc]
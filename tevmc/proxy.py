@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+import time
+import errno
+import socket
+import logging
+import selectors
+import threading
+
+from typing import Dict, Optional, Tuple
+
+
+Address = Tuple[str, int]
+
+
+class TCPProxy:
+    '''Forwards every connection accepted on a local port to a backend that
+    can be switched at runtime.
+
+    Switching only affects new connections, the ones already open keep
+    talking to the backend they were opened against until either side
+    closes, ``wait_drained`` blocks until an old backend has none left.
+    Used to hand the public rpc ports over between rpc containers.
+    '''
+
+    def __init__(
+        self,
+        listen: Address,
+        target: Address,
+        buffer_size: int = 64 * 1024,
+        logger: Optional[logging.Logger] = None
+    ):
+        self.listen = listen
+        self.target = target
+        self.buffer_size = buffer_size
+        self.logger = logger if logger else logging.getLogger('tevmc.proxy')
+
+        self._active: Dict[Address, int] = {}
+        self._cond = threading.Condition()
+        self._sock: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self.closed = False
+
+    def bind(self, timeout: float = 30.0):
+        '''Bind the listen address, retrying while its previous owner (an
+        rpc container being stopped) releases it.
+        '''
+        deadline = time.monotonic() + timeout
+        while True:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.bind(self.listen)
+                break
+
+            except OSError as e:
+                sock.close()
+                if e.errno != errno.EADDRINUSE or time.monotonic() > deadline:
+                    raise
+
+                time.sleep(0.05)
+
+        sock.listen(128)
+        self._sock = sock
+        self.listen = sock.getsockname()
+
+    def start(self, timeout: float = 30.0):
+        if self._sock is None:
+            self.bind(timeout=timeout)
+
+        self._thread = threading.Thread(
+            target=self._accept_loop,
+            name=f'proxy-{self.listen[1]}',
+            daemon=True)
+        self._thread.start()
+
+    def switch(self, target: Address):
+        with self._cond:
+            self.logger.info(
+                f'proxy {self.listen[1]}: {self.target[1]} -> {target[1]}')
+            self.target = target
+
+    def active(self, target: Address) -> int:
+        with self._cond:
+            return self._active.get(target, 0)
+
+    def wait_drained(self, target: Address, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._active.get(target, 0) == 0, timeout=timeout)
+
+    def _accept_loop(self):
+        while not self.closed:
+            try:
+                client, _ = self._sock.accept()
+
+            except OSError:
+                break
+
+            with self._cond:
+                target = self.target
+                self._active[target] = self._active.get(target, 0) + 1
+
+            threading.Thread(
+                target=self._serve, args=(client, target), daemon=True).start()
+
+    def _serve(self, client: socket.socket, target: Address):
+        backend = None
+        try:
+            backend = socket.create_connection(target, timeout=10)
+            backend.settimeout(None)
+            self._pipe(client, backend)
+
+        except OSError as e:
+            self.logger.debug(f'proxy {self.listen[1]} -> {target[1]}: {e}')
+
+        finally:
+            for sock in (client, backend):
+                if sock:
+                    sock.close()
+
+            with self._cond:
+                self._active[target] -= 1
+                self._cond.notify_all()
+
+    def _pipe(self, client: socket.socket, backend: socket.socket):
+        peers = {client: backend, backend: client}
+        with selectors.DefaultSelector() as sel:
+            for sock in peers:
+                sel.register(sock, selectors.EVENT_READ)
+
+            open_sides = 2
+            while open_sides and not self.closed:
+                for key, _ in sel.select(timeout=1.0):
+                    data = key.fileobj.recv(self.buffer_size)
+                    peer = peers[key.fileobj]
+                    if data:
+                        peer.sendall(data)
+                        continue
+
+                    # half close, keep the other direction flowing
+                    sel.unregister(key.fileobj)
+                    open_sides -= 1
+                    try:
+                        peer.shutdown(socket.SHUT_WR)
+
+                    except OSError:
+                        ...
+
+    def close(self):
+        self.closed = True
+        if self._sock:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+
+            except OSError:
+                ...
+
+            self._sock.close()
+            self._sock = None
+
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
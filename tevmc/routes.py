@@ -2,10 +2,13 @@ import importlib
 from pathlib import Path
 import time
 
-from flask import request, jsonify
+import simplejson
 
-from tevmc.cmdline.build import build_service
-from tevmc.testing.database import ElasticDataIntegrityError, ElasticDriver
+from flask import Response, request, jsonify
+
+from tevmc.testing.database import (
+    INTEGRITY_CHECKPOINT, ElasticDataIntegrityError)
+from tevmc.testing.async_database import SyncElasticDriver
 
 
 def add_routes(tevmc: 'TEVMController'):
@@ -14,19 +17,94 @@ def add_routes(tevmc: 'TEVMController'):
 
     @app.route('/status', methods=['GET'])
     def status():
-        result = {'services': {}}
-        for cont_name, cont in tevmc.containers.items():
-            cont.reload()
-            result['services'][cont_name] = {
-                'status': cont.status
-            }
+        # served from the container watcher table, no docker round trips
+        version, states = tevmc.watcher.snapshot()
+        result = {'version': version, 'services': {}}
+        for cont_name, cont in list(tevmc.containers.items()):
+            state = states.get(cont.name)
+            if state is None:
+                state = {'status': cont.status}
+
+            result['services'][cont_name] = state
 
         return jsonify(result)
 
+    @app.route('/status/changes', methods=['GET'])
+    def status_changes():
+        # long poll, returns the containers whose state changed after
+        # version `since` as soon as there is one or `timeout` expires
+        since = request.args.get('since', 0, type=int)
+        timeout = min(request.args.get('timeout', 30.0, type=float), 300.0)
+        version, changes = tevmc.watcher.changes(since, timeout=timeout)
+        if changes is None:
+            # client fell behind the kept history, send the whole table
+            version, states = tevmc.watcher.snapshot()
+            return jsonify(version=version, reset=True, changes=list(states.values()))
+
+        return jsonify(version=version, reset=False, changes=changes)
+
+    def _background() -> bool:
+        # ?background=true or {"background": true} on the json body
+        value = request.args.get('background')
+        if value is None:
+            value = (request.get_json(silent=True) or {}).get('background')
+
+        return str(value).lower() == 'true'
+
+    def _job_response(job):
+        if _background():
+            return (
+                jsonify(job=job.to_dict()), 202,
+                {'Location': f'/jobs/{job.id}'})
+
+        job.wait()
+        if job.status == 'failed':
+            return jsonify(error=job.error, job=job.id), 500
+
+        return jsonify(job.result), 200
+
+    @app.route('/jobs', methods=['GET'])
+    def jobs():
+        return jsonify(jobs=[job.to_dict() for job in tevmc.jobs.list()])
+
+    @app.route('/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        job = tevmc.jobs.get(job_id)
+        if not job:
+            return jsonify(error='job not found'), 404
+
+        # optional long poll until the job finishes
+        timeout = request.args.get('timeout', None, type=float)
+        if timeout:
+            job.wait(timeout=min(timeout, 300.0))
+
+        return jsonify(job.to_dict())
+
     @app.route('/restart', methods=['POST'])
     def restart():
         service = request.json.get('service', None)
         must_update = request.json.get('update', False)
+        rolling = request.json.get(
+            'rolling',
+            tevmc.config['telos-evm-rpc'].get('rolling_restart', False))
+
+        def _run():
+            with tevmc.metrics.timed('restart', service=service or 'all'):
+                _restart(service, must_update, rolling)
+
+            return {'success': True}
+
+        return _job_response(tevmc.jobs.submit(
+            'restart', _run, exclusive=True,
+            service=service, update=must_update, rolling=rolling))
+
+    def _build(service, must_update):
+        # through the image manager so images get their context hash label
+        # and the tag index stays current
+        tevmc.images.build_services(
+            tevmc.root_pwd, [service], tevmc.config, nocache=must_update)
+
+    def _restart(service, must_update, rolling):
         if service is None:
             tevmc.logger.info('tevmc restart requested, stopping...')
             tevmc.stop()
@@ -35,21 +113,20 @@ def add_routes(tevmc: 'TEVMController'):
             tevmc.start()
 
         elif service == 'nodeos':
-            build_service(
-                Path('.'), 'nodeos', tevmc.config, tevmc.logger, nocache=must_update)
+            _build('nodeos', must_update)
             tevmc.restart_nodeos()
 
         elif service == 'indexer':
-            build_service(
-                Path('.'), 'indexer', tevmc.config, tevmc.logger, nocache=must_update)
+            _build('indexer', must_update)
             tevmc.restart_translator()
 
         elif service == 'rpc':
-            build_service(
-                Path('.'), 'rpc', tevmc.config, tevmc.logger, nocache=must_update)
-            tevmc.restart_rpc()
+            _build('rpc', must_update)
+            if rolling:
+                tevmc.rolling_restart_rpc()
 
-        return jsonify(success=True), 200
+            else:
+                tevmc.restart_rpc()
 
 
     @app.route('/patch', methods=['POST'])
@@ -71,20 +148,62 @@ def add_routes(tevmc: 'TEVMController'):
 
         try:
             patch_fn = getattr(module, 'tevmc_apply_patch')
-            ret = patch_fn(tevmc)
-
-            return jsonify(ret), 200
 
         except AttributeError:
             return jsonify(error='patch function not found'), 400
 
-    @app.route('/check', methods=['GET'])
-    def check():
-        try:
-            ElasticDriver(tevmc.config).full_integrity_check()
-            status = 'healthy'
+        def _run():
+            with tevmc.metrics.timed('patch'):
+                return patch_fn(tevmc)
 
-        except ElasticDataIntegrityError as e:
-            status = f'unhealthy: {e}'
+        return _job_response(tevmc.jobs.submit(
+            'patch', _run, exclusive=True, path=str(pf_path)))
 
-        return jsonify({'status': status})
+    @app.route('/check', methods=['GET'])
+    def check():
+        workers = request.args.get('workers', 1, type=int)
+        full = request.args.get('full', 'false').lower() == 'true'
+        hash_chain = request.args.get('hash_chain', 'false').lower() == 'true'
+
+        def _run():
+            try:
+                es = SyncElasticDriver(
+                    tevmc.config,
+                    checkpoint_path=tevmc.root_pwd / INTEGRITY_CHECKPOINT)
+                with tevmc.metrics.timed('check'):
+                    es.full_integrity_check(
+                        workers=workers, full=full, hash_chain=hash_chain)
+
+                status = 'healthy'
+
+            except ElasticDataIntegrityError as e:
+                status = f'unhealthy: {e}'
+
+            return {'status': status}
+
+        return _job_response(tevmc.jobs.submit(
+            'check', _run,
+            workers=workers, full=full, hash_chain=hash_chain))
+
+    @app.route('/sync', methods=['GET'])
+    def sync():
+        return jsonify(tevmc.sync_tracker().snapshot())
+
+    @app.route('/sync/stream', methods=['GET'])
+    def sync_stream():
+        # server sent events, a snapshot per tracker update
+        timeout = request.args.get('timeout', None, type=float)
+        updates = tevmc.sync_tracker().updates(timeout=timeout)
+
+        def events():
+            for snapshot in updates:
+                yield f'data: {simplejson.dumps(snapshot)}\n\n'
+
+        return Response(events(), mimetype='text/event-stream')
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        # collected by the background sampler, a scrape only renders
+        return Response(
+            tevmc.metrics.render(),
+            mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import time
+import logging
+import threading
+
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+
+class StartupCancelled(BaseException):
+    ...
+
+
+class StartupTask:
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[], None],
+        depends: Iterable[str] = (),
+        timeout: Optional[float] = None
+    ):
+        self.name = name
+        self.fn = fn
+        self.depends = list(depends)
+        self.timeout = timeout
+        self.start: Optional[float] = None
+        self.end: Optional[float] = None
+
+    def run(self):
+        self.start = time.monotonic()
+        try:
+            self.fn()
+
+        finally:
+            self.end = time.monotonic()
+
+
+class StartupScheduler:
+    '''Runs service start up functions on a thread pool, each one as soon as
+    all the services it depends on are up.
+
+    Tasks are submitted in the order they were added whenever their
+    dependencies allow it, so with ``max_workers=1`` the result is a plain
+    sequential start up. The first failure (or task going past its timeout)
+    stops scheduling and is re-raised on the calling thread.
+
+    Timed out tasks can't be interrupted, ``cancelled`` gets set when
+    start up is aborted so they can refuse to start anything else.
+    '''
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        self.max_workers = max_workers
+        self.logger = logger if logger else logging.getLogger('tevmc.scheduler')
+        self.tasks: Dict[str, StartupTask] = {}
+        self.origin: Optional[float] = None
+        self.cancelled = threading.Event()
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[[], None],
+        depends: Iterable[str] = (),
+        timeout: Optional[float] = None
+    ):
+        if name in self.tasks:
+            raise ValueError(f'task {name} already scheduled')
+
+        self.tasks[name] = StartupTask(name, fn, depends, timeout)
+
+    def _check_graph(self):
+        for task in self.tasks.values():
+            for dep in task.depends:
+                if dep not in self.tasks:
+                    raise ValueError(f'{task.name} depends on unknown task {dep}')
+
+        # detect cycles by repeatedly peeling tasks without pending deps
+        pending = {name: set(task.depends) for name, task in self.tasks.items()}
+        while pending:
+            ready = [name for name, deps in pending.items() if not deps]
+            if not ready:
+                raise ValueError(
+                    f'dependency cycle between {sorted(pending.keys())}')
+
+            for name in ready:
+                del pending[name]
+
+            for deps in pending.values():
+                deps.difference_update(ready)
+
+    def run(self):
+        self._check_graph()
+
+        workers = self.max_workers if self.max_workers else max(len(self.tasks), 1)
+        executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='tevmc-start')
+
+        done = set()
+        running: Dict[Future, StartupTask] = {}
+        waiting = list(self.tasks.values())
+        self.origin = time.monotonic()
+
+        try:
+            while waiting or running:
+                for task in list(waiting):
+                    if all(dep in done for dep in task.depends):
+                        waiting.remove(task)
+                        self.logger.info(f'starting {task.name}...')
+                        running[executor.submit(task.run)] = task
+
+                now = time.monotonic()
+                deadlines = [
+                    task.start + task.timeout - now
+                    for task in running.values()
+                    if task.timeout is not None and task.start is not None
+                ]
+                timeout = max(min(deadlines), 0) if deadlines else 1.0
+
+                finished, _ = wait(
+                    running.keys(), timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for fut in finished:
+                    task = running.pop(fut)
+                    exc = fut.exception()
+                    if exc is not None:
+                        self.logger.critical(f'{task.name} failed to start: {exc!r}')
+                        raise exc
+
+                    done.add(task.name)
+                    self.logger.info(
+                        f'{task.name} up in {task.end - task.start:.2f}s')
+
+                now = time.monotonic()
+                for task in running.values():
+                    if (task.timeout is not None and
+                        task.start is not None and
+                        now - task.start > task.timeout):
+                        raise TimeoutError(
+                            f'{task.name} didn\'t start in {task.timeout} seconds')
+
+        except BaseException:
+            self.cancelled.set()
+            raise
+
+        finally:
+            for fut in running:
+                fut.cancel()
+
+            executor.shutdown(wait=False)
+
+    def timeline(self) -> Dict[str, Tuple[float, float]]:
+        '''Start & end offsets in seconds of each started task relative to
+        the scheduler start.
+        '''
+        result = {}
+        for name, task in self.tasks.items():
+            if task.start is None:
+                continue
+
+            end = task.end if task.end is not None else time.monotonic()
+            result[name] = (task.start - self.origin, end - self.origin)
+
+        return result
+
+    def check_cancelled(self):
+        '''Raise ``StartupCancelled`` if start up got aborted, for tasks
+        about to start something that would outlive the teardown.
+        '''
+        if self.cancelled.is_set():
+            raise StartupCancelled('start up aborted')
+
+    def report(self, width: int = 40) -> List[str]:
+        timeline = self.timeline()
+        if not timeline:
+            return []
+
+        total = max(end for _, end in timeline.values()) or 1.0
+        lines = []
+        for name, (start, end) in sorted(timeline.items(), key=lambda i: i[1]):
+            begin = int(start / total * width)
+            size = max(int((end - start) / total * width), 1)
+            bar = ' ' * begin + '#' * size
+            lines.append(
+                f'{name:>16} |{bar:<{width}}| {start:7.2f}s -> {end:7.2f}s')
+
+        return lines
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+import time
+import logging
+import itertools
+import threading
+
+from typing import Dict, Iterable, List, Optional
+
+from .metrics import ContainerStatsStream
+from .testing.database import ElasticDriver
+
+
+# telosevm-translator config keys a sweep varies
+SWEEP_KEYS = ('worker_amount', 'elastic_dump_size', 'elastic_timeout')
+
+
+def sweep_grid(
+    worker_amounts: Iterable[int],
+    dump_sizes: Iterable[int],
+    timeouts: Iterable[int]
+) -> List[Dict[str, int]]:
+    '''Every combination of the swept translator settings.
+    '''
+    return [
+        dict(zip(SWEEP_KEYS, values))
+        for values in itertools.product(worker_amounts, dump_sizes, timeouts)
+    ]
+
+
+def bulk_stats(elastic) -> Dict[str, int]:
+    '''Bulk request totals summed over every ES node.
+    '''
+    stats = elastic.nodes.stats(metric='indices', index_metric='bulk')
+    totals = {'operations': 0, 'time_ms': 0, 'size_bytes': 0}
+    for node in stats['nodes'].values():
+        bulk = node['indices']['bulk']
+        totals['operations'] += bulk['total_operations']
+        totals['time_ms'] += bulk['total_time_in_millis']
+        totals['size_bytes'] += bulk['total_size_in_bytes']
+
+    return totals
+
+
+def reset_indices(es: ElasticDriver):
+    '''Drop the chain delta & action indices so every run replays the same
+    range into empty indices.
+    '''
+    for family in ('delta', 'action'):
+        es.elastic.indices.delete(
+            index=f'{es.chain_name}-{family}-*',
+            ignore_unavailable=True,
+            allow_no_indices=True)
+
+    es.invalidate_catalog()
+
+
+class SweepRun:
+    '''Samples translator progress, memory & ES bulk totals while it
+    indexes ``start_block`` to ``end_block``.
+    '''
+
+    def __init__(
+        self,
+        es: ElasticDriver,
+        start_block: int,
+        end_block: int,
+        poll_interval: float = 1.0
+    ):
+        self.es = es
+        self.start_block = start_block
+        self.end_block = end_block
+        self.poll_interval = poll_interval
+
+        self.started: Optional[float] = None
+        self.first_block_at: Optional[float] = None
+        self.done_at: Optional[float] = None
+        self.head: Optional[int] = None
+        self.memory: List[float] = []
+        self._bulk_before: Optional[Dict[str, int]] = None
+        self._bulk_after: Optional[Dict[str, int]] = None
+
+    def begin(self):
+        self._bulk_before = bulk_stats(self.es.elastic)
+        self.started = time.monotonic()
+
+    def sample(self, stats: Optional[ContainerStatsStream] = None) -> bool:
+        '''Take one sample, returns True once the end block is indexed.
+        '''
+        now = time.monotonic()
+        if stats and stats.latest:
+            self.memory.append(stats.latest['memory_bytes'])
+
+        self.es.index_catalog(refresh=True)
+        block = self.es.get_last_indexed_block()
+        if block:
+            self.head = block.block_num
+            if self.first_block_at is None:
+                self.first_block_at = now
+
+            if self.head >= self.end_block:
+                self.done_at = now
+
+        return self.done_at is not None
+
+    def finish(self):
+        self._bulk_after = bulk_stats(self.es.elastic)
+
+    def result(self, params: Dict) -> Dict:
+        blocks = self.end_block - self.start_block + 1
+        result = {
+            **params,
+            'status': 'ok' if self.done_at else 'timeout',
+            'error': None,
+            'head': self.head,
+            'elapsed': None,
+            'startup': None,
+            'blocks_per_sec': None,
+            'bulk_requests': None,
+            'bulk_mean_ms': None,
+            'bulk_mean_bytes': None,
+            'memory_peak_bytes': max(self.memory) if self.memory else None,
+            'memory_mean_bytes': (
+                sum(self.memory) / len(self.memory) if self.memory else None)
+        }
+
+        if self.first_block_at is not None:
+            result['startup'] = self.first_block_at - self.started
+
+        if self.done_at is not None:
+            result['elapsed'] = self.done_at - self.started
+            # steady state rate, translator & ES startup excluded
+            indexing = max(self.done_at - self.first_block_at, self.poll_interval)
+            result['blocks_per_sec'] = blocks / indexing
+
+        if self._bulk_before and self._bulk_after:
+            delta = {
+                key: self._bulk_after[key] - self._bulk_before[key]
+                for key in self._bulk_before
+            }
+            result['bulk_requests'] = delta['operations']
+            if delta['operations'] > 0:
+                result['bulk_mean_ms'] = delta['time_ms'] / delta['operations']
+                result['bulk_mean_bytes'] = (
+                    delta['size_bytes'] / delta['operations'])
+
+        return result
+
+
+def run_sweep(
+    tevmc,
+    mocker,
+    grid: List[Dict[str, int]],
+    start_block: int,
+    end_block: int,
+    timeout: float = 600.0,
+    poll_interval: float = 1.0,
+    logger: Optional[logging.Logger] = None
+) -> List[Dict]:
+    '''Index ``start_block`` to ``end_block`` from the ship ``mocker`` once
+    per ``grid`` entry, restarting the translator of ``tevmc`` with that
+    entry's settings over empty indices each time.
+    '''
+    logger = logger if logger else tevmc.logger
+    config = tevmc.config['telosevm-translator']
+    es = ElasticDriver(tevmc.config)
+
+    results = []
+    for params in grid:
+        logger.info(f'sweep: {params}')
+        tevmc.stop_translator()
+        reset_indices(es)
+        mocker.set_block(start_block)
+
+        config.update(params)
+        config['start_block'] = start_block
+        config['stop_block'] = end_block
+
+        run = SweepRun(es, start_block, end_block, poll_interval=poll_interval)
+        run.begin()
+
+        errors = []
+
+        def _start():
+            # blocks until the translator logs it drained, sample meanwhile
+            try:
+                tevmc.start_telosevm_translator()
+
+            except BaseException as e:
+                errors.append(e)
+
+        prev = tevmc.containers.get('telosevm-translator')
+        threading.Thread(target=_start, daemon=True).start()
+
+        stats = None
+        deadline = time.monotonic() + timeout
+        try:
+            while time.monotonic() < deadline and not errors:
+                container = tevmc.containers.get('telosevm-translator')
+                if stats is None and container is not None and container is not prev:
+                    stats = ContainerStatsStream(container, logger=logger).start()
+
+                if run.sample(stats):
+                    break
+
+                time.sleep(poll_interval)
+
+        finally:
+            if stats:
+                stats.close()
+
+            run.finish()
+
+        result = run.result(params)
+        if errors:
+            result['status'] = 'failed'
+            result['error'] = str(errors[0])
+
+        logger.info(f'sweep result: {result}')
+        results.append(result)
+
+    tevmc.stop_translator()
+    return results
+
+
+def format_sweep_table(results: List[Dict]) -> str:
+    '''Comparison table of ``run_sweep`` results, fastest first.
+    '''
+    def _num(value, fmt):
+        return format(value, fmt) if value is not None else '-'
+
+    rows = sorted(
+        results, key=lambda result: -(result['blocks_per_sec'] or 0))
+    lines = [
+        f'{"workers":>7} {"dump":>6} {"timeout":>7} {"status":>7} '
+        f'{"blocks/s":>9} {"startup":>8} {"bulks":>6} {"bulk ms":>8} '
+        f'{"peak MiB":>9} {"mean MiB":>9}'
+    ]
+    for result in rows:
+        peak = result['memory_peak_bytes']
+        mean = result['memory_mean_bytes']
+        lines.append(
+            f'{result["worker_amount"]:>7} '
+            f'{result["elastic_dump_size"]:>6} '
+            f'{result["elastic_timeout"]:>7} '
+            f'{result["status"]:>7} '
+            f'{_num(result["blocks_per_sec"], ".1f"):>9} '
+            f'{_num(result["startup"], ".1f"):>8} '
+            f'{_num(result["bulk_requests"], "d"):>6} '
+            f'{_num(result["bulk_mean_ms"], ".1f"):>8} '
+            f'{_num(peak / 2 ** 20 if peak else None, ".0f"):>9} '
+            f'{_num(mean / 2 ** 20 if mean else None, ".0f"):>9}')
+
+    return '\n'.join(lines)
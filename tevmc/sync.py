@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+
+import math
+import time
+import queue
+import logging
+import threading
+
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .logs import LogEventBus
+
+
+# public chain api used as sync target when daemon.sync.remote_endpoint is
+# not set, local chains track their own nodeos
+DEFAULT_REMOTE_ENDPOINTS = {
+    'testnet': 'https://testnet.telos.net',
+    'mainnet': 'https://mainnet.telos.net'
+}
+
+
+def default_remote_endpoint(chain_name: str, local_endpoint: str) -> str:
+    for network, endpoint in DEFAULT_REMOTE_ENDPOINTS.items():
+        if network in chain_name:
+            return endpoint
+
+    return local_endpoint
+
+
+def parse_block_num(value: Optional[str]) -> Optional[int]:
+    '''Block numbers as logged by the translator, ``'1,234'`` or ``'NaN'``.
+    '''
+    if value is None:
+        return None
+
+    value = value.replace(',', '').strip()
+    if not value.isdigit():
+        return None
+
+    return int(value)
+
+
+HeadSource = Callable[[], Optional[int]]
+IndexedSource = Callable[[], Optional[Tuple[int, Optional[int]]]]
+
+
+class SyncTracker:
+    '''Follows indexer catch up against the local nodeos & a remote chain.
+
+    The indexed head comes from the translator ``block_pushed`` log events,
+    elasticsearch gets sampled every ``interval`` seconds to fill in when
+    the log is quiet (no bus, restarts, repairs). Throughput is an
+    exponential moving average of blocks/sec weighted by elapsed time, so
+    irregular updates don't skew it; ``window`` is its time constant in
+    seconds.
+
+    The remote head only gets polled every ``remote_interval`` seconds,
+    failing sources keep their last known value.
+    '''
+
+    def __init__(
+        self,
+        indexed_head: IndexedSource,
+        local_head: HeadSource,
+        remote_head: HeadSource,
+        interval: float = 10.0,
+        remote_interval: float = 60.0,
+        window: float = 60.0,
+        logger: Optional[logging.Logger] = None
+    ):
+        self.logger = logger if logger else logging.getLogger('tevmc.sync')
+        self._sources = {
+            'indexed': indexed_head,
+            'local': local_head,
+            'remote': remote_head
+        }
+        self.interval = interval
+        self.remote_interval = remote_interval
+        self.window = window
+
+        self.indexed_block: Optional[int] = None
+        self.indexed_evm_block: Optional[int] = None
+        self.local_head: Optional[int] = None
+        self.remote_head: Optional[int] = None
+        self.rate: Optional[float] = None
+        self.updated_at: Optional[float] = None
+
+        self._remote_at: Optional[float] = None
+        self._rate_block: Optional[int] = None
+        self._rate_time: Optional[float] = None
+        self._event_at: Optional[float] = None
+
+        self._lock = threading.Lock()
+        self._subs: List[queue.Queue] = []
+        self._thread: Optional[threading.Thread] = None
+        self.closed = False
+
+    def _poll(self, name: str):
+        try:
+            return self._sources[name]()
+
+        except Exception as e:
+            self.logger.debug(f'sync: {name} head unavailable: {e}')
+            return None
+
+    def observe(
+        self,
+        block_num: int,
+        evm_block_num: Optional[int] = None,
+        now: Optional[float] = None
+    ) -> bool:
+        '''Record a new indexed head, returns True when the rate got updated.
+
+        Rate updates are spaced at least a second apart so per block events
+        don't turn the average into noise.
+        '''
+        now = time.time() if now is None else now
+        with self._lock:
+            self.indexed_block = block_num
+            if evm_block_num is not None:
+                self.indexed_evm_block = evm_block_num
+
+            self.updated_at = now
+
+            if self._rate_time is None or block_num < self._rate_block:
+                # first sample or indexer rewound (repair, restart)
+                self._rate_block, self._rate_time = block_num, now
+                return False
+
+            elapsed = now - self._rate_time
+            if elapsed < 1.0:
+                return False
+
+            current = (block_num - self._rate_block) / elapsed
+            if self.rate is None:
+                self.rate = current
+
+            else:
+                alpha = 1 - math.exp(-elapsed / self.window)
+                self.rate += alpha * (current - self.rate)
+
+            self._rate_block, self._rate_time = block_num, now
+            return True
+
+    def sample(self, now: Optional[float] = None) -> Dict:
+        '''Poll every source once and publish the resulting snapshot.
+        '''
+        now = time.time() if now is None else now
+
+        local = self._poll('local')
+        if local is not None:
+            self.local_head = local
+
+        if (self._remote_at is None or
+            now - self._remote_at >= self.remote_interval):
+            remote = self._poll('remote')
+            if remote is not None:
+                self.remote_head = remote
+                self._remote_at = now
+
+        indexed = self._poll('indexed')
+        if indexed is not None and self._use_indexed(indexed[0], now):
+            self.observe(*indexed, now=now)
+
+        snapshot = self.snapshot()
+        self._publish(snapshot)
+        return snapshot
+
+    def _use_indexed(self, block_num: int, now: float) -> bool:
+        # elasticsearch lags the translator by a bulk flush, while events
+        # flow they are authoritative unless it is ahead of them
+        if (self._event_at is None or
+            now - self._event_at > 2 * self.interval):
+            return True
+
+        return self.indexed_block is None or block_num > self.indexed_block
+
+    @property
+    def target(self) -> Optional[int]:
+        if self.remote_head is not None:
+            return self.remote_head
+
+        return self.local_head
+
+    @property
+    def behind(self) -> Optional[int]:
+        target = self.target
+        if target is None or self.indexed_block is None:
+            return None
+
+        return max(target - self.indexed_block, 0)
+
+    @property
+    def eta(self) -> Optional[float]:
+        '''Seconds left to reach the target at the current rate.
+        '''
+        behind = self.behind
+        if behind is None:
+            return None
+
+        if behind == 0:
+            return 0.0
+
+        if not self.rate or self.rate <= 0:
+            return None
+
+        return behind / self.rate
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'indexed_block': self.indexed_block,
+                'indexed_evm_block': self.indexed_evm_block,
+                'local_head': self.local_head,
+                'remote_head': self.remote_head,
+                'behind': self.behind,
+                'blocks_per_sec': self.rate,
+                'eta': self.eta,
+                'updated_at': self.updated_at
+            }
+
+    def describe(self) -> str:
+        snap = self.snapshot()
+        parts = [
+            f'indexed {snap["indexed_block"]} of {self.target}',
+            f'behind {snap["behind"]}'
+        ]
+        if snap['blocks_per_sec'] is not None:
+            parts.append(f'{snap["blocks_per_sec"]:.1f} blocks/sec')
+
+        if snap['eta'] is not None:
+            parts.append(f'eta {snap["eta"] / 3600:.2f}h')
+
+        return ', '.join(parts)
+
+    def _publish(self, snapshot: Dict):
+        with self._lock:
+            subs = list(self._subs)
+
+        for sub in subs:
+            # subscribers only care about the latest state
+            try:
+                sub.get_nowait()
+
+            except queue.Empty:
+                ...
+
+            try:
+                sub.put_nowait(snapshot)
+
+            except queue.Full:
+                ...
+
+    def updates(self, timeout: Optional[float] = None) -> Iterator[Dict]:
+        '''Yield the current snapshot and then every new one, returns after
+        ``timeout`` seconds without updates or when the tracker closes.
+        '''
+        sub = queue.Queue(maxsize=1)
+        with self._lock:
+            self._subs.append(sub)
+
+        try:
+            yield self.snapshot()
+            while not self.closed:
+                try:
+                    snapshot = sub.get(timeout=timeout)
+
+                except queue.Empty:
+                    return
+
+                if snapshot is None:
+                    return
+
+                yield snapshot
+
+        finally:
+            with self._lock:
+                self._subs.remove(sub)
+
+    def _run(self, bus: Optional[LogEventBus]):
+        pushes = bus.subscribe('block_pushed') if bus else None
+        next_sample = 0.0
+        try:
+            while not self.closed:
+                now = time.monotonic()
+                if now >= next_sample:
+                    self.sample()
+                    next_sample = now + self.interval
+
+                wait = max(next_sample - time.monotonic(), 0.0)
+                if not pushes:
+                    time.sleep(min(wait, 1.0))
+                    continue
+
+                event = pushes.get(timeout=min(wait, 1.0))
+                if event is None:
+                    continue
+
+                block_num = parse_block_num(event.groups['block_num'])
+                if block_num is None:
+                    continue
+
+                self._event_at = time.time()
+                if self.observe(
+                    block_num,
+                    parse_block_num(event.groups['evm_block_num'])):
+                    self._publish(self.snapshot())
+
+        finally:
+            if pushes:
+                pushes.close()
+
+    def start(self, bus: Optional[LogEventBus] = None):
+        '''Sample on a background thread, following ``bus`` translator
+        events in between samples if given.
+        '''
+        if self._thread and self._thread.is_alive():
+            return
+
+        self.closed = False
+        self._thread = threading.Thread(
+            target=self._run, args=(bus,),
+            name='sync-tracker',
+            daemon=True)
+        self._thread.start()
+
+    def wait_synced(
+        self,
+        threshold: int = 100,
+        log_interval: float = 60.0,
+        poll: float = 1.0
+    ):
+        '''Block until the indexer is less than ``threshold`` blocks behind
+        the target, logging progress every ``log_interval`` seconds.
+        '''
+        last_log = None
+        while not self.closed:
+            behind = self.behind
+            if behind is not None and behind < threshold:
+                return
+
+            now = time.monotonic()
+            if last_log is None or now - last_log >= log_interval:
+                self.logger.info(f'waiting on indexer... {self.describe()}')
+                last_log = now
+
+            time.sleep(poll)
+
+    def close(self):
+        self.closed = True
+        self._publish(None)
+        if self._thread:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
@@ -0,0 +1,753 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+
+from typing import Awaitable, Dict, Iterable, List, Optional, Set, Tuple
+from pathlib import Path
+
+from elasticsearch import AsyncElasticsearch, NotFoundError
+
+from tevmc.testing.database import (
+    DeltaBlockScan,
+    ElasticDataEmptyError,
+    ElasticDataIntegrityError,
+    ElasticQueries,
+    ESDuplicatesFound,
+    ESGapFound,
+    ESHashChainBroken,
+    HashChainScan,
+    IndexCatalog,
+    IntegrityCheckpoint,
+    IntegrityReport,
+    StorageEosioAction,
+    StorageEosioDelta,
+    TERMS_CHUNK,
+    format_block_numbers
+)
+
+
+DEFAULT_CONNECTIONS = 10
+
+
+async def gather_limited(aws: Iterable[Awaitable], limit: int) -> list:
+    '''Like ``asyncio.gather`` but with at most ``limit`` awaitables running
+    at the same time, results keep the input order.
+    '''
+    sem = asyncio.Semaphore(max(limit, 1))
+
+    async def _run(aw):
+        async with sem:
+            return await aw
+
+    return await asyncio.gather(*[_run(aw) for aw in aws])
+
+
+class AsyncElasticDriver(ElasticQueries):
+    '''``ElasticDriver`` on ``AsyncElasticsearch``, independent queries like
+    per index scans, summaries & bounds get issued concurrently over a pool
+    of ``connections`` connections per node. The only implementation of the
+    integrity check & repair, sync callers go through ``SyncElasticDriver``.
+
+    Must be closed, use it as an async context manager.
+    '''
+
+    def __init__(
+        self,
+        config: dict,
+        checkpoint_path: Optional[Path] = None,
+        connections: Optional[int] = None
+    ):
+        super().__init__(config, checkpoint_path=checkpoint_path)
+        if not connections:
+            connections = config['elasticsearch'].get(
+                'connections', DEFAULT_CONNECTIONS)
+
+        self.connections = connections
+        self.elastic = AsyncElasticsearch(
+            **self._client_kwargs(config),
+            connections_per_node=connections)
+
+    async def close(self):
+        await self.elastic.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _search_one(self, record=None, **request):
+        try:
+            return self._first_hit(await self.elastic.search(**request), record)
+
+        except NotFoundError:
+            return None
+
+    async def tx_from_hash(self, h: str) -> Optional[StorageEosioAction]:
+        return await self._search_one(
+            record=StorageEosioAction,
+            index=f'{self.chain_name}-action-*',
+            size=1,
+            query={'match': {'@raw.hash': h}})
+
+    async def block_from_evm_num(self, num: int) -> Optional[StorageEosioDelta]:
+        return await self._search_one(
+            index=f'{self.chain_name}-delta-*',
+            size=1,
+            query={'match': {'@global.block_num': num}})
+
+    async def index_catalog(self, refresh: bool = False) -> IndexCatalog:
+        catalog = self._cached_catalog(refresh)
+        if catalog is None:
+            listing, stats = self._catalog_requests()
+            rows, result = await asyncio.gather(
+                self.elastic.cat.indices(**listing),
+                self.elastic.search(**stats))
+            catalog = self._catalog_from(rows, result)
+            self._catalog = catalog
+
+        return catalog
+
+    async def get_ordered_delta_indices(self) -> List[str]:
+        return (await self.index_catalog()).names('delta')
+
+    async def index_bounds(self) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+        '''First & last evm block of every delta index.
+        '''
+        return {
+            info.name: (info.min_block, info.max_block)
+            for info in (await self.index_catalog()).family('delta')
+        }
+
+    async def get_first_indexed_block(self) -> Optional[StorageEosioDelta]:
+        for first, _ in (await self.index_bounds()).values():
+            if first is not None:
+                return await self.block_from_evm_num(first)
+
+        return None
+
+    async def get_last_indexed_block(self) -> Optional[StorageEosioDelta]:
+        for _, last in reversed(list((await self.index_bounds()).values())):
+            if last is not None:
+                return await self.block_from_evm_num(last)
+
+        return None
+
+    async def iter_composite(
+        self,
+        index: str,
+        field: str,
+        query: Optional[dict] = None,
+        page_size: int = 10_000
+    ):
+        '''Page through every distinct value of ``field`` in ascending order
+        using a composite aggregation, yields ``(value, doc_count)``.
+
+        Only one page of buckets is held in memory at a time.
+        '''
+        after = None
+        while True:
+            result = await self.elastic.search(**self._composite_request(
+                index, field, query, page_size, after))
+            buckets, after = self._composite_page(result, page_size)
+            for bucket in buckets:
+                yield bucket
+
+            if not after:
+                break
+
+    async def scan_delta_blocks(
+        self,
+        report: IntegrityReport,
+        lower: Optional[int] = None,
+        upper: Optional[int] = None,
+        index: Optional[str] = None
+    ) -> IntegrityReport:
+        '''Single ordered pass over ``@global.block_num`` recording every
+        gap & duplicate into ``report``.
+        '''
+        if not index:
+            index = f'{self.chain_name}-delta-*'
+
+        scan = DeltaBlockScan(report)
+        async for bucket in self.iter_composite(
+            index, '@global.block_num',
+            query=self._range_query('@global.block_num', lower, upper)
+        ):
+            scan.feed([bucket])
+
+        return scan.finish()
+
+    async def scan_action_hashes(
+        self,
+        report: IntegrityReport,
+        lower: Optional[int] = None,
+        upper: Optional[int] = None,
+        index: Optional[str] = None,
+        cross_index: bool = False
+    ) -> IntegrityReport:
+        '''Single ordered pass over ``@raw.hash`` recording every tx hash
+        present more than once into ``report``.
+
+        With ``cross_index`` the hashes of ``index`` also get looked up in
+        every other action index, ``TERMS_CHUNK`` at a time.
+        '''
+        if not index:
+            index = f'{self.chain_name}-action-*'
+
+        pending = []
+        async for value, count in self.iter_composite(
+            index, '@raw.hash',
+            query=self._range_query('@raw.block', lower, upper)
+        ):
+            if count > 1:
+                report.action_dups.append(value)
+
+            elif cross_index:
+                pending.append(value)
+                if len(pending) == TERMS_CHUNK:
+                    report.action_dups += await self._hashes_elsewhere(
+                        pending, index)
+                    pending = []
+
+        if pending:
+            report.action_dups += await self._hashes_elsewhere(pending, index)
+
+        return report
+
+    async def _hashes_elsewhere(self, hashes: List[str], index: str) -> List[str]:
+        result = await self.elastic.search(
+            **self._hashes_elsewhere_request(hashes, index))
+        return [
+            bucket['key']
+            for bucket in result['aggregations']['hashes']['buckets']
+        ]
+
+    async def iter_delta_batches(
+        self,
+        index: str,
+        lower: Optional[int] = None,
+        upper: Optional[int] = None,
+        batch_size: int = 10_000
+    ):
+        '''Stream delta docs in block order as ``DeltaBatch`` columns,
+        fetching only block numbers & evm hashes a batch at a time from a
+        point in time of ``index``.
+        '''
+        pit = (await self.elastic.open_point_in_time(
+            **self._open_pit_request(index)))['id']
+        try:
+            after = None
+            while True:
+                result = await self.elastic.search(**self._delta_batch_request(
+                    pit, lower, upper, batch_size, after))
+                pit = result.get('pit_id', pit)
+                batch, after = self._delta_batch_page(result, batch_size)
+                if batch:
+                    yield batch
+
+                if not after:
+                    break
+
+        finally:
+            await self.elastic.close_point_in_time(id=pit)
+
+    async def scan_hash_chain(
+        self,
+        report: IntegrityReport,
+        lower: Optional[int] = None,
+        upper: Optional[int] = None,
+        index: Optional[str] = None
+    ) -> IntegrityReport:
+        '''Single ordered pass checking every block prev hash matches the
+        hash of the block before it.
+        '''
+        if not index:
+            index = f'{self.chain_name}-delta-*'
+
+        scan = HashChainScan(report)
+        async for batch in self.iter_delta_batches(
+            index, lower=lower, upper=upper
+        ):
+            scan.feed(batch)
+
+        return report
+
+    async def plan_integrity_check(
+        self
+    ) -> List[Tuple[int, Optional[str], Optional[str]]]:
+        '''Pair delta & action indices by suffix, returns a list of
+        ``(suffix_num, delta_index, action_index)`` ordered by suffix.
+        '''
+        catalog = await self.index_catalog()
+        return self._plan_from(
+            catalog.names('delta'), catalog.names('action'))
+
+    async def index_summary(
+        self,
+        index: str,
+        field: str,
+        upper: Optional[int] = None
+    ) -> dict:
+        '''Doc count, min, max & an exact fingerprint of ``field`` on docs up
+        to ``upper``, plus the index uuid so a re-created index never
+        matches.
+        '''
+        result, settings = await asyncio.gather(
+            self.elastic.search(**self._summary_request(index, field, upper)),
+            self.elastic.indices.get(index=index))
+        return self._summary_from(index, result, settings)
+
+    async def _verified_upto(
+        self,
+        index: str,
+        field: str,
+        hash_chain: bool = False
+    ) -> Optional[dict]:
+        '''Checkpoint summary of ``index`` if its content up to the
+        checkpointed ``max`` didn't change since, else None. With
+        ``hash_chain`` checkpoints taken without verifying links don't count.
+
+        Only indices written since the checkpoint get fingerprinted.
+        '''
+        known = self._checkpoint_known(index, hash_chain=hash_chain)
+        if known is None:
+            return None
+
+        info = (await self.index_catalog()).get(index)
+        if self._unwritten_since_checkpoint(index, info):
+            return known
+
+        summary = await self.index_summary(index, field, upper=known['max'])
+        if self._changed_since_checkpoint(index, summary):
+            return None
+
+        return known
+
+    async def _check_delta_index(
+        self,
+        delta_index: str,
+        hash_chain: bool
+    ) -> IntegrityReport:
+        report = IntegrityReport()
+        known = await self._verified_upto(
+            delta_index, '@global.block_num', hash_chain=hash_chain)
+
+        scans = []
+        if hash_chain:
+            scans.append(self.scan_hash_chain(
+                IntegrityReport(),
+                lower=known['max'] if known else None,
+                index=delta_index))
+
+        if known is None:
+            scans.append(self.scan_delta_blocks(report, index=delta_index))
+
+        else:
+            scans.append(self.scan_delta_blocks(
+                IntegrityReport(), lower=known['max'] + 1, index=delta_index))
+
+        results = await asyncio.gather(*scans)
+        if known is not None:
+            self._apply_known(report, known, results[-1])
+
+        if hash_chain:
+            report.hash_breaks += results[0].hash_breaks
+
+        return report
+
+    async def _check_action_index(
+        self,
+        action_index: str,
+        window: int,
+        cross_index: bool
+    ) -> IntegrityReport:
+        known = await self._verified_upto(action_index, '@raw.block')
+        lower = known['max'] - window if known else None
+        return await self.scan_action_hashes(
+            IntegrityReport(), lower=lower, index=action_index,
+            cross_index=cross_index)
+
+    async def check_index(
+        self,
+        delta_index: Optional[str],
+        action_index: Optional[str],
+        window: int = 10_000,
+        hash_chain: bool = False,
+        cross_index: bool = False
+    ) -> IntegrityReport:
+        '''Check a single delta & action index pair, only the blocks past
+        the checkpoint if the index is unchanged up to it. The delta, hash
+        chain & action scans of the index run concurrently.
+
+        Action indices are re-checked from ``window`` evm blocks before the
+        checkpoint so txs re-indexed after a restart are still compared,
+        against the other action indices too with ``cross_index``.
+        '''
+        report = IntegrityReport()
+        delta_report, action_report = await asyncio.gather(
+            self._check_delta_index(delta_index, hash_chain)
+            if delta_index else asyncio.sleep(0, IntegrityReport()),
+            self._check_action_index(action_index, window, cross_index)
+            if action_index else asyncio.sleep(0, IntegrityReport()))
+
+        report.extend(delta_report)
+        report.add_anomalies(action_report)
+        return report
+
+    async def save_checkpoint(
+        self,
+        plan: List[Tuple[int, Optional[str], Optional[str]]],
+        watermark: int,
+        hash_chain: bool = False
+    ):
+        '''Store summaries capped at ``watermark`` so docs indexed while the
+        check ran don't count as verified, flagged with whether hash links
+        got verified. Untouched indices keep their stored summary.
+        '''
+        requests = []
+        for _, delta, action in plan:
+            if delta:
+                requests.append((delta, '@global.block_num'))
+
+            if action:
+                requests.append((action, '@raw.block'))
+
+        catalog = await self.index_catalog()
+
+        async def _summary(index: str, field: str) -> dict:
+            known = self._reusable_summary(
+                index, catalog.get(index), watermark)
+            if known is not None:
+                return known
+
+            return await self.index_summary(index, field, upper=watermark)
+
+        summaries = await gather_limited([
+            _summary(index, field) for index, field in requests
+        ], self.connections)
+
+        self.checkpoint.watermark = watermark
+        self.checkpoint.indices = {
+            index: {
+                **summary,
+                **self._index_stats(catalog.get(index)),
+                'hash_chain': hash_chain
+            }
+            for (index, _), summary in zip(requests, summaries)
+        }
+        self.checkpoint.save()
+
+    async def _check_boundary_link(
+        self,
+        prev_delta: str,
+        curr_delta: str,
+        block_num: int,
+        report: IntegrityReport
+    ):
+        '''Check the hash link between the last block of ``prev_delta`` and
+        ``block_num``, the first block of ``curr_delta``.
+        '''
+        scan = HashChainScan(report)
+        for index, num in ((prev_delta, block_num - 1), (curr_delta, block_num)):
+            async for batch in self.iter_delta_batches(
+                index, lower=num, upper=num, batch_size=10
+            ):
+                scan.feed(batch)
+
+    async def _check_boundary(
+        self,
+        prev: Tuple[IntegrityReport, Optional[str], Optional[str]],
+        curr: Tuple[IntegrityReport, Optional[str], Optional[str]],
+        hash_chain: bool = False
+    ) -> IntegrityReport:
+        '''Block anomalies across the boundary of two adjacent delta indices.
+        '''
+        prev_report, prev_delta, _ = prev
+        curr_report, curr_delta, _ = curr
+        report = IntegrityReport()
+
+        kind = self._boundary_kind(prev_report, curr_report)
+        if kind == 'gap':
+            report.gaps.append(
+                (prev_report.last_block + 1, curr_report.first_block - 1))
+
+        elif kind == 'link' and hash_chain:
+            await self._check_boundary_link(
+                prev_delta, curr_delta, curr_report.first_block, report)
+
+        elif kind == 'overlap':
+            overlap = await self.scan_delta_blocks(
+                IntegrityReport(),
+                lower=curr_report.first_block,
+                upper=prev_report.last_block,
+                index=f'{prev_delta},{curr_delta}')
+            known = set(prev_report.delta_dups + curr_report.delta_dups)
+            report.delta_dups += [
+                num for num in overlap.delta_dups if num not in known]
+
+        return report
+
+    async def check_indices(
+        self,
+        workers: int = 1,
+        boundary_window: int = 10_000,
+        hash_chain: bool = False
+    ) -> IntegrityReport:
+        '''Check each index suffix on its own, up to ``workers`` at a time,
+        then merge the per index reports adding the anomalies found across
+        adjacent index boundaries. Tx hashes each action index scan finds get
+        looked up in the other action indices for duplicates across them.
+
+        Checkpointed action indices are re-checked from ``boundary_window``
+        evm blocks before their checkpoint. With ``hash_chain`` the evm block
+        hash links are verified too.
+        '''
+        plan = await self.plan_integrity_check()
+        logging.info(
+            f'checking {len(plan)} index suffixes, {workers} at a time')
+
+        cross_index = sum(1 for _, _, action in plan if action) > 1
+        reports = await gather_limited([
+            self.check_index(
+                delta, action,
+                window=boundary_window, hash_chain=hash_chain,
+                cross_index=cross_index)
+            for _, delta, action in plan
+        ], workers)
+
+        boundary_reports = await gather_limited([
+            self._check_boundary(prev, curr, hash_chain=hash_chain)
+            for prev, curr in self._boundary_pairs(plan, reports)
+        ], workers)
+
+        report = self._merge_reports(reports, boundary_reports)
+
+        if (self.checkpoint and
+            report.healthy and
+            report.last_block is not None):
+            await self.save_checkpoint(
+                plan, report.last_block, hash_chain=hash_chain)
+
+        return report
+
+    async def full_integrity_check(
+        self,
+        workers: int = 1,
+        full: bool = False,
+        hash_chain: bool = False
+    ) -> Optional[IntegrityReport]:
+        '''Scan all indexed data and raise on the first kind of anomaly
+        found, duplicates take precedence over gaps. The raised error carries
+        every anomaly of its kind, not just the first.
+
+        With a checkpoint only data past it gets scanned, unless ``full``.
+        ``hash_chain`` also verifies evm block hash continuity.
+        '''
+        if full and self.checkpoint:
+            self.checkpoint.reset()
+
+        if self.checkpoint and self.checkpoint.watermark is not None:
+            logging.info(
+                f'starting integrity check from block {self.checkpoint.watermark}')
+
+        else:
+            logging.info('starting full integrity check')
+
+        await self.index_catalog(refresh=True)
+        report = await self.check_indices(
+            workers=workers, hash_chain=hash_chain)
+
+        if report.first_block is None:
+            return None
+
+        logging.info(
+            f'scanned {report.blocks} blocks from '
+            f'{report.first_block} to {report.last_block}')
+
+        report.raise_for_anomalies()
+        return report
+
+    async def last_block_before(
+        self,
+        evm_block_num: int
+    ) -> Optional[StorageEosioDelta]:
+        '''Highest indexed delta doc below ``evm_block_num``, in a single
+        request instead of stepping back one block query at a time.
+        '''
+        return await self._search_one(
+            **self._last_block_before_request(evm_block_num))
+
+    async def first_block_of_txs(self, hashes: List[str]) -> Optional[int]:
+        '''Lowest evm block any of the tx ``hashes`` was indexed at, one
+        aggregation per chunk of hashes.
+        '''
+        results = await gather_limited([
+            self.elastic.search(**request)
+            for request in self._first_block_of_txs_requests(hashes)
+        ], self.connections)
+        blocks = [
+            block for block in (
+                self._agg_int(result, 'first') for result in results)
+            if block is not None
+        ]
+        return min(blocks) if blocks else None
+
+    async def indexed_tx_hashes(self, hashes: List[str]) -> Set[str]:
+        if not hashes:
+            return set()
+
+        return self._hashes_from(await self.elastic.search(
+            **self._indexed_tx_hashes_request(hashes)))
+
+    async def plan_purge(self, evm_block_num: int) -> dict:
+        return self._plan_purge_from(await self.index_catalog(), evm_block_num)
+
+    async def _delete_by_query(self, index, field, value, slices='auto'):
+        try:
+            result = await self.elastic.delete_by_query(
+                **self._delete_by_query_request(index, field, value, slices))
+            logging.debug(f'delete result: {result}')
+
+        except NotFoundError:
+            ...
+
+    async def execute_purge(self, plan: dict, slices: str = 'auto'):
+        '''Drop whole indices, then run the boundary delete by queries
+        concurrently, sliced and without refreshing, refreshing once at the
+        end.
+        '''
+        if plan['drop']:
+            delete_result = await self.elastic.indices.delete(
+                index=plan['drop'])
+            logging.info(f'deleted indices result: {delete_result}')
+
+        await asyncio.gather(*[
+            self._delete_by_query(index, field, plan['from'], slices=slices)
+            for index, field in plan['trim']
+        ])
+
+        await self.elastic.indices.refresh(
+            index=[index for index, _ in plan['trim']],
+            ignore_unavailable=True)
+        self.invalidate_catalog()
+
+    async def purge_newer_than(self, block_num, evm_block_num):
+        if self.checkpoint:
+            self.checkpoint.reset()
+
+        plan = await self.plan_purge(evm_block_num)
+        logging.info(
+            f'purging from block {format_block_numbers(block_num, evm_block_num)}, '
+            f'dropping {len(plan["drop"])} indices, '
+            f'trimming {[index for index, _ in plan["trim"]]}')
+        await self.execute_purge(plan)
+
+    async def repair_data(
+        self,
+        workers: int = 1,
+        full: bool = False,
+        hash_chain: bool = False
+    ):
+        try:
+            await self.full_integrity_check(
+                workers=workers, full=full, hash_chain=hash_chain)
+            doc = await self.get_last_indexed_block()
+            if doc:
+                return doc.block_num, doc.global_block_num
+
+            else:
+                raise ElasticDataEmptyError()
+
+        except ESGapFound as err:
+            logging.info(err)
+
+            doc = await self.last_block_before(err.start)
+            if not doc:
+                raise ElasticDataIntegrityError('Gap found but couldn\'t find last valid block!')
+
+        except ESHashChainBroken as err:
+            logging.info(err)
+            doc = await self.block_from_evm_num(err.start - 1)
+            if not doc:
+                raise ElasticDataIntegrityError(
+                    'Hash chain broken but couldn\'t find last valid block!')
+
+        except ESDuplicatesFound as err:
+            logging.info(err)
+            candidates = []
+            if len(err.action_dups) > 0:
+                act_evm_block = await self.first_block_of_txs(err.action_dups)
+                if act_evm_block is not None:
+                    candidates.append(act_evm_block)
+
+            if len(err.delta_dups) > 0:
+                candidates.append(min(err.delta_dups))
+
+            doc = await self.block_from_evm_num(min(candidates)) if candidates else None
+            if not doc:
+                raise ElasticDataIntegrityError(
+                    'Duplicates found but couldn\'t find first duplicated block!')
+
+        await self.purge_newer_than(doc.block_num, doc.global_block_num)
+
+        return doc.block_num - 1, doc.global_block_num - 1
+
+
+class SyncElasticDriver:
+    '''Blocking facade over ``AsyncElasticDriver`` for sync callers, each
+    call runs on its own event loop with a fresh client. The only one,
+    ``ElasticDriver`` runs its integrity check & repair through it too.
+
+    ``checkpoint`` & ``docs_per_index`` get handed to every driver it opens.
+    '''
+
+    def __init__(
+        self,
+        config: dict,
+        checkpoint_path: Optional[Path] = None,
+        connections: Optional[int] = None,
+        checkpoint: Optional[IntegrityCheckpoint] = None
+    ):
+        self.config = config
+        self.connections = connections
+        self.checkpoint = checkpoint
+        if checkpoint is None and checkpoint_path:
+            self.checkpoint = IntegrityCheckpoint(checkpoint_path)
+
+        self.docs_per_index: Optional[int] = None
+
+    def _run(self, method: str, *args, **kwargs):
+        async def _call():
+            async with AsyncElasticDriver(
+                self.config, connections=self.connections
+            ) as driver:
+                driver.checkpoint = self.checkpoint
+                if self.docs_per_index:
+                    driver.docs_per_index = self.docs_per_index
+
+                return await getattr(driver, method)(*args, **kwargs)
+
+        return asyncio.run(_call())
+
+    def check_indices(self, **kwargs) -> IntegrityReport:
+        return self._run('check_indices', **kwargs)
+
+    def full_integrity_check(self, **kwargs) -> Optional[IntegrityReport]:
+        return self._run('full_integrity_check', **kwargs)
+
+    def purge_newer_than(self, block_num, evm_block_num):
+        return self._run('purge_newer_than', block_num, evm_block_num)
+
+    def repair_data(self, **kwargs):
+        return self._run('repair_data', **kwargs)
+
+    def index_bounds(self):
+        return self._run('index_bounds')
+
+    def get_first_indexed_block(self) -> Optional[StorageEosioDelta]:
+        return self._run('get_first_indexed_block')
+
+    def get_last_indexed_block(self) -> Optional[StorageEosioDelta]:
+        return self._run('get_last_indexed_block')
@@ -1,11 +1,14 @@
+import os
 import time
 import json
-import math
+import threading
 import locale
 import logging
-from typing import List, Optional
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from pathlib import Path
 
-from elasticsearch import Elasticsearch, NotFoundError
+from elasticsearch import Elasticsearch
 
 import traceback
 
@@ -22,82 +25,213 @@ def get_suffix(block_num, docs_per_index):
     return str(block_num // docs_per_index).zfill(8)
 
 
-class StorageEosioDelta:
-    def __init__(self, obj: dict):
-        self.timestamp = obj.get('@timestamp')
-        self.block_num = obj.get('block_num')
-        self.global_block_num = obj.get('@global', {}).get('block_num')
-        self.block_hash = obj.get('@blockHash')
-        self.evm_block_hash = obj.get('@evmBlockHash')
-        self.evm_prev_block_hash = obj.get('@evmPrevBlockHash')
-        self.receipts_root_hash = obj.get('@receiptsRootHash')
-        self.transactions_root = obj.get('@transactionsRoot')
-        self.gas_used = obj.get('gasUsed')
-        self.gas_limit = obj.get('gasLimit')
-        self.size = obj.get('size')
-        self.code = obj.get('code')
-        self.table = obj.get('table')
+class SourceField:
+    '''Record attribute read from the wrapped ``_source`` on access,
+    following ``path`` into nested objects and decoding with ``decode``.
+    '''
+
+    __slots__ = ('path', 'decode', 'default')
+
+    def __init__(
+        self,
+        *path: str,
+        decode: Optional[Callable[[Any], Any]] = None,
+        default: Any = None
+    ):
+        self.path = path
+        self.decode = decode
+        self.default = default
+
+    def __get__(self, record, owner=None):
+        if record is None:
+            return self
+
+        value = record._source
+        for key in self.path:
+            if not isinstance(value, dict):
+                value = None
+                break
+
+            value = value.get(key)
+
+        if value is None:
+            value = self.default
+
+        if self.decode and value is not None:
+            value = self.decode(value)
+
+        return value
+
+
+class SourceRecord:
+    '''Thin wrapper around an ES document ``_source``, fields are only
+    decoded when accessed.
+    '''
+
+    __slots__ = ('_source',)
+
+    def __init__(self, obj: Optional[dict]):
+        self._source = obj if obj is not None else {}
+
+    @property
+    def source(self) -> dict:
+        return self._source
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self._source!r})'
+
+
+class StorageEosioDelta(SourceRecord):
+    __slots__ = ()
+
+    timestamp = SourceField('@timestamp')
+    block_num = SourceField('block_num')
+    global_block_num = SourceField('@global', 'block_num')
+    block_hash = SourceField('@blockHash')
+    evm_block_hash = SourceField('@evmBlockHash')
+    evm_prev_block_hash = SourceField('@evmPrevBlockHash')
+    receipts_root_hash = SourceField('@receiptsRootHash')
+    transactions_root = SourceField('@transactionsRoot')
+    gas_used = SourceField('gasUsed')
+    gas_limit = SourceField('gasLimit')
+    size = SourceField('size')
+    code = SourceField('code')
+    table = SourceField('table')
 
     def block_nums_to_string(self):
         return format_block_numbers(self.block_num, self.global_block_num)
 
 
-class InternalEvmTransaction:
-    def __init__(self, obj: dict):
-        self.call_type = obj.get('callType')
-        self.from_address = obj.get('from')
-        self.gas = obj.get('gas')
-        self.input = obj.get('input')
-        self.input_trimmed = obj.get('input_trimmed')
-        self.to = obj.get('to')
-        self.value = obj.get('value')
-        self.gas_used = obj.get('gasUsed')
-        self.output = obj.get('output')
-        self.subtraces = obj.get('subtraces')
-        self.trace_address = obj.get('traceAddress')
-        self.type = obj.get('type')
-        self.depth = obj.get('depth')
-        self.extra = obj.get('extra')
-
-
-class StorageEvmTransaction:
-    def __init__(self, obj: dict):
-        self.hash = obj.get('hash')
-        self.from_address = obj.get('from')
-        self.trx_index = obj.get('trx_index')
-        self.block = obj.get('block')
-        self.block_hash = obj.get('block_hash')
-        self.to = obj.get('to')
-        self.input_data = obj.get('input_data')
-        self.input_trimmed = obj.get('input_trimmed')
-        self.value = obj.get('value')
-        self.nonce = obj.get('nonce')
-        self.gas_price = obj.get('gas_price')
-        self.gas_limit = obj.get('gas_limit')
-        self.status = obj.get('status')
-        self.itxs = [InternalEvmTransaction(tx) for tx in obj.get('itxs', [])]
-        self.epoch = obj.get('epoch')
-        self.createdaddr = obj.get('createdaddr')
-        self.gasused = obj.get('gasused')
-        self.gasusedblock = obj.get('gasusedblock')
-        self.charged_gas_price = obj.get('charged_gas_price')
-        self.output = obj.get('output')
-        self.logs = obj.get('logs')
-        self.logs_bloom = obj.get('logsBloom')
-        self.errors = obj.get('errors')
-        self.value_d = obj.get('value_d')
-        self.raw = obj.get('raw')
-        self.v = obj.get('v')
-        self.r = obj.get('r')
-        self.s = obj.get('s')
-
-class StorageEosioAction:
-    def __init__(self, obj: dict):
-        self.timestamp = obj.get('@timestamp')
-        self.trx_id = obj.get('trx_id')
-        self.action_ordinal = obj.get('action_ordinal')
-        self.signatures = obj.get('signatures')
-        self.raw = StorageEvmTransaction(obj.get('@raw'))
+class InternalEvmTransaction(SourceRecord):
+    __slots__ = ()
+
+    call_type = SourceField('callType')
+    from_address = SourceField('from')
+    gas = SourceField('gas')
+    input = SourceField('input')
+    input_trimmed = SourceField('input_trimmed')
+    to = SourceField('to')
+    value = SourceField('value')
+    gas_used = SourceField('gasUsed')
+    output = SourceField('output')
+    subtraces = SourceField('subtraces')
+    trace_address = SourceField('traceAddress')
+    type = SourceField('type')
+    depth = SourceField('depth')
+    extra = SourceField('extra')
+
+
+class StorageEvmTransaction(SourceRecord):
+    __slots__ = ()
+
+    hash = SourceField('hash')
+    from_address = SourceField('from')
+    trx_index = SourceField('trx_index')
+    block = SourceField('block')
+    block_hash = SourceField('block_hash')
+    to = SourceField('to')
+    input_data = SourceField('input_data')
+    input_trimmed = SourceField('input_trimmed')
+    value = SourceField('value')
+    nonce = SourceField('nonce')
+    gas_price = SourceField('gas_price')
+    gas_limit = SourceField('gas_limit')
+    status = SourceField('status')
+    itxs = SourceField(
+        'itxs',
+        decode=lambda itxs: [InternalEvmTransaction(tx) for tx in itxs],
+        default=[])
+    epoch = SourceField('epoch')
+    createdaddr = SourceField('createdaddr')
+    gasused = SourceField('gasused')
+    gasusedblock = SourceField('gasusedblock')
+    charged_gas_price = SourceField('charged_gas_price')
+    output = SourceField('output')
+    logs = SourceField('logs')
+    logs_bloom = SourceField('logsBloom')
+    errors = SourceField('errors')
+    value_d = SourceField('value_d')
+    raw = SourceField('raw')
+    v = SourceField('v')
+    r = SourceField('r')
+    s = SourceField('s')
+
+
+class StorageEosioAction(SourceRecord):
+    __slots__ = ()
+
+    timestamp = SourceField('@timestamp')
+    trx_id = SourceField('trx_id')
+    action_ordinal = SourceField('action_ordinal')
+    signatures = SourceField('signatures')
+    raw = SourceField('@raw', decode=StorageEvmTransaction, default={})
+
+
+HASH_SIZE = 32
+EMPTY_HASH = bytes(HASH_SIZE)
+
+
+def _hash_to_bytes(block_hash: Optional[str]) -> bytes:
+    if not block_hash:
+        return EMPTY_HASH
+
+    if block_hash.startswith(('0x', '0X')):
+        block_hash = block_hash[2:]
+
+    try:
+        raw = bytes.fromhex(block_hash)
+
+    except ValueError:
+        return EMPTY_HASH
+
+    return raw if len(raw) == HASH_SIZE else EMPTY_HASH
+
+
+class DeltaBatch:
+    '''Columnar form of a batch of delta docs, block numbers in ``array``
+    columns and evm hashes packed as 32 byte entries, missing or malformed
+    hashes are stored as all zeros.
+    '''
+
+    __slots__ = (
+        'block_nums', 'global_block_nums', 'hashes', 'prev_hashes')
+
+    def __init__(self):
+        self.block_nums = array('q')
+        self.global_block_nums = array('q')
+        self.hashes = bytearray()
+        self.prev_hashes = bytearray()
+
+    @classmethod
+    def from_hits(cls, hits: List[dict]) -> 'DeltaBatch':
+        batch = cls()
+        for hit in hits:
+            batch.append(hit['_source'])
+
+        return batch
+
+    def append(self, source: dict):
+        self.block_nums.append(int(source.get('block_num', -1)))
+        self.global_block_nums.append(int(source['@global']['block_num']))
+        self.hashes += _hash_to_bytes(source.get('@evmBlockHash'))
+        self.prev_hashes += _hash_to_bytes(source.get('@evmPrevBlockHash'))
+
+    def __len__(self) -> int:
+        return len(self.global_block_nums)
+
+    def hash_bytes(self, i: int) -> bytes:
+        return bytes(self.hashes[i * HASH_SIZE:(i + 1) * HASH_SIZE])
+
+    def prev_hash_bytes(self, i: int) -> bytes:
+        return bytes(self.prev_hashes[i * HASH_SIZE:(i + 1) * HASH_SIZE])
+
+    def hash_at(self, i: int) -> Optional[str]:
+        raw = self.hash_bytes(i)
+        return raw.hex() if raw != EMPTY_HASH else None
+
+    def prev_hash_at(self, i: int) -> Optional[str]:
+        raw = self.prev_hash_bytes(i)
+        return raw.hex() if raw != EMPTY_HASH else None
 
 
 def index_to_suffix_num(index: str) -> int:
@@ -120,7 +254,7 @@ class ESDuplicatesFound(ElasticDataIntegrityError):
         self,
         message: str,
         delta_dups: List[int],
-        action_dups: List[int]
+        action_dups: List[str]
     ):
         super().__init__(message)
         self.delta_dups = delta_dups
@@ -131,28 +265,855 @@ class ESGapFound(ElasticDataIntegrityError):
     def __init__(
         self,
         message: str,
-        start: int
+        start: int,
+        gaps: Optional[List[Tuple[int, int]]] = None
     ):
         super().__init__(message)
         self.start = start
+        self.gaps = gaps if gaps is not None else [(start, start)]
+
+
+class ESHashChainBroken(ElasticDataIntegrityError):
+
+    def __init__(
+        self,
+        msg: str,
+        start: int,
+        breaks: Optional[List[Tuple[int, int]]] = None
+    ):
+        super().__init__(msg)
+        self.start = start
+        self.breaks = breaks if breaks is not None else [(start, start)]
+
+
+HASH_CHAIN_FIELDS = [
+    'block_num', '@global.block_num', '@evmBlockHash', '@evmPrevBlockHash']
+
+# how long a point in time stays open between two pages of a scan
+PIT_KEEP_ALIVE = '5m'
+
+# terms per query, well under the default index.max_terms_count of 65536
+TERMS_CHUNK = 10_000
+
+# order independent 64 bit hash of the block number & sequence number of
+# every doc, a rewritten doc gets a new sequence number so any write shows
+FINGERPRINT_SCRIPT = {
+    'init_script': 'state.h = 0L',
+    'map_script': '''
+        if (doc[params.field].size() != 0) {
+            long x = doc[params.field].value * 6364136223846793005L
+                ^ doc['_seq_no'].value * 1442695040888963407L;
+            x ^= x >>> 31;
+            x *= 7046029254386353131L;
+            x ^= x >>> 29;
+            state.h += x;
+        }
+    ''',
+    'combine_script': 'return state.h',
+    'reduce_script': '''
+        long h = 0L;
+        for (s in states) { if (s != null) { h += s } }
+        return h;
+    '''
+}
+
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    '''Sort inclusive ranges and merge the overlapping or adjacent ones.
+    '''
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+class IntegrityReport:
+    '''Every anomaly found by a scan over the indexed data.
+
+    Gaps are inclusive ``(first_missing, last_missing)`` global block number
+    ranges, duplicates are global block numbers for deltas and tx hashes
+    for actions. Hash breaks are inclusive ranges of blocks whose
+    ``@evmPrevBlockHash`` doesn't match the previous block hash.
+    '''
+
+    def __init__(self):
+        self.first_block: Optional[int] = None
+        self.last_block: Optional[int] = None
+        self.blocks = 0
+        self.gaps: List[Tuple[int, int]] = []
+        self.delta_dups: List[int] = []
+        self.action_dups: List[str] = []
+        self.hash_breaks: List[Tuple[int, int]] = []
+
+    @property
+    def healthy(self) -> bool:
+        return not (
+            self.gaps or self.delta_dups or
+            self.action_dups or self.hash_breaks)
+
+    def raise_for_anomalies(self):
+        if self.delta_dups:
+            logging.error(
+                f'{len(self.delta_dups)} block duplicates found, '
+                f'first: {self.delta_dups[:100]}')
+
+        if self.action_dups:
+            logging.error(
+                f'{len(self.action_dups)} tx duplicates found, '
+                f'first: {self.action_dups[:100]}')
+
+        if self.delta_dups or self.action_dups:
+            raise ESDuplicatesFound(
+                f'Duplicates found! {self.action_dups[:10]}, {self.delta_dups[:10]}',
+                self.delta_dups, self.action_dups
+            )
+
+        if self.gaps:
+            logging.error(f'{len(self.gaps)} gaps found: {self.gaps[:100]}')
+            start = self.gaps[0][0]
+            raise ESGapFound(f'Gap found! {start}', start, self.gaps)
+
+        if self.hash_breaks:
+            logging.error(
+                f'{len(self.hash_breaks)} hash chain breaks found: '
+                f'{self.hash_breaks[:100]}')
+            start = self.hash_breaks[0][0]
+            raise ESHashChainBroken(
+                f'Hash chain broken! {start}', start, self.hash_breaks)
+
+    def add_anomalies(self, other: 'IntegrityReport'):
+        self.gaps += other.gaps
+        self.delta_dups += other.delta_dups
+        self.action_dups += other.action_dups
+        self.hash_breaks += other.hash_breaks
+
+    def extend(self, other: 'IntegrityReport'):
+        '''Append the scan of a later block range.
+        '''
+        self.add_anomalies(other)
+        if other.first_block is None:
+            return
+
+        if self.first_block is None:
+            self.first_block = other.first_block
+
+        self.last_block = other.last_block
+        self.blocks += other.blocks
+
+    def to_dict(self) -> dict:
+        return {
+            'first_block': self.first_block,
+            'last_block': self.last_block,
+            'blocks': self.blocks,
+            'gaps': self.gaps,
+            'delta_dups': self.delta_dups,
+            'action_dups': self.action_dups,
+            'hash_breaks': self.hash_breaks
+        }
+
+
+
+INTEGRITY_CHECKPOINT = '.tevmc-integrity.json'
+
+
+class IntegrityCheckpoint:
+    '''Watermark up to which the indexed data was last found healthy, and a
+    summary of every index as of that check, persisted as json.
+
+    Index summaries are ``{'uuid', 'docs', 'min', 'max', 'fingerprint'}`` of
+    the index block number field, an index whose summary up to its stored ``max``
+    is unchanged only needs the blocks past it verified. Their ``hash_chain``
+    flag tells if the hash links up to ``max`` were verified too. The
+    fingerprint only gets recomputed once ``index_docs`` or ``seq_no``, the
+    doc count & max sequence number of the whole index, move.
+    '''
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.watermark: Optional[int] = None
+        self.indices: Dict[str, dict] = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as state_file:
+                state = json.load(state_file)
+
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        self.watermark = state.get('watermark')
+        self.indices = state.get('indices', {})
+
+    def save(self):
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w') as state_file:
+            json.dump({
+                'watermark': self.watermark,
+                'indices': self.indices
+            }, state_file, indent=4)
+
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        self.watermark = None
+        self.indices = {}
+        self.path.unlink(missing_ok=True)
+
+
+class IndexInfo(NamedTuple):
+    name: str
+    family: str
+    version: str
+    suffix: int
+    uuid: Optional[str]
+    docs: int
+    min_block: Optional[int]
+    max_block: Optional[int]
+    seq_no: Optional[int] = None
+
+
+class IndexCatalog:
+    '''Snapshot of every delta & action index of a chain with its doc count
+    and evm block range, ordered by suffix.
+    '''
+
+    def __init__(self, indices: List[IndexInfo]):
+        self.indices = sorted(indices, key=lambda info: (info.family, info.suffix))
+        self.fetched_at = time.monotonic()
+
+    def expired(self, ttl: float) -> bool:
+        return time.monotonic() - self.fetched_at > ttl
+
+    def family(
+        self,
+        family: str,
+        version: Optional[str] = None
+    ) -> List[IndexInfo]:
+        return [
+            info for info in self.indices
+            if info.family == family and (version is None or info.version == version)
+        ]
+
+    def names(self, family: str, version: Optional[str] = None) -> List[str]:
+        return [info.name for info in self.family(family, version=version)]
+
+    def get(self, name: str) -> Optional[IndexInfo]:
+        for info in self.indices:
+            if info.name == name:
+                return info
+
+        return None
 
 
+class DeltaBlockScan:
+    '''Folds ``(block_num, doc_count)`` buckets, fed in ascending order,
+    into the gaps & duplicates of a report.
+    '''
 
-class ElasticDriver:
+    def __init__(self, report: IntegrityReport):
+        self.report = report
+        self.prev: Optional[int] = None
 
-    def __init__(self, config: dict):
+    def feed(self, buckets: Iterable[Tuple[Any, int]]):
+        report = self.report
+        for value, count in buckets:
+            num = int(value)
+            if count > 1:
+                report.delta_dups.append(num)
+
+            if self.prev is not None and num != self.prev + 1:
+                report.gaps.append((self.prev + 1, num - 1))
+
+            if report.first_block is None:
+                report.first_block = num
+
+            report.blocks += 1
+            self.prev = num
+
+    def finish(self) -> IntegrityReport:
+        if self.prev is not None:
+            self.report.last_block = self.prev
+
+        return self.report
+
+
+class HashChainScan:
+    '''Folds ``DeltaBatch`` pages, fed in block order, into the hash breaks
+    of a report. Links across gaps or to docs without hashes are skipped.
+    '''
+
+    def __init__(self, report: IntegrityReport):
+        self.report = report
+        self.prev_num: Optional[int] = None
+        self.prev_hash = EMPTY_HASH
+
+    def feed(self, batch: DeltaBatch):
+        breaks = self.report.hash_breaks
+        hashes = memoryview(batch.hashes)
+        parents = memoryview(batch.prev_hashes)
+        for i, num in enumerate(batch.global_block_nums):
+            offset = i * HASH_SIZE
+            parent_hash = parents[offset:offset + HASH_SIZE]
+            if (self.prev_num is not None and
+                num == self.prev_num + 1 and
+                self.prev_hash != EMPTY_HASH and
+                parent_hash != EMPTY_HASH and
+                parent_hash != self.prev_hash):
+                if breaks and breaks[-1][1] == num - 1:
+                    breaks[-1] = (breaks[-1][0], num)
+
+                else:
+                    breaks.append((num, num))
+
+            self.prev_num = num
+            self.prev_hash = bytes(hashes[offset:offset + HASH_SIZE])
+
+
+class ElasticQueries:
+    '''Index naming plus request building & response parsing shared by
+    ``ElasticDriver`` and ``AsyncElasticDriver``, which only differ in how
+    the requests get performed.
+    '''
+
+    def __init__(self, config: dict, checkpoint_path: Optional[Path] = None):
         self.config = config
+        self.checkpoint = (
+            IntegrityCheckpoint(checkpoint_path) if checkpoint_path else None)
         self.chain_name = config['telos-evm-rpc']['elastic_prefix']
+        self.index_version = config['telos-evm-rpc'].get(
+            'elasitc_index_version', 'v1.5')
         self.docs_per_index = 10_000_000
+        self.catalog_ttl = config['elasticsearch'].get('catalog_ttl', 30.0)
+        self._catalog: Optional[IndexCatalog] = None
+
+    def invalidate_catalog(self):
+        '''Drop the cached index catalog, call after creating or deleting
+        indices.
+        '''
+        self._catalog = None
+
+    def _cached_catalog(self, refresh: bool) -> Optional[IndexCatalog]:
+        catalog = self._catalog
+        if refresh or catalog is None or catalog.expired(self.catalog_ttl):
+            return None
 
+        return catalog
+
+    def _catalog_requests(self) -> Tuple[dict, dict]:
+        '''``cat.indices`` listing names, uuids & doc counts plus a single
+        search with the block range & max sequence number of every index.
+        '''
+        pattern = f'{self.chain_name}-delta-*,{self.chain_name}-action-*'
+        listing = {
+            'index': pattern,
+            'format': 'json',
+            'h': 'index,uuid,docs.count'
+        }
+        stats = {
+            'index': pattern,
+            'size': 0,
+            'ignore_unavailable': True,
+            'aggs': {
+                'indices': {
+                    'terms': {'field': '_index', 'size': 10_000},
+                    'aggs': {
+                        'delta_min': {'min': {'field': '@global.block_num'}},
+                        'delta_max': {'max': {'field': '@global.block_num'}},
+                        'action_min': {'min': {'field': '@raw.block'}},
+                        'action_max': {'max': {'field': '@raw.block'}},
+                        'seq_no': {'max': {'field': '_seq_no'}}
+                    }
+                }
+            }
+        }
+        return listing, stats
+
+    def _catalog_from(self, rows: List[dict], stats: dict) -> IndexCatalog:
+        buckets = {
+            bucket['key']: bucket
+            for bucket in stats.get('aggregations', {}).get(
+                'indices', {}).get('buckets', [])
+        }
+
+        def _int(value):
+            return int(value) if value is not None else None
+
+        indices = []
+        for row in rows:
+            name = row['index']
+            parts = name[len(self.chain_name) + 1:].split('-')
+            if len(parts) < 3:
+                continue
+
+            family, version, suffix = parts[0], '-'.join(parts[1:-1]), parts[-1]
+            bucket = buckets.get(name, {})
+            docs = bucket.get('doc_count', int(row.get('docs.count') or 0))
+            indices.append(IndexInfo(
+                name=name,
+                family=family,
+                version=version,
+                suffix=int(suffix),
+                uuid=row.get('uuid'),
+                docs=docs,
+                min_block=_int(bucket.get(f'{family}_min', {}).get('value')),
+                max_block=_int(bucket.get(f'{family}_max', {}).get('value')),
+                seq_no=_int(bucket.get('seq_no', {}).get('value'))
+            ))
+
+        return IndexCatalog(indices)
+
+    @staticmethod
+    def _client_kwargs(config: dict) -> dict:
         es_config = config['elasticsearch']
-        self.elastic = Elasticsearch(
-            f'{es_config["protocol"]}://{es_config["host"]}',
-            basic_auth=(
-                es_config['user'], es_config['pass']
-            )
+        return {
+            'hosts': f'{es_config["protocol"]}://{es_config["host"]}',
+            'basic_auth': (es_config['user'], es_config['pass'])
+        }
+
+    @staticmethod
+    def _range_query(field: str, lower: Optional[int], upper: Optional[int]):
+        if lower is None and upper is None:
+            return None
+
+        bounds = {}
+        if lower is not None:
+            bounds['gte'] = lower
+        if upper is not None:
+            bounds['lte'] = upper
+
+        return {'range': {field: bounds}}
+
+    @staticmethod
+    def _composite_request(
+        index: str,
+        field: str,
+        query: Optional[dict],
+        page_size: int,
+        after: Optional[dict]
+    ) -> dict:
+        composite = {
+            'size': page_size,
+            'sources': [{'value': {'terms': {'field': field}}}]
+        }
+        if after:
+            composite['after'] = after
+
+        request = {
+            'index': index,
+            'size': 0,
+            'aggs': {'scan': {'composite': composite}},
+            'ignore_unavailable': True
+        }
+        if query:
+            request['query'] = query
+
+        return request
+
+    @staticmethod
+    def _composite_page(
+        result: dict,
+        page_size: int
+    ) -> Tuple[List[Tuple[Any, int]], Optional[dict]]:
+        '''Buckets of a composite agg response as ``(value, doc_count)`` and
+        the key to continue from, None on the last page.
+        '''
+        agg = result.get('aggregations', {}).get('scan', {})
+        buckets = agg.get('buckets', [])
+        after = agg.get('after_key')
+        if len(buckets) < page_size:
+            after = None
+
+        return [
+            (bucket['key']['value'], bucket['doc_count'])
+            for bucket in buckets
+        ], after
+
+    def _delta_batch_request(
+        self,
+        pit: str,
+        lower: Optional[int],
+        upper: Optional[int],
+        batch_size: int,
+        after: Optional[list]
+    ) -> dict:
+        '''Search over the point in time ``pit``, block numbers repeat when
+        blocks got duplicated so ``_shard_doc`` breaks ties, otherwise docs
+        sharing a block number across a page boundary get skipped.
+        '''
+        request = {
+            'pit': {'id': pit, 'keep_alive': PIT_KEEP_ALIVE},
+            'size': batch_size,
+            'sort': [
+                {'@global.block_num': {'order': 'asc'}},
+                {'_shard_doc': {'order': 'asc'}}
+            ],
+            'source': HASH_CHAIN_FIELDS,
+            'track_total_hits': False
+        }
+        query = self._range_query('@global.block_num', lower, upper)
+        if query:
+            request['query'] = query
+        if after:
+            request['search_after'] = after
+
+        return request
+
+    @staticmethod
+    def _delta_batch_page(
+        result: dict,
+        batch_size: int
+    ) -> Tuple[Optional[DeltaBatch], Optional[list]]:
+        hits = result['hits']['hits']
+        batch = DeltaBatch.from_hits(hits) if hits else None
+        after = hits[-1]['sort'] if len(hits) == batch_size else None
+        return batch, after
+
+    def _open_pit_request(self, index: str) -> dict:
+        return {
+            'index': index,
+            'keep_alive': PIT_KEEP_ALIVE,
+            'ignore_unavailable': True
+        }
+
+    def _summary_request(
+        self,
+        index: str,
+        field: str,
+        upper: Optional[int]
+    ) -> dict:
+        request = {
+            'index': index,
+            'size': 0,
+            'aggs': {
+                'docs': {'value_count': {'field': field}},
+                'min': {'min': {'field': field}},
+                'max': {'max': {'field': field}},
+                'fingerprint': {'scripted_metric': {
+                    **FINGERPRINT_SCRIPT, 'params': {'field': field}}}
+            }
+        }
+        query = self._range_query(field, None, upper)
+        if query:
+            request['query'] = query
+
+        return request
+
+    @staticmethod
+    def _summary_from(index: str, result: dict, settings: dict) -> dict:
+        aggs = result['aggregations']
+
+        def _int(value):
+            return int(value) if value is not None else None
+
+        return {
+            'uuid': settings[index]['settings']['index']['uuid'],
+            'docs': int(aggs['docs']['value']),
+            'min': _int(aggs['min']['value']),
+            'max': _int(aggs['max']['value']),
+            'fingerprint': _int(aggs['fingerprint']['value'])
+        }
+
+    @staticmethod
+    def _plan_from(
+        delta_indices: List[str],
+        action_indices: List[str]
+    ) -> List[Tuple[int, Optional[str], Optional[str]]]:
+        plan: Dict[int, List[Optional[str]]] = {}
+        for i, indices in enumerate([delta_indices, action_indices]):
+            for index in indices:
+                suffix = index_to_suffix_num(index)
+                plan.setdefault(suffix, [None, None])[i] = index
+
+        return [
+            (suffix, delta, action)
+            for suffix, (delta, action) in sorted(plan.items())
+        ]
+
+    @staticmethod
+    def _index_stats(info: Optional[IndexInfo]) -> dict:
+        if info is None:
+            return {}
+
+        return {'index_docs': info.docs, 'seq_no': info.seq_no}
+
+    def _unwritten_since_checkpoint(
+        self,
+        index: str,
+        info: Optional[IndexInfo]
+    ) -> bool:
+        '''Cheap test against the catalog, any write to an index bumps its
+        max sequence number & a delete its doc count.
+        '''
+        known = self.checkpoint.indices.get(index, {})
+        return (
+            info is not None and
+            info.seq_no is not None and
+            known.get('uuid') == info.uuid and
+            known.get('index_docs') == info.docs and
+            known.get('seq_no') == info.seq_no
+        )
+
+    def _reusable_summary(
+        self,
+        index: str,
+        info: Optional[IndexInfo],
+        watermark: int
+    ) -> Optional[dict]:
+        '''Checkpoint summary of ``index`` when it already covered the whole
+        index & nothing got written to it since, so the one capped at
+        ``watermark`` would be the same.
+        '''
+        known = self.checkpoint.indices.get(index)
+        if (not known or
+            info is None or
+            known['max'] is None or
+            known['max'] != info.max_block or
+            known['max'] > watermark or
+            not self._unwritten_since_checkpoint(index, info)):
+            return None
+
+        return {
+            key: known[key]
+            for key in ('uuid', 'docs', 'min', 'max', 'fingerprint')
+        }
+
+    def _changed_since_checkpoint(self, index: str, summary: dict) -> bool:
+        known = dict(self.checkpoint.indices.get(index, {}))
+        for key in ('hash_chain', 'index_docs', 'seq_no'):
+            known.pop(key, None)
+
+        if summary != known:
+            logging.info(f'{index} changed since last check')
+            return True
+
+        return False
+
+    def _checkpoint_known(
+        self,
+        index: str,
+        hash_chain: bool = False
+    ) -> Optional[dict]:
+        '''Checkpoint summary of ``index``, None if there is none or, when
+        ``hash_chain`` is asked for, it was taken without checking links.
+        '''
+        if not self.checkpoint:
+            return None
+
+        known = self.checkpoint.indices.get(index)
+        if not known or known['max'] is None:
+            return None
+
+        if hash_chain and not known.get('hash_chain', False):
+            return None
+
+        return known
+
+    @staticmethod
+    def _apply_known(
+        report: IntegrityReport,
+        known: dict,
+        tail: IntegrityReport
+    ):
+        '''Fill ``report`` from a checkpointed index summary plus the scan of
+        the blocks past it.
+        '''
+        report.first_block = known['min']
+        report.last_block = known['max']
+        report.blocks = known['docs']
+        if (tail.first_block is not None and
+            tail.first_block > known['max'] + 1):
+            report.gaps.append((known['max'] + 1, tail.first_block - 1))
+
+        report.extend(tail)
+
+    @staticmethod
+    def _boundary_kind(
+        prev_report: IntegrityReport,
+        curr_report: IntegrityReport
+    ) -> Optional[str]:
+        if prev_report.last_block is None or curr_report.first_block is None:
+            return None
+
+        if curr_report.first_block > prev_report.last_block + 1:
+            return 'gap'
+
+        if curr_report.first_block == prev_report.last_block + 1:
+            return 'link'
+
+        return 'overlap'
+
+    @staticmethod
+    def _boundary_pairs(plan, reports):
+        '''Adjacent ``(report, delta, action)`` pairs to stitch, skipping
+        suffixes without delta docs.
+        '''
+        pairs = []
+        prev = None
+        for index_report, (_, delta, action) in zip(reports, plan):
+            curr = (index_report, delta, action)
+            if prev is not None:
+                pairs.append((prev, curr))
+
+            if index_report.first_block is not None:
+                prev = curr
+
+        return pairs
+
+    @staticmethod
+    def _merge_reports(
+        reports: List[IntegrityReport],
+        boundary_reports: List[IntegrityReport]
+    ) -> IntegrityReport:
+        report = IntegrityReport()
+        for index_report in reports:
+            report.extend(index_report)
+
+        for boundary in boundary_reports:
+            report.add_anomalies(boundary)
+
+        report.gaps.sort()
+        report.delta_dups.sort()
+        # a tx in two indices checked past their checkpoint shows up twice
+        report.action_dups = list(dict.fromkeys(report.action_dups))
+        report.hash_breaks = merge_ranges(report.hash_breaks)
+        return report
+
+    def _last_block_before_request(self, evm_block_num: int) -> dict:
+        return {
+            'index': f'{self.chain_name}-delta-*',
+            'size': 1,
+            'query': {'range': {'@global.block_num': {'lt': evm_block_num}}},
+            'sort': [{'@global.block_num': {'order': 'desc'}}],
+            'track_total_hits': False,
+            'ignore_unavailable': True
+        }
+
+    def _first_block_of_txs_requests(self, hashes: List[str]) -> List[dict]:
+        '''One min aggregation per ``TERMS_CHUNK`` hashes, the lowest block
+        is the min of all of them.
+        '''
+        return [
+            {
+                'index': f'{self.chain_name}-action-*',
+                'size': 0,
+                'query': {'terms': {'@raw.hash': hashes[i:i + TERMS_CHUNK]}},
+                'aggs': {'first': {'min': {'field': '@raw.block'}}},
+                'ignore_unavailable': True
+            }
+            for i in range(0, len(hashes), TERMS_CHUNK)
+        ]
+
+    def _indexed_tx_hashes_request(self, hashes: List[str]) -> dict:
+        return {
+            'index': f'{self.chain_name}-action-*',
+            'size': len(hashes),
+            'query': {'terms': {'@raw.hash': hashes}},
+            '_source': ['@raw.hash'],
+            'track_total_hits': False,
+            'ignore_unavailable': True
+        }
+
+    def _hashes_elsewhere_request(self, hashes: List[str], index: str) -> dict:
+        '''Which of ``hashes`` are in any action index but ``index``.
+        '''
+        return {
+            'index': f'{self.chain_name}-action-*,-{index}',
+            'size': 0,
+            'query': {'terms': {'@raw.hash': hashes}},
+            'aggs': {'hashes': {
+                'terms': {'field': '@raw.hash', 'size': len(hashes)}}},
+            'ignore_unavailable': True
+        }
+
+    @staticmethod
+    def _hashes_from(result: dict) -> Set[str]:
+        return {
+            hit['_source']['@raw']['hash']
+            for hit in result.get('hits', {}).get('hits', [])
+        }
+
+    @staticmethod
+    def _agg_int(result: dict, name: str) -> Optional[int]:
+        value = result['aggregations'][name]['value']
+        return int(value) if value is not None else None
+
+    @staticmethod
+    def _first_hit(result: dict, record=None):
+        hits = result.get('hits', {}).get('hits', [])
+        if not hits:
+            return None
+
+        record = record if record else StorageEosioDelta
+        return record(hits[0]['_source'])
+
+    def _purge_families(self):
+        return (
+            ('delta', '@global.block_num'),
+            ('action', '@raw.block')
         )
 
+    def _plan_purge_from(self, catalog: IndexCatalog, evm_block_num: int) -> dict:
+        target_num = evm_block_num // self.docs_per_index
+        suffix = get_suffix(evm_block_num, self.docs_per_index)
+        plan = {'from': evm_block_num, 'drop': [], 'trim': []}
+        for family, field in self._purge_families():
+            plan['drop'] += [
+                info.name
+                for info in catalog.family(family, version=self.index_version)
+                if info.suffix > target_num
+            ]
+            plan['trim'].append((
+                f'{self.chain_name}-{family}-{self.index_version}-{suffix}',
+                field
+            ))
+
+        return plan
+
+    def _delete_by_query_request(self, index, field, value, slices) -> dict:
+        return {
+            'index': index,
+            'query': {
+                'range': {
+                    field: {
+                        'gte': value
+                    }
+                }
+            },
+            'conflicts': 'proceed',
+            'slices': slices,
+            'refresh': False,
+            'error_trace': True
+        }
+
+
+class ElasticDriver(ElasticQueries):
+
+    def __init__(self, config: dict, checkpoint_path: Optional[Path] = None):
+        super().__init__(config, checkpoint_path=checkpoint_path)
+        self.elastic = Elasticsearch(**self._client_kwargs(config))
+        self._catalog_lock = threading.Lock()
+
+    def index_catalog(self, refresh: bool = False) -> IndexCatalog:
+        '''Delta & action index metadata, fetched at most once every
+        ``catalog_ttl`` seconds unless ``refresh``.
+        '''
+        with self._catalog_lock:
+            catalog = self._cached_catalog(refresh)
+            if catalog is None:
+                listing, stats = self._catalog_requests()
+                catalog = self._catalog_from(
+                    self.elastic.cat.indices(**listing),
+                    self.elastic.search(**stats))
+                self._catalog = catalog
+
+            return catalog
+
     def tx_from_hash(self, h: str):
         try:
             result = self.elastic.search(
@@ -216,406 +1177,76 @@ class ElasticDriver:
             return None
 
     def get_ordered_delta_indices(self):
-        index_pattern = f'{self.chain_name}-delta-*'
-        delta_indices = self.elastic.indices.get(index=index_pattern)
-        delta_indices = list(delta_indices.keys())
-        delta_indices.sort(key=lambda x: index_to_suffix_num(x))
-
-        return delta_indices
+        return self.index_catalog().names('delta')
 
     def get_first_indexed_block(self):
-        indices = self.get_ordered_delta_indices()
-
-        if len(indices) == 0:
-            return None
-
-        first_index = indices.pop(0)
-        try:
-            result = self.elastic.search(
-                index=first_index,
-                size=1,
-                sort=[
-                    {'block_num': {'order': 'asc'}}
-                ]
-            )
-
-            if result.get('hits', {}).get('hits') and len(result.get('hits', {}).get('hits')) == 0:
-                return None
-
-            return StorageEosioDelta(result.get('hits', {}).get('hits', [])[0].get('_source'))
-
-        except BaseException as error:
-            logging.error(traceback.format_exc())
-            logging.error(error)
-            return None
-
-    def get_last_indexed_block(self):
-        indices = self.get_ordered_delta_indices()
-        if len(indices) == 0:
-            return None
-
-        for i in range(len(indices) - 1, -1, -1):
-            last_index = indices[i]
-            try:
-                result = self.elastic.search(
-                    index=last_index,
-                    size=1,
-                    sort=[
-                        {'block_num': {'order': 'desc'}}
-                    ]
-                )
-
-                hits = result.get('hits', {}).get('hits', [])
-                if not hits or len(hits) == 0:
-                    continue
-
-                block_doc = hits[0].get('_source')
-                logging.debug(f'getLastIndexedBlock:\n{json.dumps(block_doc, indent=4)}')
-
-                return StorageEosioDelta(block_doc)
-
-            except BaseException as error:
-                logging.error(traceback.format_exc())
-                logging.error(error)
-                return None
+        for info in self.index_catalog().family('delta'):
+            if info.min_block is not None:
+                return self.block_from_evm_num(info.min_block)
 
         return None
 
-    def find_gap_in_indices(self):
-        delta_indices = self.get_ordered_delta_indices()
-        logging.debug('delta indices: ')
-        logging.debug(json.dumps(delta_indices, indent=4))
-        for i in range(1, len(delta_indices)):
-            previous_index_suffix_num = index_to_suffix_num(delta_indices[i - 1])
-            current_index_suffix_num = index_to_suffix_num(delta_indices[i])
-
-            if current_index_suffix_num - previous_index_suffix_num > 1:
-                return {
-                    'gapStart': previous_index_suffix_num,
-                    'gapEnd': current_index_suffix_num
-                }
-
-        # Return None if no gaps found
-        return None
-
-    def run_histogram_gap_check(self, lower: int, upper: int, interval: int):
-        index_name = f'{self.chain_name}-delta-*'
-        body = {
-            'query': {
-                'range': {
-                    '@global.block_num': {
-                        'gte': lower,
-                        'lte': upper
-                    }
-                }
-            },
-            'aggs': {
-                'block_histogram': {
-                    'histogram': {
-                        'field': '@global.block_num',
-                        'interval': interval,
-                        'min_doc_count': 0
-                    },
-                    'aggs': {
-                        'min_block': {
-                            'min': {
-                                'field': '@global.block_num'
-                            }
-                        },
-                        'max_block': {
-                            'max': {
-                                'field': '@global.block_num'
-                            }
-                        }
-                    }
-                }
-            }
-        }
-        results = self.elastic.search(index=index_name, size=0, **body)
-
-        buckets = results['aggregations']['block_histogram']['buckets']
-
-        logging.debug(f'runHistogramGapCheck: {lower}-{upper}, interval: {interval}')
-        logging.debug(json.dumps(buckets, indent=4))
-
-        return buckets
-
-    def find_duplicate_deltas(self, lower: int, upper: int):
-        index_name = f'{self.chain_name}-delta-*'
-        body = {
-            'query': {
-                'range': {
-                    '@global.block_num': {
-                        'gte': lower,
-                        'lte': upper
-                    }
-                }
-            },
-            'aggs': {
-                'duplicate_blocks': {
-                    'terms': {
-                        'field': '@global.block_num',
-                        'min_doc_count': 2,
-                        'size': 100
-                    }
-                }
-            }
-        }
-        results = self.elastic.search(index=index_name, size=0, **body)
+    def get_last_indexed_block(self):
+        for info in reversed(self.index_catalog().family('delta')):
+            if info.max_block is not None:
+                block = self.block_from_evm_num(info.max_block)
+                if block:
+                    logging.debug(f'getLastIndexedBlock: {block}')
 
-        if 'aggregations' in results:
-            buckets = results['aggregations']['duplicate_blocks']['buckets']
-            logging.debug(f'findDuplicateDeltas: {lower}-{upper}')
-            return [bucket['key'] for bucket in buckets]
-        else:
-            return []
+                return block
 
-    def find_duplicate_actions(self, lower: int, upper: int):
-        index_name = f'{self.chain_name}-action-*'
-        body = {
-            'query': {
-                'range': {
-                    '@raw.block': {
-                        'gte': lower,
-                        'lte': upper
-                    }
-                }
-            },
-            'aggs': {
-                'duplicate_txs': {
-                    'terms': {
-                        'field': '@raw.hash',
-                        'min_doc_count': 2,
-                        'size': 100
-                    }
-                }
-            }
-        }
-        results = self.elastic.search(index=index_name, size=0, **body)
-
-        if 'aggregations' in results:
-            buckets = results['aggregations']['duplicate_txs']['buckets']
-            logging.debug(f'findDuplicateActions: {lower}-{upper}')
-            return [bucket['key'] for bucket in buckets]
-        else:
-            return []
-
-    def check_gaps(self, lower_bound: int, upper_bound: int, interval: int) -> Optional[int]:
-
-        interval = math.ceil(interval)
-
-        # Base case
-        if interval == 1:
-            return lower_bound
-
-        middle = (upper_bound + lower_bound) // 2
-
-        logging.debug(f'calculated middle {middle}')
-
-        logging.debug('first half')
-        # Recurse on the first half
-        lower_buckets = self.run_histogram_gap_check(lower_bound, middle, interval // 2)
-        if len(lower_buckets) == 0:
-            return middle  # Gap detected
-        elif lower_buckets[-1]['max_block']['value'] < middle:
-            lower_gap = self.check_gaps(lower_bound, middle, interval // 2)
-            if lower_gap:
-                return lower_gap
-
-        logging.debug('second half')
-        # Recurse on the second half
-        upper_buckets = self.run_histogram_gap_check(middle + 1, upper_bound, interval // 2)
-        if len(upper_buckets) == 0:
-            return middle + 1  # Gap detected
-        elif upper_buckets[0]['min_block']['value'] > middle + 1:
-            upper_gap = self.check_gaps(middle + 1, upper_bound, interval // 2)
-            if upper_gap:
-                return upper_gap
-
-        # Check for gap between the halves
-        if (lower_buckets[-1]['max_block']['value'] + 1) < upper_buckets[0]['min_block']['value']:
-            return lower_buckets[-1]['max_block']['value']
-
-        # Find gaps inside bucket by doc_count
-        buckets = lower_buckets + upper_buckets
-        for i in range(len(buckets)):
-            if buckets[i]['doc_count'] != (buckets[i]['max_block']['value'] - buckets[i]['min_block']['value']) + 1:
-                inside_gap = self.check_gaps(buckets[i]['min_block']['value'], buckets[i]['max_block']['value'], interval // 2)
-                if inside_gap:
-                    return inside_gap
-
-        # No gap found
         return None
 
-    def full_integrity_check(self):
-        lower_bound_doc = self.get_first_indexed_block()
-        upper_bound_doc = self.get_last_indexed_block()
-
-        if not lower_bound_doc or not upper_bound_doc:
-            return None
-
-        lower_bound = lower_bound_doc.global_block_num
-        upper_bound = upper_bound_doc.global_block_num
-        step = 10_000_000
-
-        delta_duplicates = []
-        action_duplicates = []
-
-        for current_lower in range(lower_bound, upper_bound, step):
-            current_upper = min(current_lower + step, upper_bound)
-
-            delta_duplicates += self.find_duplicate_deltas(current_lower, current_upper)
-            action_duplicates += self.find_duplicate_actions(current_lower, current_upper)
-
-        if len(delta_duplicates) > 0:
-            logging.error(f'block duplicates found: {json.dumps(delta_duplicates)}')
-
-        if len(action_duplicates) > 0:
-            logging.error(f'tx duplicates found: {json.dumps(action_duplicates)}')
-
-        if len(delta_duplicates) + len(action_duplicates) > 0:
-            raise ESDuplicatesFound(
-                f'Duplicates found! {action_duplicates}, {delta_duplicates}',
-                delta_duplicates, action_duplicates
-            )
-
-        if upper_bound - lower_bound < 2:
-            return
-
-        # First just check if whole indices are missing
-        gap = self.find_gap_in_indices()
-        if gap:
-            logging.debug('whole index seems to be missing')
-            lower = gap['gapStart'] * self.docs_per_index
-            upper = (gap['gapStart'] + 1) * self.docs_per_index
-            agg = self.run_histogram_gap_check(
-                lower, upper, self.docs_per_index)
-            gap = agg[0]['max_block']['value'] + 1
-            raise ESGapFound(f'Gap found! {int(gap)}', int(gap))
-
-        initial_interval = upper_bound - lower_bound
+    def _checker(self):
+        '''``SyncElasticDriver`` sharing this driver's settings & checkpoint,
+        integrity check & repair only live on the async driver.
+        '''
+        # async_database imports this module
+        from .async_database import SyncElasticDriver
 
-        logging.info(f'starting full gap check from {lower_bound} to {upper_bound}')
-
-        gap = self.check_gaps(lower_bound, upper_bound, initial_interval)
-        if gap:
-            raise ESGapFound(f'Gap found! {int(gap)}', int(gap))
-
-    def _purge_blocks_newer_than(self, block_num, evm_block_num):
-        target_suffix = get_suffix(block_num, self.docs_per_index)
-        delta_index = f'{self.chain_name}-delta-v1.5-{target_suffix}'
-        action_index = f'{self.chain_name}-action-v1.5-{target_suffix}'
+        checker = SyncElasticDriver(self.config, checkpoint=self.checkpoint)
+        checker.docs_per_index = self.docs_per_index
+        return checker
 
+    def _run_checker(self, method: str, *args, **kwargs):
         try:
-            self._delete_by_query(delta_index, 'block_num', block_num)
+            return getattr(self._checker(), method)(*args, **kwargs)
 
-        except NotFoundError:
-            ...
+        finally:
+            # the checker may have purged or rolled over indices
+            self.invalidate_catalog()
 
-        try:
-            self._delete_by_query(action_index, '@raw.block', evm_block_num)
+    def check_indices(self, **kwargs) -> IntegrityReport:
+        return self._run_checker('check_indices', **kwargs)
 
-        except NotFoundError:
-            ...
+    def full_integrity_check(self, **kwargs) -> Optional[IntegrityReport]:
+        return self._run_checker('full_integrity_check', **kwargs)
 
-    def _delete_by_query(self, index, field, value):
-        try:
-            result = self.elastic.delete_by_query(
-                index=index,
-                query={
-                    'range': {
-                        field: {
-                            'gte': value
-                        }
-                    }
-                },
-                conflicts='proceed',
-                refresh=True,
-                error_trace=True
-            )
-            logging.debug(f'delete result: {result}')
-        except Exception as e:
-            if e.__class__.__name__ != 'ResponseError' or e.info['error']['type'] != 'index_not_found_exception':
-                raise e
-
-    def _purge_indices_newer_than(self, block_num):
-        logging.info(f'purging indices in db from block {block_num}...')
-        target_suffix = get_suffix(block_num, self.docs_per_index)
-        target_num = int(target_suffix)
-        delete_list = []
+    def indexed_tx_hashes(self, hashes: List[str]) -> Set[str]:
+        '''Which of the evm tx ``hashes`` are indexed already, one search.
+        '''
+        if not hashes:
+            return set()
 
-        delete_list += self._collect_indices_to_delete('delta-v1.5', target_num)
-        delete_list += self._collect_indices_to_delete('action-v1.5', target_num)
+        return self._hashes_from(self.elastic.search(
+            **self._indexed_tx_hashes_request(hashes)))
 
-        if delete_list:
-            delete_result = self.elastic.indices.delete(index=delete_list)
-            logging.info(f'deleted indices result: {delete_result}')
-
-        return delete_list
+    def plan_purge(self, evm_block_num: int) -> dict:
+        '''Indices to drop whole and boundary indices to trim so that no
+        data from ``evm_block_num`` onwards is left.
+        '''
+        return self._plan_purge_from(self.index_catalog(), evm_block_num)
 
     def _collect_indices_to_delete(self, subfix, target_num):
-        indices = self.elastic.cat.indices(
-            index=f'{self.chain_name}-{subfix}-*',
-            format='json'
-        )
-        return [index['index'] for index in indices if index_to_suffix_num(index['index']) > target_num]
+        family, version = subfix.split('-', 1)
+        return [
+            info.name
+            for info in self.index_catalog().family(family, version=version)
+            if info.suffix > target_num
+        ]
 
     def purge_newer_than(self, block_num, evm_block_num):
-        self._purge_indices_newer_than(block_num)
-        self._purge_blocks_newer_than(block_num, evm_block_num)
+        return self._run_checker('purge_newer_than', block_num, evm_block_num)
 
-    def repair_data(self):
-        try:
-            self.full_integrity_check()
-            doc = self.get_last_indexed_block()
-            if doc:
-                return doc.block_num, doc.global_block_num
-
-            else:
-                raise ElasticDataEmptyError()
-
-        except ESGapFound as err:
-            logging.info(err)
-
-            bnum = err.start
-            doc = self.block_from_evm_num(bnum)
-            backstep = 10
-            exp = 1
-            while not doc and exp < 6:
-                logging.info(f'block #{bnum} query returned None, trying older block...')
-                bnum -= backstep ** exp
-                exp += 1
-                time.sleep(1)
-                doc = self.block_from_evm_num(bnum)
-
-            if not doc:
-                raise ElasticDataIntegrityError('Gap found but couldn\'t find last valid block!')
-
-        except ESDuplicatesFound as err:
-            logging.info(err)
-            # If duplicate is found could be by tx hash or block num
-            # in both cases we gotta get the delta document for the 
-            # block in question
-            min_block = None
-
-            act_block = None
-            if len(err.action_dups) > 0:
-                act_evm_block = es.tx_from_hash(err.action_dups[0]).raw.block
-                act_block = es.block_from_evm_num(act_evm_block)
-                min_block = act_block
-
-            delta_block = None
-            if len(err.delta_dups) > 0:
-                delta_block = es.block_from_evm_num(err.delta_dups[0])
-
-                if min_block and min_block.block_num > delta_block.block_num:
-                    min_block = delta_block
-
-            assert min_block  # Min block must be non null
-
-            doc = min_block
-
-        self.purge_newer_than(doc.block_num, doc.global_block_num)
-
-        # return last valid block nums
-        return doc.block_num - 1, doc.global_block_num - 1
+    def repair_data(self, **kwargs):
+        return self._run_checker('repair_data', **kwargs)
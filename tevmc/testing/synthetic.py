@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+
+import time
+import random
+
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from hashlib import sha256
+from datetime import datetime, timezone
+
+from .database import ElasticDriver, get_suffix
+
+
+class WorkloadSpec(NamedTuple):
+    '''Shape of a synthetic chain, every ``*_per_*`` field is a mean, the
+    actual amounts are drawn uniformly from ``[0, 2 * mean]``.
+    '''
+    seed: int = 0
+    txs_per_block: float = 10
+    logs_per_tx: float = 2
+    log_topics: int = 3
+    log_data_bytes: int = 64
+    itxs_per_tx: float = 1
+    create_ratio: float = 0.05
+    input_bytes: int = 68
+    accounts: int = 1000
+    block_delta: int = 0
+    start_time: float = 1_600_000_000.0
+    block_interval: float = 0.5
+
+
+def _draw(rng: random.Random, mean: float) -> int:
+    return rng.randint(0, round(2 * mean)) if mean > 0 else 0
+
+
+class SyntheticChain:
+    '''Seeded generator of evm blocks with synthetic transaction load.
+
+    Block & tx hashes only depend on the seed and block number, so block
+    ``n`` always links to ``n - 1`` no matter where generation started, and
+    the content of a block only depends on the seed, block number and the
+    sender nonces. ``blocks`` streams, memory stays constant over any amount
+    of blocks (sender nonces are bounded by ``spec.accounts``).
+    '''
+
+    def __init__(self, spec: WorkloadSpec = WorkloadSpec()):
+        self.spec = spec
+        self._nonces: Dict[int, int] = {}
+
+    def _digest(self, *parts) -> bytes:
+        return sha256(
+            ':'.join(str(part) for part in (self.spec.seed, *parts)).encode()
+        ).digest()
+
+    def block_hash(self, block_num: int) -> str:
+        return self._digest('block', block_num).hex()
+
+    def address(self, i: int) -> str:
+        return '0x' + self._digest('account', i)[:20].hex()
+
+    def _rng(self, block_num: int) -> random.Random:
+        return random.Random(
+            int.from_bytes(self._digest('rng', block_num)[:8], 'big'))
+
+    def _bytes(self, rng: random.Random, size: int) -> str:
+        return '0x' + rng.getrandbits(size * 8).to_bytes(size, 'big').hex()
+
+    def _log(self, rng: random.Random, address: str) -> Dict:
+        return {
+            'address': address,
+            'topics': [
+                self._bytes(rng, 32) for _ in range(self.spec.log_topics)],
+            'data': self._bytes(rng, self.spec.log_data_bytes)
+        }
+
+    def _itx(self, rng: random.Random, sender: str, depth: int) -> Dict:
+        return {
+            'callType': 'call',
+            'from': sender,
+            'to': self.address(rng.randrange(self.spec.accounts)),
+            'gas': hex(rng.randint(21000, 100000)),
+            'input': self._bytes(rng, 4),
+            'value': hex(rng.randrange(10 ** 18)),
+            'gasUsed': hex(rng.randint(2300, 21000)),
+            'output': '0x',
+            'subtraces': 0,
+            'traceAddress': [depth],
+            'type': 'call',
+            'depth': str(depth)
+        }
+
+    def _tx(self, rng: random.Random, block_num: int, i: int) -> Dict:
+        spec = self.spec
+        account = rng.randrange(spec.accounts)
+        sender = self.address(account)
+        nonce = self._nonces.get(account, 0)
+        self._nonces[account] = nonce + 1
+
+        creates = rng.random() < spec.create_ratio
+        to = None if creates else self.address(rng.randrange(spec.accounts))
+        created = None
+        if creates:
+            created = '0x' + self._digest('created', sender, nonce)[:20].hex()
+
+        emitter = created if creates else to
+        logs = [self._log(rng, emitter) for _ in range(_draw(rng, spec.logs_per_tx))]
+        itxs = [
+            self._itx(rng, emitter, depth)
+            for depth in range(_draw(rng, spec.itxs_per_tx))
+        ]
+        gas_used = 21000 + 16 * spec.input_bytes + 375 * len(logs) + 2300 * len(itxs)
+        if creates:
+            gas_used += 32000
+
+        return {
+            'hash': '0x' + self._digest('tx', block_num, i).hex(),
+            'trx_index': i,
+            'from': sender,
+            'to': to,
+            'nonce': nonce,
+            'value': str(rng.randrange(10 ** 18)),
+            'input_data': self._bytes(rng, spec.input_bytes),
+            'gas_price': '500000000000',
+            'gas_limit': str(gas_used * 2),
+            'gasused': hex(gas_used),
+            'status': '0x1',
+            'createdaddr': created,
+            'logs': logs,
+            'itxs': itxs
+        }
+
+    def block(self, block_num: int) -> Dict:
+        '''Generate block ``block_num``, sender nonces carry over from the
+        blocks generated before it by this instance.
+        '''
+        rng = self._rng(block_num)
+        txs = [
+            self._tx(rng, block_num, i)
+            for i in range(_draw(rng, self.spec.txs_per_block))
+        ]
+        for tx in txs:
+            tx['block'] = block_num - self.spec.block_delta
+            tx['block_hash'] = '0x' + self.block_hash(block_num)
+
+        return {
+            'block_num': block_num,
+            'evm_block_num': block_num - self.spec.block_delta,
+            'timestamp': (
+                self.spec.start_time + block_num * self.spec.block_interval),
+            'hash': self.block_hash(block_num),
+            'prev_hash': self.block_hash(block_num - 1),
+            'gas_used': sum(int(tx['gasused'], 16) for tx in txs),
+            'transactions': txs
+        }
+
+    def blocks(self, start: int, end: Optional[int] = None) -> Iterator[Dict]:
+        '''Stream blocks ``start`` to ``end`` (inclusive), forever if no
+        ``end``.
+        '''
+        block_num = start
+        while end is None or block_num <= end:
+            yield self.block(block_num)
+            block_num += 1
+
+
+def paced(blocks: Iterable[Dict], rate: Optional[float] = None) -> Iterator[Dict]:
+    '''Re-yield ``blocks`` at ``rate`` blocks per second, as fast as the
+    consumer takes them if no ``rate``.
+    '''
+    if not rate:
+        yield from blocks
+        return
+
+    interval = 1.0 / rate
+    next_at = time.monotonic()
+    for block in blocks:
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        yield block
+        next_at = max(next_at + interval, time.monotonic() - interval)
+
+
+def es_documents(
+    blocks: Iterable[Dict],
+    chain_name: str,
+    index_version: str = 'v1.5',
+    docs_per_index: int = 10_000_000
+) -> Iterator[Dict]:
+    '''Translator shaped delta & action docs of ``blocks``, as
+    ``elasticsearch.helpers`` bulk actions.
+    '''
+    for block in blocks:
+        evm_block_num = block['evm_block_num']
+        suffix = get_suffix(evm_block_num, docs_per_index)
+        timestamp = datetime.fromtimestamp(
+            block['timestamp'], tz=timezone.utc).isoformat()
+
+        yield {
+            '_index': f'{chain_name}-delta-{index_version}-{suffix}',
+            '_source': {
+                '@timestamp': timestamp,
+                'block_num': block['block_num'],
+                '@global': {'block_num': evm_block_num},
+                '@blockHash': block['hash'],
+                '@evmBlockHash': block['hash'],
+                '@evmPrevBlockHash': block['prev_hash'],
+                'gasUsed': str(block['gas_used']),
+                'gasLimit': '0x7fffffff',
+                'code': 'eosio',
+                'table': 'global'
+            }
+        }
+
+        for i, tx in enumerate(block['transactions']):
+            yield {
+                '_index': f'{chain_name}-action-{index_version}-{suffix}',
+                '_source': {
+                    '@timestamp': timestamp,
+                    'trx_id': tx['hash'][2:],
+                    'action_ordinal': i + 1,
+                    'signatures': [],
+                    '@raw': tx
+                }
+            }
+
+
+def load_elastic(
+    es: ElasticDriver,
+    chain: SyntheticChain,
+    start: int,
+    end: int,
+    chunk_size: int = 1000,
+    rate: Optional[float] = None
+) -> Tuple[int, int]:
+    '''Stream blocks ``start`` to ``end`` of ``chain`` straight into ES in
+    translator format, returns ``(ok, failed)`` doc counts.
+    '''
+    from elasticsearch.helpers import streaming_bulk
+
+    docs = es_documents(
+        paced(chain.blocks(start, end), rate),
+        es.chain_name,
+        index_version=es.index_version,
+        docs_per_index=es.docs_per_index)
+
+    ok = failed = 0
+    for success, _ in streaming_bulk(
+        es.elastic, docs, chunk_size=chunk_size, raise_on_error=False
+    ):
+        if success:
+            ok += 1
+
+        else:
+            failed += 1
+
+    es.invalidate_catalog()
+    return ok, failed
+
+
+def ship_block_hashes(chain: SyntheticChain, end: int) -> List[str]:
+    '''Hash chain of blocks ``0`` to ``end`` in ``ShipMocker.set_block_info``
+    format.
+    '''
+    return [chain.block_hash(block_num) for block_num in range(end + 1)]
+
+
+def feed_ship_mock(
+    mocker,
+    chain: SyntheticChain,
+    start: int,
+    end: int,
+    index: int = 0
+):
+    '''Make the ship mock serve ``chain``'s hash chain from ``start``.
+
+    The mock control api takes a whole sequence of hashes at once, so
+    unlike ``blocks`` this holds one hash per block up to ``end``.
+    '''
+    mocker.set_block_info(ship_block_hashes(chain, end), index)
+    mocker.set_block(start)
@@ -2,15 +2,14 @@
 
 from copy import deepcopy
 from hashlib import sha1
-import re
 import os
 import sys
 import time
 import signal
 import logging
-import subprocess
+import threading
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 from docker.errors import NotFound
 from websocket import create_connection
@@ -29,19 +28,50 @@ from leap.sugar import (
     docker_wait_process,
     download_latest_snapshot
 )
-from tevmc.cmdline.build import build_service, perform_config_build, service_alias_to_fullname
+from tevmc.cmdline.build import perform_config_build
 
 from tevmc.routes import add_routes
 
 from .config import *
+from .logs import FileTailer, LogEventBus
+from .images import ImageManager
+from .scheduler import StartupScheduler
+from .sync import SyncTracker, default_remote_endpoint
+from .metrics import MetricsRegistry, MetricsSampler, daemon_collectors
+from .watcher import ContainerWatcher
+from .jobs import JobManager
+from .proxy import TCPProxy
+from .testing.database import ElasticDriver
 from .utils import docker_stream_logs
-from .cleos_evm import CLEOSEVM
+from .cleos_evm import CLEOSEVM, DEFAULT_GAS_PRICE_TTL
 
 
 class TEVMCException(BaseException):
     ...
 
 
+# seconds each service has to become ready during start up, None means wait
+# forever (nodeos & indexer might need to sync), override through the
+# daemon.startup_timeouts config key
+DEFAULT_STARTUP_TIMEOUTS = {
+    'redis': 60 * 2,
+    'elastic': 60 * 10,
+    'kibana': 60 * 5,
+    'nodeos': None,
+    'indexer': None,
+    'index-patterns': 60 * 10,
+    'rpc': 60 * 10,
+    'beats': 60 * 5,
+    'evm-accounts': 60 * 5,
+    'logrotator': 60 * 2
+}
+
+
+# services that write their logs to the node logs directory instead of
+# the container output
+MAIN_DIR_LOG_SERVICES = ['nodeos', 'telosevm-translator', 'telos-evm-rpc']
+
+
 class TEVMController:
 
     def __init__(
@@ -63,16 +93,27 @@ class TEVMController:
         from_latest: bool = False,
         is_producer: bool = True,
         skip_init: bool = False,
-        additional_nodeos_params: List[str] = []
+        additional_nodeos_params: List[str] = [],
+        parallel_start: bool = True
     ):
         self.pid = os.getpid()
         self.config = config
         self.client = docker.from_env()
         self.exit_stack = ExitStack()
+        self._exit_stack_lock = threading.Lock()
+        self._scheduler: Optional[StartupScheduler] = None
+        self.parallel_start = parallel_start
+        self.startup_timeline = {}
         self.wait = wait
         self.services = services
         self.nodeos_logfile = None
         self.nodeos_logproc = None
+        self.log_tailers: Dict[str, FileTailer] = {}
+        self.log_buses: Dict[str, LogEventBus] = {}
+        self.sync: Optional[SyncTracker] = None
+        self._sync_lock = threading.Lock()
+        self._es: Optional[ElasticDriver] = None
+        self.metrics = MetricsRegistry()
         self.additional_nodeos_params = additional_nodeos_params
 
         if not root_pwd:
@@ -107,6 +148,20 @@ class TEVMController:
             self.logger = logging.getLogger()
             self.logger.setLevel(log_level.upper())
 
+        self.images = ImageManager(
+            self.client,
+            logger=self.logger,
+            max_workers=config['daemon'].get('build_workers', 3))
+
+        self.watcher = ContainerWatcher(self.client, logger=self.logger)
+        self.rpc_slot = 0
+        self.rpc_proxies: List[TCPProxy] = []
+        self._rpc_stack: Optional[ExitStack] = None
+
+        self.jobs = JobManager(
+            max_workers=config['daemon'].get('job_workers', 4),
+            logger=self.logger)
+
         self.is_fresh = True
         self.is_local = (
             ('testnet' not in self.chain_name) and
@@ -185,6 +240,16 @@ class TEVMController:
 
         self.api = Flask(f'tevmc-{os.getpid()}')
 
+    def _enter_context(self, ctx):
+        # services can be started from multiple scheduler threads, the ones
+        # still running after start up got aborted must not add containers
+        # the teardown already missed
+        with self._exit_stack_lock:
+            if self._scheduler:
+                self._scheduler.check_cancelled()
+
+            return self.exit_stack.enter_context(ctx)
+
     @contextmanager
     def open_container(
         self,
@@ -207,32 +272,13 @@ class TEVMController:
                     f'Container from image \'{image}\' is already running.')
 
             # check if image is present
-            local_images = []
-            for img in self.client.images.list(all=True):
-                local_images += img.tags
-
-            if image not in local_images:
+            if not self.images.has(image):
                 """Attempt to pull from remote
                 """
-                splt_image = image.split(':')
-                if len(splt_image) == 2:
-                    repo, tag = splt_image
-                else:
-                    raise ValueError(
-                        f'Expected \'{image}\' to have \'repo:tag\' format.')
-
                 try:
-                    updates = {}
-                    for update in self.client.api.pull(
-                        repo, tag=tag, stream=True, decode=True
-                    ):
-                        if 'id' in update:
-                            _id = update['id']
-                        if _id not in updates or (updates[_id] != update['status']):
-                            updates[_id] = update['status']
-                            self.logger.info(f'{_id}: {update["status"]}')
-
-                except docker.errors.ImageNotFound:
+                    self.images.pull(image)
+
+                except docker.errors.NotFound:
                    raise TEVMCException(f'Image \'{image}\' not found on either local or'
                         ' remote repos. Maybe consider running \'tevmc build\'')
 
@@ -294,7 +340,7 @@ class TEVMController:
             self.logger.critical("container is None")
             raise StopIteration
 
-        elif container in ['nodeos', 'telosevm-translator', 'telos-evm-rpc']:
+        elif container in MAIN_DIR_LOG_SERVICES:
             if from_latest:
                 lines = 1
             else:
@@ -337,7 +383,7 @@ class TEVMController:
                 Mount('/logs', str(self.main_logs_dir.resolve()), 'bind'),
             ]
 
-            self.containers['logrotator'] = self.exit_stack.enter_context(
+            self.containers['logrotator'] = self._enter_context(
                 self.open_container(
                     f'{config["name"]}-{self.pid}-{self.chain_name}',
                     f'{config["tag"]}-{self.chain_name}',
@@ -366,7 +412,7 @@ class TEVMController:
             if sys.platform == 'darwin':
                 more_params['ports'] = {f'{redis_port}/tcp': redis_port}
 
-            self.containers['redis'] = self.exit_stack.enter_context(
+            self.containers['redis'] = self._enter_context(
                 self.open_container(
                     f'{config["name"]}-{self.pid}-{self.chain_name}',
                     f'{config["tag"]}-{self.chain_name}',
@@ -381,10 +427,8 @@ class TEVMController:
                     ipv4_address=config['virtual_ip']
                 )
 
-            for msg in self.stream_logs('redis'):
-                self.logger.info(msg.rstrip())
-                if 'Ready to accept connections' in msg:
-                    break
+            self.open_log_bus('redis')
+            self.wait_log_event('redis', 'ready', timeout=60)
 
     def start_elasticsearch(self):
         with self.must_keep_running('elasticsearch'):
@@ -404,7 +448,7 @@ class TEVMController:
             if sys.platform == 'darwin':
                 more_params['ports'] = {f'{es_port}/tcp': es_port}
 
-            self.containers['elasticsearch'] = self.exit_stack.enter_context(
+            self.containers['elasticsearch'] = self._enter_context(
                 self.open_container(
                     f'{config["name"]}-{self.pid}-{self.chain_name}',
                     f'{config["tag"]}-{self.chain_name}',
@@ -429,10 +473,8 @@ class TEVMController:
                     ipv4_address=config['virtual_ip']
                 )
 
-            for msg in self.stream_logs('elasticsearch'):
-                self.logger.info(msg.rstrip())
-                if ' indices into cluster_state' in msg:
-                    break
+            self.open_log_bus('elasticsearch')
+            self.wait_log_event('elasticsearch', 'ready', timeout=60*5)
 
     def stop_elasticsearch(self):
         self.containers['elasticsearch'].kill(signal.SIGTERM)
@@ -458,7 +500,7 @@ class TEVMController:
             if sys.platform == 'darwin':
                 more_params['ports'] = {f'{kibana_port}/tcp': kibana_port}
 
-            self.containers['kibana'] = self.exit_stack.enter_context(
+            self.containers['kibana'] = self._enter_context(
                 self.open_container(
                     f'{config["name"]}-{self.pid}-{self.chain_name}',
                     f'{config["tag"]}-{self.chain_name}',
@@ -589,7 +631,7 @@ class TEVMController:
         self.logger.info(' '.join(cmd))
 
         # open container
-        self.containers['nodeos'] = self.exit_stack.enter_context(
+        self.containers['nodeos'] = self._enter_context(
             self.open_container(
                 f'{config["name"]}-{self.pid}-{self.chain_name}',
                 f'{config["tag"]}-{self.chain_name}',
@@ -622,7 +664,9 @@ class TEVMController:
                 logger=self.logger,
                 url=cleos_url,
                 evm_url=cleos_evm_url,
-                chain_id=self.config['telos-evm-rpc']['chain_id'])
+                chain_id=self.config['telos-evm-rpc']['chain_id'],
+                gas_price_ttl=self.config['nodeos'].get(
+                    'evm_gas_price_ttl', DEFAULT_GAS_PRICE_TTL))
 
             self.cleos = cleos
 
@@ -694,76 +738,139 @@ class TEVMController:
 
         self.start_nodeos()
 
+    def log_tailer(self, service: str) -> FileTailer:
+        '''Get the shared tailer following ``logs/{service}.log``.
+        '''
+        if service not in self.log_tailers:
+            self.log_tailers[service] = FileTailer(
+                (self.main_logs_dir / f'{service}.log').resolve(),
+                logger=self.logger)
+
+        return self.log_tailers[service]
+
     def _stream_logs_from_main_dir(
         self,
         service: str,
         lines: int = 100,
         timeout: int = 60
     ):
-        log_path = self.main_logs_dir
-        log_path /= f'{service}.log'
-        log_path = log_path.resolve()
+        tailer = self.log_tailer(service)
+        deadline = time.monotonic() + timeout
+
+        with tailer.subscribe(backlog=lines) as reader:
+            for msg in reader.iter_lines(deadline=deadline):
+                if 'clear_expired_input_' in msg:
+                    continue
+                yield msg
+                self.logger.info(msg.rstrip())
 
-        for _ in range(3):
-            if not log_path.is_file():
-                time.sleep(1)
+        raise ValueError(
+            f'timed out after {timeout}s while streaming {tailer.path}')
 
-            else:
-                break
+    def open_log_bus(self, service: str) -> LogEventBus:
+        '''(Re)start the event bus of a service log.
 
-        process = subprocess.Popen(
-            ['bash', '-c',
-                f'timeout {timeout}s tail -n {lines} -f {log_path}'],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
+        Services that log to the main logs dir get fed from the shared file
+        tailer starting at the current end of file, so this must be called
+        before launching the container. The rest are fed from the docker log
+        stream, which replays from the container start, so call it after.
+        '''
+        if service in self.log_buses:
+            self.log_buses[service].close()
 
-        for line in iter(process.stdout.readline, b''):
-            msg = line.decode('utf-8')
-            if 'clear_expired_input_' in msg:
-                continue
-            yield msg
-            self.logger.info(msg.rstrip())
+        bus = LogEventBus(service, logger=self.logger)
+        if service in MAIN_DIR_LOG_SERVICES:
+            bus.start(self.log_tailer(service).subscribe())
 
-        process.stdout.close()
-        process.wait()
+        else:
+            bus.start(docker_stream_logs(
+                self.containers[service], timeout=None, lines=True))
 
-        if process.returncode != 0:
-            raise ValueError(
-                f'tail returned {process.returncode}\n'
-                f'{process.stderr.read().decode("utf-8")}')
+        self.log_buses[service] = bus
+        return bus
 
-    def _get_head_block(self):
-        if 'testnet' in self.chain_name:
-            endpoint = 'https://testnet.telos.net'
-        else:
-            endpoint = 'https://mainnet.telos.net'
+    def log_bus(self, service: str) -> LogEventBus:
+        if service not in self.log_buses:
+            return self.open_log_bus(service)
 
-        resp = requests.get(f'{endpoint}/v1/chain/get_info').json()
-        return resp['head_block_num']
+        return self.log_buses[service]
 
-    def await_full_index(self):
-        last_indexed_block = 0
-        remote_head_block = self._get_head_block()
-        last_update_time = time.time()
-        delta = remote_head_block - self.cleos.get_info()['head_block_num']
+    def wait_log_event(self, service: str, kind: str, timeout: float):
+        if service not in self.log_buses:
+            self.open_log_bus(service)
 
-        for line in self.stream_logs('telosevm-translator'):
-            if '] pushed, at ' in line:
-                m = re.findall(r'(?<=: \[)(.*?)(?=\|)', line)
-                if len(m) == 1 and m[0] != 'NaN':
-                    last_indexed_block = int(m[0].replace(',', ''))
+        event = self.log_buses[service].wait_for(kind, timeout=timeout)
+        if event is None:
+            raise TEVMCException(
+                f'{service} didn\'t log a \'{kind}\' event in {timeout} seconds')
 
-                    delta = remote_head_block - last_indexed_block
+        return event
 
-            self.logger.info(f'waiting on indexer... delta: {delta}')
+    def remote_endpoint(self) -> str:
+        '''Chain api the node syncs against, daemon.sync.remote_endpoint
+        overrides the public endpoint picked by chain name.
+        '''
+        endpoint = self.config['daemon'].get('sync', {}).get('remote_endpoint')
+        if endpoint:
+            return endpoint
 
-            if delta < 100:
-                break
+        nodeos_api_port = self.config['nodeos']['ini']['http_addr'].split(':')[1]
+        return default_remote_endpoint(
+            self.chain_name, f'http://127.0.0.1:{nodeos_api_port}')
+
+    def _get_head_block(self):
+        resp = requests.get(
+            f'{self.remote_endpoint()}/v1/chain/get_info', timeout=10).json()
+        return resp['head_block_num']
 
-            now = time.time()
-            if now - last_update_time > 3600:
-                remote_head_block = self._get_head_block()
-                last_update_time = now
+    def elastic_driver(self) -> ElasticDriver:
+        '''Shared driver for daemon side queries, its index catalog gets
+        reused across the sync tracker & metrics.
+        '''
+        if self._es is None:
+            self._es = ElasticDriver(self.config)
+
+        return self._es
+
+    def _get_indexed_head(self):
+        es = self.elastic_driver()
+        # catalog max blocks move constantly while syncing
+        es.index_catalog(refresh=True)
+        block = es.get_last_indexed_block()
+        if not block:
+            return None
+
+        return block.block_num, block.global_block_num
+
+    def sync_tracker(self) -> SyncTracker:
+        '''Lazily started indexer sync tracker, tunable through the
+        daemon.sync config key.
+        '''
+        with self._sync_lock:
+            if self.sync is None:
+                sync_config = self.config['daemon'].get('sync', {})
+                self.sync = SyncTracker(
+                    self._get_indexed_head,
+                    lambda: self.cleos.get_info()['head_block_num'],
+                    self._get_head_block,
+                    interval=sync_config.get('interval', 10.0),
+                    remote_interval=sync_config.get('remote_interval', 60.0),
+                    window=sync_config.get('window', 60.0),
+                    logger=self.logger)
+
+            bus = None
+            if 'telosevm-translator' in self.containers:
+                bus = self.log_bus('telosevm-translator')
+
+            self.sync.start(bus)
+
+            return self.sync
+
+    def await_full_index(self):
+        self.sync_tracker().wait_synced(
+            threshold=100,
+            log_interval=self.config['daemon'].get('sync', {}).get(
+                'log_interval', 60.0))
 
     def setup_index_patterns(self, patterns: List[str]):
         kibana_port = self.config['kibana']['port']
@@ -822,7 +929,7 @@ class TEVMController:
                 Mount('/root/logs', str(data_dir.resolve()), 'bind')
             ]
 
-            self.containers['beats'] = self.exit_stack.enter_context(
+            self.containers['beats'] = self._enter_context(
                 self.open_container(
                     f'{config["name"]}-{self.pid}-{self.chain_name}',
                     f'{config["tag"]}-{self.chain_name}',
@@ -898,16 +1005,21 @@ class TEVMController:
 
             nodeos_api_port = config_nodeos['ini']['http_addr'].split(':')[1]
             nodeos_ship_port = config_nodeos['ini']['history_endpoint'].split(':')[1]
-            endpoint = f'http://{nodeos_host}:{nodeos_api_port}'
 
-            if 'testnet' in self.chain_name:
-                remote_endpoint = 'https://testnet.telos.net'
-            elif 'mainnet' in self.chain_name:
-                remote_endpoint = 'https://mainnet.telos.net'
-            else:
-                remote_endpoint = endpoint
+            # optional overrides, to index from a ship mock instead of nodeos
+            endpoint = config.get(
+                'endpoint', f'http://{nodeos_host}:{nodeos_api_port}')
 
-            ws_endpoint = f'ws://{nodeos_host}:{nodeos_ship_port}'
+            remote_endpoint = self.config['daemon'].get(
+                'sync', {}).get('remote_endpoint')
+            if not remote_endpoint:
+                remote_endpoint = default_remote_endpoint(
+                    self.chain_name, endpoint)
+
+            ws_endpoint = config.get(
+                'ws_endpoint', f'ws://{nodeos_host}:{nodeos_ship_port}')
+
+            self.open_log_bus('telosevm-translator')
 
             bc_host = config_rpc['indexer_websocket_host']
             bc_port = config_rpc['indexer_websocket_port']
@@ -916,7 +1028,7 @@ class TEVMController:
             if sys.platform == 'darwin':
                 more_params['ports'] = {f'{bc_port}/tcp': bc_port}
 
-            self.containers['telosevm-translator'] = self.exit_stack.enter_context(
+            self.containers['telosevm-translator'] = self._enter_context(
                 self.open_container(
                     f'{config["name"]}-{self.pid}-{self.chain_name}',
                     f'{config["tag"]}-{self.chain_name}',
@@ -952,11 +1064,9 @@ class TEVMController:
                     ipv4_address=config['virtual_ip']
                 )
 
-            for msg in self.stream_logs('telosevm-translator', timeout=60*10):
-                if 'drained' in msg:
-                    break
+            self.wait_log_event('telosevm-translator', 'drained', timeout=60*10)
 
-    def restart_translator(self):
+    def stop_translator(self):
         if 'telosevm-translator' in self.containers:
             container = self.containers['telosevm-translator']
             try:
@@ -969,6 +1079,8 @@ class TEVMController:
             except docker.errors.NotFound:
                 ...
 
+    def restart_translator(self):
+        self.stop_translator()
         self.start_telosevm_translator()
 
 
@@ -980,6 +1092,11 @@ class TEVMController:
                 Mount('/logs', str(self.main_logs_dir.resolve()), 'bind')
             ]
 
+            if (config.get('rolling_restart', False) and
+                sys.platform != 'darwin'):
+                self._start_proxied_rpc()
+                return
+
             more_params = {}
             if sys.platform == 'darwin':
                 api_port = config['api_port']
@@ -989,7 +1106,9 @@ class TEVMController:
                     f'{rpc_port}/tcp': rpc_port
                 }
 
-            self.containers['telos-evm-rpc'] = self.exit_stack.enter_context(
+            self.open_log_bus('telos-evm-rpc')
+
+            self.containers['telos-evm-rpc'] = self._enter_context(
                 self.open_container(
                     f'{config["name"]}-{self.pid}-{self.chain_name}',
                     f'{config["tag"]}-{self.chain_name}',
@@ -1004,12 +1123,200 @@ class TEVMController:
                     ipv4_address=config['virtual_ip']
                 )
 
-            for msg in self.stream_logs('telos-evm-rpc'):
-                self.logger.info(msg.rstrip())
-                if 'Telos EVM RPC started!!!' in msg:
-                    break
+            self.wait_log_event('telos-evm-rpc', 'ready', timeout=60*2)
+
+    def _rpc_ports(self, slot: int) -> Tuple[int, int]:
+        '''Api & websocket ports of an rpc instance, slot 0 are the public
+        ones, rolling restarts alternate between slots 1 & 2 behind proxies
+        listening on them.
+        '''
+        config = self.config['telos-evm-rpc']
+        offset = config.get('rolling_port_offset', 10) * slot
+        return (
+            int(config['api_port']) + offset,
+            int(config['rpc_websocket_port']) + offset
+        )
+
+    def _rpc_slot_config(self, slot: int) -> Path:
+        # the rpc reads its ports from the config.json baked in the image,
+        # mount a copy with the slot ports over it
+        config = self.config['telos-evm-rpc']
+        docker_dir = self.docker_wd / config['docker_path']
+        rpc_config = simplejson.loads(
+            (docker_dir / 'build' / 'config.json').read_text())
+
+        api_port, ws_port = self._rpc_ports(slot)
+        rpc_config['apiPort'] = type(rpc_config['apiPort'])(api_port)
+        rpc_config['rpcWebsocketPort'] = type(
+            rpc_config['rpcWebsocketPort'])(ws_port)
+
+        path = docker_dir / f'config.slot{slot}.json'
+        path.write_text(simplejson.dumps(rpc_config, indent=4))
+        return path
+
+    def _open_rpc_slot(self, slot: int):
+        config = self.config['telos-evm-rpc']
+        return self.open_container(
+            f'{config["name"]}-{self.pid}-{self.chain_name}-slot{slot}',
+            f'{config["tag"]}-{self.chain_name}',
+            mounts=[
+                Mount('/logs', str(self.main_logs_dir.resolve()), 'bind'),
+                Mount(
+                    '/telos-evm-rpc/config.json',
+                    str(self._rpc_slot_config(slot).resolve()),
+                    'bind', read_only=True)
+            ]
+        )
+
+    def _start_proxied_rpc(self):
+        '''Start the rpc on slot 1 with proxies holding the public ports, so
+        rolling restarts can hand connections over from the very first one.
+        '''
+        config = self.config['telos-evm-rpc']
+        self.open_log_bus('telos-evm-rpc')
+
+        stack = ExitStack()
+        self._rpc_stack = stack
+        self.rpc_slot = 1
+        self.containers['telos-evm-rpc'] = stack.enter_context(
+            self._open_rpc_slot(1))
+
+        self.wait_log_event('telos-evm-rpc', 'ready', timeout=60*2)
+
+        hosts = (config['api_host'], config['rpc_websocket_host'])
+        for host, port, target in zip(
+            hosts, self._rpc_ports(0), self._rpc_ports(1)):
+            proxy = TCPProxy(
+                (host, port), ('127.0.0.1', target), logger=self.logger)
+            proxy.start(timeout=config.get('rolling_drain_timeout', 30))
+            self.rpc_proxies.append(proxy)
+
+    def _close_rpc_stack(self):
+        stack, self._rpc_stack = self._rpc_stack, None
+        if stack:
+            stack.close()
+
+    def _probe_rpc(self, api_port: int) -> Optional[int]:
+        try:
+            resp = requests.post(
+                f'http://127.0.0.1:{api_port}/evm',
+                json={
+                    'jsonrpc': '2.0', 'id': 1,
+                    'method': 'eth_blockNumber', 'params': []
+                },
+                timeout=5).json()
+            return int(resp['result'], 16)
+
+        except (requests.RequestException, ValueError, KeyError, TypeError):
+            return None
+
+    def _await_rpc_healthy(
+        self,
+        api_port: int,
+        reference_port: int,
+        timeout: float,
+        max_lag: int
+    ) -> int:
+        '''Wait until the rpc on ``api_port`` answers ``eth_blockNumber``
+        no more than ``max_lag`` blocks behind the one it replaces.
+        '''
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            block = self._probe_rpc(api_port)
+            if block is not None:
+                reference = self._probe_rpc(reference_port)
+                if reference is None or block >= reference - max_lag:
+                    return block
+
+            time.sleep(1)
+
+        raise TEVMCException(
+            f'rpc on port {api_port} not healthy after {timeout} seconds')
+
+    def _stop_rpc_instance(self, container, stack: Optional[ExitStack]):
+        if stack:
+            stack.close()
+            return
+
+        try:
+            container.stop()
+
+        except docker.errors.APIError:
+            ...
+
+    def _close_rpc_proxies(self):
+        for proxy in self.rpc_proxies:
+            proxy.close()
+
+        self.rpc_proxies = []
+        self.rpc_slot = 0
+
+    def rolling_restart_rpc(self):
+        '''Replace the rpc container without dropping its public ports.
+
+        The new instance starts on the ports of the free slot and gets probed
+        until healthy, then the proxies on the public ports send new
+        connections to it and the old instance is stopped once drained. Needs
+        the rpc started behind the proxies, telos-evm-rpc.rolling_restart set.
+        '''
+        if sys.platform == 'darwin':
+            raise TEVMCException(
+                'rolling rpc restarts need host networking (linux only)')
+
+        if not self.rpc_proxies:
+            raise TEVMCException(
+                'rpc isn\'t behind the proxies, set '
+                'telos-evm-rpc.rolling_restart before starting tevmc')
+
+        config = self.config['telos-evm-rpc']
+        old = self.containers.get('telos-evm-rpc')
+        old_stack = self._rpc_stack
+        old_ports = self._rpc_ports(self.rpc_slot)
+        new_slot = 2 if self.rpc_slot == 1 else 1
+        new_ports = self._rpc_ports(new_slot)
+
+        self.logger.info(
+            f'rolling rpc restart: starting slot {new_slot} on {new_ports}')
+        stack = ExitStack()
+        try:
+            container = stack.enter_context(self._open_rpc_slot(new_slot))
+            block = self._await_rpc_healthy(
+                new_ports[0], old_ports[0],
+                timeout=config.get('rolling_probe_timeout', 60 * 2),
+                max_lag=config.get('rolling_max_lag', 10))
+
+        except BaseException:
+            # old instance keeps serving
+            stack.close()
+            raise
+
+        self.logger.info(f'slot {new_slot} healthy at block {block}, handing over')
+        drain_timeout = config.get('rolling_drain_timeout', 30)
+        for proxy, target in zip(self.rpc_proxies, new_ports):
+            proxy.switch(('127.0.0.1', target))
+
+        for proxy, target in zip(self.rpc_proxies, old_ports):
+            if not proxy.wait_drained(
+                ('127.0.0.1', target), timeout=drain_timeout):
+                self.logger.warning(
+                    f'{proxy.active(("127.0.0.1", target))} connections to '
+                    f'port {target} still open after {drain_timeout}s, '
+                    'stopping anyway')
+
+        self._stop_rpc_instance(old, old_stack)
+
+        # torn down by the _close_rpc_stack callback start up registered
+        self.containers['telos-evm-rpc'] = container
+        self._rpc_stack = stack
+        self.rpc_slot = new_slot
 
     def restart_rpc(self):
+        if self.rpc_proxies:
+            # back to a plain instance on the public ports
+            self._close_rpc_proxies()
+
+        self._close_rpc_stack()
+
         if 'telos-evm-rpc' in self.containers:
             container = self.containers['telos-evm-rpc']
             try:
@@ -1091,23 +1398,38 @@ class TEVMController:
                 uni_conf.write(json.dumps(cfg, indent=4))
 
             self.logger.info('Rebuilding config files...')
-            perform_config_build(self.root_pwd, cfg)
-            self.logger.info('done.')
+            report = perform_config_build(self.root_pwd, cfg)
+            for service, files in report['changed'].items():
+                self.logger.info(f'{service}: rendered {files}')
+
+            self.logger.info(
+                f'done, services needing image rebuild: {report["rebuild"]}')
 
             self.config = cfg
 
         if templates_only:
             return
 
-        # docker build
-        for service in self.services:
-            name = service_alias_to_fullname(service)
-            conf = self.config[name]
-            if 'docker_path' in conf:
-                build_service(
-                    self.root_pwd, name,
-                    self.config, self.logger,
-                    nocache=not use_cache)
+        # docker build, images whose build context didn't change are skipped
+        built = self.images.build_services(
+            self.root_pwd, self.services, self.config,
+            nocache=not use_cache)
+
+        self.logger.info(f'built images for: {built}')
+
+    def _start_indexer(self):
+        self.start_telosevm_translator()
+
+        if not self.is_local and self.wait:
+            self.await_full_index()
+
+    def _setup_kibana_index_patterns(self):
+        idx_version = self.config['telos-evm-rpc']['elasitc_index_version']
+        self.setup_index_patterns([
+            f'{self.chain_name}-action-{idx_version}-*',
+            f'{self.chain_name}-delta-{idx_version}-*',
+            'filebeat-*'
+        ])
 
     def start(self):
 
@@ -1116,56 +1438,123 @@ class TEVMController:
         if sys.platform == 'darwin':
             self.darwin_network_setup()
 
-        if 'redis' in self.services:
-            self.start_redis()
+        if self.wait and 'rpc' not in self.services:
+            self.logger.warning('--wait passed but no indexer launched, ignoring...')
+
+        timeouts = dict(DEFAULT_STARTUP_TIMEOUTS)
+        timeouts.update(self.config['daemon'].get('startup_timeouts', {}))
+
+        # task name, start function, dependencies
+        tasks = [
+            ('redis', self.start_redis, []),
+            ('elastic', self.start_elasticsearch, []),
+            ('kibana', self.start_kibana, []),
+            ('nodeos', self.start_nodeos, []),
+            ('indexer', self._start_indexer, ['elastic', 'nodeos']),
+            ('index-patterns', self._setup_kibana_index_patterns, ['kibana']),
+            ('rpc', self.start_evm_rpc, ['redis', 'elastic', 'indexer']),
+            ('beats', self.start_beats, ['elastic', 'kibana', 'rpc']),
+            ('evm-accounts', self._create_test_accounts, ['nodeos', 'rpc']),
+            ('logrotator', self.start_logrotator, [])
+        ]
 
-        if 'elastic' in self.services:
-            self.start_elasticsearch()
+        enabled = set(self.services)
+        if 'kibana' in enabled:
+            enabled.add('index-patterns')
 
-        if 'kibana' in self.services:
-            self.start_kibana()
+        if (self.is_local and
+            not self.skip_init and
+            'nodeos' in self.services):
+            enabled.add('evm-accounts')
 
-        if 'nodeos' in self.services:
-            self.start_nodeos()
+        scheduler = StartupScheduler(
+            max_workers=None if self.parallel_start else 1,
+            logger=self.logger)
+        self._scheduler = scheduler
 
-        if 'indexer' in self.services:
-            self.start_telosevm_translator()
+        for name, fn, deps in tasks:
+            if name in enabled:
+                scheduler.add(
+                    name, fn,
+                    depends=[dep for dep in deps if dep in enabled],
+                    timeout=timeouts.get(name))
 
-            if not self.is_local and self.wait:
-                self.await_full_index()
+        # rpc instances started behind the proxies live on their own stack,
+        # rolling restarts swap it, so teardown closes whichever is current
+        with self._exit_stack_lock:
+            self.exit_stack.callback(self._close_rpc_stack)
 
+        try:
+            with self.metrics.timed('startup'):
+                scheduler.run()
 
-        if 'kibana' in self.services:
-            idx_version = self.config['telos-evm-rpc']['elasitc_index_version']
-            self.setup_index_patterns([
-                f'{self.chain_name}-action-{idx_version}-*',
-                f'{self.chain_name}-delta-{idx_version}-*',
-                'filebeat-*'
-            ])
+        finally:
+            self.startup_timeline = scheduler.timeline()
+            phases = self.metrics.gauge(
+                'startup_phase_seconds', 'Duration of each start up phase.')
+            for name, (start, end) in self.startup_timeline.items():
+                phases.set(end - start, phase=name)
+
+            self.logger.info('startup timeline:')
+            for line in scheduler.report():
+                self.logger.info(line)
+
+    def _create_test_accounts(self):
+        # is_fresh is only known once nodeos finished its init
+        if self.is_fresh:
+            # list of [address, amount] pairs, defaults to the cleos_evm one
+            self.cleos.create_test_evm_account(
+                funding=self.config['nodeos'].get('evm_test_funding'))
 
+    def serve_api(self):
+        add_routes(self)
+        sampler = MetricsSampler(
+            self.metrics,
+            daemon_collectors(self),
+            interval=self.config['daemon'].get('metrics_interval', 15.0),
+            logger=self.logger)
+        self.watcher.start()
+        sampler.start()
+        try:
+            self._serve(
+                self.config['daemon'].get('host', '127.0.0.1'),
+                self.config['daemon']['port'],
+                self.config['daemon'].get('threads', 8))
 
-        if 'rpc' in self.services:
-            self.start_evm_rpc()
+        finally:
+            sampler.stop()
+            self.watcher.close()
+            self.jobs.shutdown()
+
+    def _serve(self, host: str, port: int, threads: int):
+        '''Serve the control api on a multi threaded server, waitress when
+        installed, werkzeug's threaded server otherwise; pick one through
+        the daemon.server config key.
+        '''
+        server = self.config['daemon'].get('server', 'auto')
+        if server in ['auto', 'waitress']:
+            try:
+                import waitress
 
-        else:
-            if self.wait:
-                self.logger.warning('--wait passed but no indexer launched, ignoring...')
+                self.logger.info(
+                    f'serving api on {host}:{port} (waitress, {threads} threads)')
+                waitress.serve(self.api, host=host, port=port, threads=threads)
+                return
 
-        if 'beats' in self.services:
-            self.start_beats()
+            except ImportError:
+                if server == 'waitress':
+                    raise TEVMCException(
+                        'daemon.server set to waitress but it isn\'t installed')
 
-        if (self.is_local and
-            self.is_fresh and
-            not self.skip_init and
-            'nodeos' in self.services):
-            self.cleos.create_test_evm_account()
+        from werkzeug.serving import make_server
 
-        if 'logrotator' in self.services:
-            self.start_logrotator()
+        self.logger.info(f'serving api on {host}:{port} (werkzeug, threaded)')
+        httpd = make_server(host, port, self.api, threaded=True)
+        try:
+            httpd.serve_forever()
 
-    def serve_api(self):
-        add_routes(self)
-        self.api.run(port=self.config['daemon']['port'])
+        finally:
+            httpd.server_close()
 
     def stop(self):
         if 'nodeos' in self.services:
@@ -1191,7 +1580,27 @@ class TEVMController:
             self.nodeos_logproc.kill()
             self.nodeos_logfile.close()
 
-        self.exit_stack.pop_all().close()
+        if self.sync:
+            self.sync.close()
+            self.sync = None
+
+        self._close_rpc_proxies()
+
+        for bus in self.log_buses.values():
+            bus.close()
+
+        self.log_buses = {}
+
+        for tailer in self.log_tailers.values():
+            tailer.close()
+
+        self.log_tailers = {}
+
+        # waits for contexts being entered by still running start up tasks
+        with self._exit_stack_lock:
+            stack = self.exit_stack.pop_all()
+
+        stack.close()
 
         pid_path = self.root_pwd / 'tevmc.pid'
         if pid_path.is_file():
@@ -287,85 +287,233 @@ import struct
 import requests_unixsocket
 from requests.exceptions import Timeout
 
-def _parse_docker_log(data):
-    '''Parses Docker logs by handling Docker's log protocol.
+class DockerLogDecoder:
+    '''Incremental decoder for Docker's multiplexed log stream.
 
     Docker prefixes each log entry with an 8-byte header:
     - 1 byte: Stream type (STDIN, STDOUT, STDERR)
-    - 7 bytes: Size of the message that follows
+    - 3 bytes: Padding
+    - 4 bytes: Big endian size of the message that follows
+
+    Chunks are appended to a single ``bytearray`` and consumed by advancing a
+    read offset, frame headers are unpacked in place and payloads are decoded
+    straight from a ``memoryview``, so the pending tail is never re-copied per
+    frame. Consumed bytes are compacted away once they make up more than half
+    of the buffer, which keeps the total work linear in the stream size.
+
+    Frames or headers split across chunks stay buffered until the rest of the
+    bytes arrive.
+    '''
+
+    HEADER = struct.Struct('>BxxxL')
+
+    def __init__(self, encoding: str = 'utf-8'):
+        self.encoding = encoding
+        self._buffer = bytearray()
+        self._offset = 0
+        self._partial_lines = {}
+
+    def __len__(self) -> int:
+        '''Amount of bytes buffered but not yet emitted as frames.'''
+        return len(self._buffer) - self._offset
+
+    def feed(self, chunk: bytes):
+        if chunk:
+            self._buffer += chunk
+
+    def _compact(self):
+        if self._offset == len(self._buffer):
+            self._buffer.clear()
+            self._offset = 0
+
+        elif self._offset > (len(self._buffer) >> 1):
+            del self._buffer[:self._offset]
+            self._offset = 0
+
+    def iter_raw_frames(self):
+        '''Yield ``(stream_type, payload)`` tuples for every complete frame
+        currently buffered, payloads are ``bytes``.
+        '''
+        header_size = self.HEADER.size
+        while len(self._buffer) - self._offset >= header_size:
+            stream, length = self.HEADER.unpack_from(self._buffer, self._offset)
+            start = self._offset + header_size
+            end = start + length
+            if end > len(self._buffer):
+                break
+
+            with memoryview(self._buffer) as view:
+                payload = view[start:end].tobytes()
+
+            self._offset = end
+            yield stream, payload
+
+        self._compact()
+
+    def iter_frames(self):
+        '''Yield the decoded message of every complete frame buffered.
+        '''
+        for _, payload in self.iter_raw_frames():
+            yield payload.decode(self.encoding, errors='replace')
+
+    def iter_lines(self):
+        '''Bulk mode, yield every complete line found in the buffered frames.
+
+        Lines can span multiple frames, partial lines are kept per stream type
+        until their terminator arrives. Lines keep their trailing newline.
+        '''
+        for stream, payload in self.iter_raw_frames():
+            pending = self._partial_lines.get(stream)
+            if pending:
+                payload = pending + payload
+
+            lines = payload.split(b'\n')
+            self._partial_lines[stream] = lines.pop()
+            for line in lines:
+                yield (line + b'\n').decode(self.encoding, errors='replace')
+
+    def flush_lines(self):
+        '''Yield any unterminated lines left once the stream ended.
+        '''
+        for stream in sorted(self._partial_lines):
+            pending = self._partial_lines[stream]
+            if pending:
+                yield pending.decode(self.encoding, errors='replace')
+
+        self._partial_lines.clear()
+
+
+def _parse_docker_log(data):
+    '''Parses Docker logs by handling Docker's log protocol.
 
     Args:
         data (bytes): The raw logs data with Docker's headers.
 
     Yields:
-        str: The parsed log messages.
+        str: The parsed log messages, trailing incomplete frames are ignored.
     '''
-    while data:
-        # Extract header from data
-        header = data[:8]
-        _, length = struct.unpack('>BxxxL', header)
+    decoder = DockerLogDecoder()
+    decoder.feed(data)
+    yield from decoder.iter_frames()
 
-        # Extract the actual log message based on the length from the header
-        message = data[8:8+length].decode('utf-8', errors='replace')
 
-        # Advance the buffer to next log entry
-        data = data[8+length:]
-
-        yield message
+class DockerLogStream:
+    '''Iterable over the log stream of a container, see
+    ``docker_stream_logs``.
 
+    ``close`` may be called from another thread, it shuts the docker
+    connection so a reader blocked waiting for logs ends instead of leaking.
+    '''
 
-def docker_stream_logs(container, timeout=30.0, from_latest=False):
+    def __init__(
+        self,
+        container,
+        timeout=30.0,
+        from_latest=False,
+        lines=False,
+        chunk_size=64 * 1024
+    ):
+        self.container = container
+        self.timeout = timeout
+        self.from_latest = from_latest
+        self.lines = lines
+        self.chunk_size = chunk_size
+        self.closed = False
+        self._response = None
+
+    def __iter__(self):
+        container = self.container
+        container.reload()
+
+        if container.status != 'running':
+            raise DockerException(
+                f'Tried to stream logs but container {container.name} is stopped')
+
+        # Set up a session to use the Docker Unix socket
+        session = requests_unixsocket.Session()
+
+        url = f'http+unix://%2Fvar%2Frun%2Fdocker.sock/containers/{container.name}/logs'
+
+        # Parameters for the log request
+        params = {
+            'stdout': '1',
+            'stderr': '1',
+            'follow': '1'
+        }
+
+        # If only logs from the latest are required
+        if self.from_latest:
+            params['tail'] = '0'
+
+        response = session.get(
+            url, params=params, stream=True, timeout=self.timeout)
+        self._response = response
+        if self.closed:
+            response.close()
+            return
+
+        decoder = DockerLogDecoder()
+        decode = decoder.iter_lines if self.lines else decoder.iter_frames
+
+        try:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if chunk:
+                    decoder.feed(chunk)
+                    yield from decode()
+
+            if self.lines:
+                yield from decoder.flush_lines()
+
+        except Timeout:
+            raise StopIteration(f'No logs received for {self.timeout} seconds.')
+
+        except Exception:
+            # reads fail once close() shut the connection under them
+            if not self.closed:
+                raise
+
+        finally:
+            response.close()
+
+    def close(self):
+        self.closed = True
+        if self._response is not None:
+            try:
+                self._response.close()
+
+            except Exception:
+                ...
+
+
+def docker_stream_logs(
+    container,
+    timeout=30.0,
+    from_latest=False,
+    lines=False,
+    chunk_size=64 * 1024
+) -> DockerLogStream:
     '''Streams logs from a running Docker container.
 
     Args:
         container (container): Docker container object.
         timeout (float, optional): Time to wait between log messages. Default to 30.0 seconds.
         from_latest (bool, optional): Only fetch logs since the last log. Default to False.
+        lines (bool, optional): Yield complete lines instead of raw frames. Default to False.
+        chunk_size (int, optional): Socket read size. Default to 64 KiB.
 
-    Yields:
-        str: The log messages.
+    Returns:
+        DockerLogStream: Iterable of the log messages, closable from any thread.
 
-    Raises:
+    Raises (while iterating):
         DockerException: If the container is not running.
         StopIteration: If no logs are received within the timeout period.
     '''
-    container.reload()
-
-    if container.status != 'running':
-        raise DockerException(
-            f'Tried to stream logs but container {container.name} is stopped')
-
-    # Set up a session to use the Docker Unix socket
-    session = requests_unixsocket.Session()
-
-    url = f'http+unix://%2Fvar%2Frun%2Fdocker.sock/containers/{container.name}/logs'
-
-    # Parameters for the log request
-    params = {
-        'stdout': '1',
-        'stderr': '1',
-        'follow': '1'
-    }
-
-    # If only logs from the latest are required
-    if from_latest:
-        params['tail'] = '0'
-
-    response = session.get(
-        url, params=params, stream=True, timeout=timeout)
-
-    try:
-        data_buffer = b''
-        for chunk in response.iter_content(chunk_size=1024):
-            if chunk:
-                data_buffer += chunk
-                for message in _parse_docker_log(data_buffer):
-                    yield message
-                    # Adjust the buffer after reading the message
-                    data_buffer = data_buffer[len(message)+8:]
-
-    except Timeout:
-        raise StopIteration(f'No logs received for {timeout} seconds.')
+    return DockerLogStream(
+        container,
+        timeout=timeout,
+        from_latest=from_latest,
+        lines=lines,
+        chunk_size=chunk_size)
 
 
 # recursive compare two dicts
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+import time
+import logging
+import threading
+
+from typing import Dict, List, Optional, Tuple
+from collections import deque
+
+from .config import DEFAULT_DOCKER_LABEL
+
+
+# docker event action -> container status, actions not listed here (kill,
+# stop, exec_*, attach...) don't change it
+EVENT_STATUS = {
+    'create': 'created',
+    'start': 'running',
+    'restart': 'running',
+    'unpause': 'running',
+    'pause': 'paused',
+    'die': 'exited',
+    'destroy': 'removed'
+}
+
+
+def label_filters(labels: Dict[str, str]) -> List[str]:
+    return [f'{key}={value}' for key, value in labels.items()]
+
+
+def new_state(name: str, container_id: Optional[str] = None) -> Dict:
+    return {
+        'name': name,
+        'id': container_id,
+        'status': 'unknown',
+        'health': None,
+        'starts': 0,
+        'restarts': 0,
+        'exit_code': None,
+        'oom_kills': 0,
+        'updated_at': None
+    }
+
+
+def apply_event(state: Dict, event: Dict) -> bool:
+    '''Fold a docker container event into its state entry, returns True if
+    anything changed.
+    '''
+    action = event.get('Action', event.get('status', ''))
+    actor = event.get('Actor', {})
+    attrs = actor.get('Attributes', {})
+    container_id = actor.get('ID', event.get('id'))
+    before = dict(state)
+
+    if action.startswith('health_status'):
+        state['health'] = action.split(':', 1)[-1].strip()
+
+    elif action == 'oom':
+        state['oom_kills'] += 1
+
+    elif action in EVENT_STATUS:
+        state['status'] = EVENT_STATUS[action]
+
+        if action == 'start':
+            # events since the seed listing get replayed, don't count twice
+            replayed = (
+                before['status'] == 'running' and before['id'] == container_id)
+            if not replayed:
+                # tevmc re-creates containers under the same name on restart
+                if state['starts'] > 0:
+                    state['restarts'] += 1
+
+                state['starts'] += 1
+                state['exit_code'] = None
+
+        elif action == 'restart':
+            state['restarts'] += 1
+
+        elif action == 'die' and 'exitCode' in attrs:
+            state['exit_code'] = int(attrs['exitCode'])
+
+    if container_id:
+        state['id'] = container_id
+
+    if state == before:
+        return False
+
+    state['updated_at'] = event.get('timeNano', 0) / 1e9 or event.get('time')
+    return True
+
+
+class ContainerWatcher:
+    '''In memory state table of every container labeled as ours, kept up to
+    date from the docker events stream instead of reloading containers.
+
+    Every change bumps a version number, ``changes`` lets clients long poll
+    for the entries that changed after the version they last saw.
+    '''
+
+    def __init__(
+        self,
+        client,
+        labels: Dict[str, str] = DEFAULT_DOCKER_LABEL,
+        history: int = 1024,
+        logger: Optional[logging.Logger] = None
+    ):
+        self.client = client
+        self.labels = labels
+        self.logger = logger if logger else logging.getLogger('tevmc.watcher')
+
+        self.states: Dict[str, Dict] = {}
+        self.version = 0
+        self._history = deque(maxlen=history)
+        self._cond = threading.Condition()
+
+        self._stream = None
+        self._thread: Optional[threading.Thread] = None
+        self.closed = False
+
+    def _changed(self, state: Dict):
+        # caller holds the condition
+        self.version += 1
+        self._history.append((self.version, dict(state)))
+        self._cond.notify_all()
+
+    def seed(self):
+        '''Load the current state of our containers, one listing call.
+        '''
+        containers = self.client.containers.list(
+            all=True, filters={'label': label_filters(self.labels)})
+
+        with self._cond:
+            for container in containers:
+                state = self.states.setdefault(
+                    container.name, new_state(container.name))
+                if (state['id'] != container.id or
+                    state['status'] != container.status):
+                    state['id'] = container.id
+                    state['status'] = container.status
+                    if container.status == 'running' and state['starts'] == 0:
+                        state['starts'] = 1
+
+                    state['updated_at'] = time.time()
+                    self._changed(state)
+
+    def feed(self, event: Dict):
+        name = event.get('Actor', {}).get('Attributes', {}).get('name')
+        if not name:
+            return
+
+        with self._cond:
+            state = self.states.setdefault(name, new_state(name))
+            if apply_event(state, event):
+                self._changed(state)
+
+    def _run(self):
+        filters = {'type': 'container', 'label': label_filters(self.labels)}
+        backoff = 1.0
+        while not self.closed:
+            try:
+                since = int(time.time())
+                self.seed()
+                self._stream = self.client.events(
+                    decode=True, filters=filters, since=since)
+                backoff = 1.0
+                for event in self._stream:
+                    if self.closed:
+                        break
+
+                    self.feed(event)
+
+            except Exception as e:
+                if self.closed:
+                    break
+
+                self.logger.warning(
+                    f'docker events stream failed: {e}, retrying in {backoff}s')
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+
+        self.closed = False
+        self._thread = threading.Thread(
+            target=self._run, name='container-watcher', daemon=True)
+        self._thread.start()
+
+    def get(self, name: str) -> Optional[Dict]:
+        with self._cond:
+            state = self.states.get(name)
+            return dict(state) if state else None
+
+    def snapshot(self) -> Tuple[int, Dict[str, Dict]]:
+        with self._cond:
+            return self.version, {
+                name: dict(state) for name, state in self.states.items()}
+
+    def changes(
+        self,
+        since: int,
+        timeout: Optional[float] = None
+    ) -> Tuple[int, Optional[List[Dict]]]:
+        '''Entries changed after version ``since``, waiting up to ``timeout``
+        seconds for one if there are none yet.
+
+        Returns ``None`` as changes when ``since`` is older than the kept
+        history, the caller should re-read the whole table.
+        '''
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self.version > since or self.closed, timeout=timeout)
+
+            if self.version <= since:
+                return self.version, []
+
+            if not self._history or self._history[0][0] > since + 1:
+                return self.version, None
+
+            latest = {}
+            for version, state in self._history:
+                if version > since:
+                    latest[state['name']] = state
+
+            return self.version, list(latest.values())
+
+    def close(self):
+        self.closed = True
+        with self._cond:
+            self._cond.notify_all()
+
+        if self._stream is not None:
+            try:
+                self._stream.close()
+
+            except Exception:
+                ...
+
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None